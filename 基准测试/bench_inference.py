@@ -0,0 +1,101 @@
+"""
+本机推理服务（机器学习/inference_server.py）的基准测试，不需要摄像头
+多个模拟收银通道同时向服务发送图像帧，统计吞吐、请求延迟分位数和平均批次大小；
+默认使用检测器替身（固定耗时 + 每张图耗时），指定 --weights 时加载真实的ONNX模型
+
+    python bench_inference.py --lanes 6 --fps 5 --duration 10
+    python bench_inference.py --lanes 6 --max-batch 1        # 对比不合并批次
+    python bench_inference.py --lanes 6 --weights ../机器学习/models/exported/best.onnx
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, '机器学习'))
+
+from bench_serial import format_latency, percentiles, print_report
+from serial_sim import StandInDetector
+
+
+def run_lane(client, frame, fps, deadline, latencies):
+    """
+    一个收银通道：按 fps 发送同一帧（fps 为0时收到结果后立即发送下一帧），记录每个请求的延迟
+    """
+    interval = 1.0 / fps if fps else 0.0
+    next_time = time.perf_counter()
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        client.detect(frame)
+        latencies.append(time.perf_counter() - t0)
+        next_time += interval
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本机推理服务基准测试')
+    parser.add_argument('--lanes', type=int, default=6, help='同时发送请求的收银通道数')
+    parser.add_argument('--fps', type=float, default=0, help='每个通道每秒发送的帧数，0 表示收到结果后立即发送')
+    parser.add_argument('--duration', type=float, default=10, help='测试时长（秒）')
+    parser.add_argument('--width', type=int, default=320, help='图像宽度')
+    parser.add_argument('--height', type=int, default=240, help='图像高度')
+    parser.add_argument('--max-batch', type=int, default=8, help='最大批次大小')
+    parser.add_argument('--max-queue-delay-ms', type=float, default=5.0, help='最长排队时间（毫秒）')
+    parser.add_argument('--weights', type=str, default=None, help='ONNX模型，不指定时使用检测器替身')
+    parser.add_argument('--fixed-ms', type=float, default=20.0, help='替身每批的固定耗时（毫秒）')
+    parser.add_argument('--per-image-ms', type=float, default=5.0, help='替身每张图的耗时（毫秒）')
+    parser.add_argument('--tcp', action='store_true', help='使用本机TCP而不是 Unix 套接字')
+    args = parser.parse_args()
+
+    from inference_server import SERVER_HOST, SERVER_PORT, InferenceClient, InferenceServer
+
+    if args.weights:
+        from detector import create_detector
+        detector = create_detector('onnx', args.weights, max_batch=args.max_batch)
+    else:
+        detector = StandInDetector(args.fixed_ms / 1000, args.per_image_ms / 1000)
+
+    if args.tcp or not hasattr(__import__('socket'), 'AF_UNIX'):
+        address = (SERVER_HOST, SERVER_PORT)
+    else:
+        address = os.path.join(tempfile.mkdtemp(), 'inference.sock')
+    server = InferenceServer(detector, args.max_batch, args.max_queue_delay_ms / 1000, address=address).start()
+
+    frame = np.random.randint(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    clients = [InferenceClient(address) for _ in range(args.lanes)]
+    latencies = [[] for _ in range(args.lanes)]
+    t0 = time.perf_counter()
+    deadline = t0 + args.duration
+    threads = [threading.Thread(target=run_lane, args=(client, frame, args.fps, deadline, lane_latencies))
+               for client, lane_latencies in zip(clients, latencies)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+
+    for client in clients:
+        client.close()
+    stats = server.stats()
+    server.close()
+
+    all_latencies = [latency for lane in latencies for latency in lane]
+    print_report("本机推理服务", [
+        ("通道", f"{args.lanes} 个（{args.fps or '不限'} 帧/s），{args.width}x{args.height}"),
+        ("批次", f"最大 {args.max_batch}，最长排队 {args.max_queue_delay_ms}ms，"
+                 f"平均 {stats['mean_batch']:.2f}（{stats['batches']} 批）"),
+        ("吞吐", f"{len(all_latencies) / elapsed:.1f} 帧/s"),
+        ("延迟", format_latency(percentiles(all_latencies))),
+        ("排队", f"平均 {stats['queue_ms']:.1f}ms，推理平均 {stats['infer_ms']:.1f}ms/批"),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+串口采集端到端基准测试，使用 serial_sim 中的伪终端模拟设备，不需要连接硬件
+
+    python bench_serial.py weight --rate 200 --duration 10
+    python bench_serial.py frames --width 320 --height 240 --fps 5 --noise 64
+
+weight：模拟重量模块 → duqu3.SerialIngest → BatchWriter → 数据库替身，
+        统计写入速率、从发送到提交的延迟分位数和丢失数
+frames：模拟OV7670 → frame_reader.SerialFrameReader，
+        统计帧率、从开始发送到接收完成的延迟分位数、丢帧数和重新同步次数
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, '重量模块', 'MySQL衔接脚本'))
+sys.path.append(os.path.join(ROOT, '机器学习'))
+
+from serial_sim import PIXEL_FORMATS, FrameSimulator, StandInPool, WeightSimulator
+
+DRAIN_TIMEOUT = 5.0  # 模拟设备停止发送后，等待被测程序处理剩余数据的最长时间（秒）
+
+
+def percentiles(latencies):
+    """
+    返回延迟(ms)的 p50/p90/p99/max
+    """
+    if not latencies:
+        return {}
+    values = np.array(latencies) * 1000
+    return {
+        'p50': float(np.percentile(values, 50)),
+        'p90': float(np.percentile(values, 90)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(values.max()),
+    }
+
+
+def print_report(title, rows):
+    print(f"\n== {title} ==")
+    for name, value in rows:
+        print(f"{name:<14}{value}")
+
+
+def format_latency(latency):
+    if not latency:
+        return "-"
+    return ", ".join(f"{k} {v:.1f}ms" for k, v in latency.items())
+
+
+def bench_weight(args):
+    import serial
+    import duqu3
+
+    device = WeightSimulator(rate=args.rate, baudrate=args.baudrate)
+    pool = StandInPool(args.statement_ms / 1000, args.commit_ms / 1000)
+
+    received = {}  # 序号 -> 提交完成的时间
+    lock = threading.Lock()
+
+    def on_write(records):
+        now = time.perf_counter()
+        with lock:
+            for _, _, weight, _ in records:
+                received[WeightSimulator.sequence(weight)] = now
+
+    writer = duqu3.BatchWriter(pool, args.batch_size, args.flush_interval, on_write=on_write).start()
+    ser = serial.Serial(device.port, args.baudrate, timeout=0.5)
+    ingest = duqu3.SerialIngest(ser, writer).start()
+
+    t0 = time.perf_counter()
+    device.start(args.duration)
+    device.join()
+    # 等待队列和写入缓冲区中的记录处理完
+    deadline = time.perf_counter() + DRAIN_TIMEOUT
+    while len(received) < device.sent and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    elapsed = max(received.values(), default=t0) - t0
+
+    ingest.stop()
+    writer.close()
+    ser.close()
+    device.close()
+
+    latencies = [received[seq] - device.send_times[seq] for seq in received if seq in device.send_times]
+    stats = ingest.stats()
+    print_report("重量数据采集", [
+        ("发送", f"{device.sent} 条（{args.rate}/s，{args.baudrate or '不限速'} baud）"),
+        ("写入", f"{len(received)} 条，{pool.commits} 次提交"),
+        ("吞吐", f"{len(received) / elapsed:.1f} 条/s" if elapsed > 0 else "-"),
+        ("延迟", format_latency(percentiles(latencies))),
+        ("丢失", f"{device.sent - len(received)} 条（格式错误 {stats['bad_lines']}，队列丢弃 {stats['dropped']}）"),
+    ])
+
+
+def bench_frames(args):
+    from frame_reader import SerialFrameReader
+
+    device = FrameSimulator(args.width, args.height, args.fps, args.baudrate, args.noise, args.pixel_format)
+    reader = SerialFrameReader(device.port, args.baudrate, timeout=0.5,
+                               max_width=args.width, max_height=args.height)
+
+    received = {}  # 序号 -> 接收完成的时间
+    t0 = time.perf_counter()
+    device.start(args.duration)
+    idle_since = None
+    while True:
+        frame = reader.read_frame()
+        if frame is not None:
+            received[FrameSimulator.sequence(frame)] = time.perf_counter()
+            idle_since = None
+        elif not device.running():
+            # 模拟设备已停止，连续超时说明数据已读完
+            idle_since = idle_since or time.perf_counter()
+            if time.perf_counter() - idle_since > DRAIN_TIMEOUT or len(received) >= device.sent:
+                break
+    elapsed = max(received.values(), default=t0) - t0
+
+    reader.close()
+    device.close()
+
+    latencies = [received[seq] - device.send_times[seq] for seq in received if seq in device.send_times]
+    frame_bytes = device.frame_bytes
+    print_report("OV7670图像采集", [
+        ("发送", f"{device.sent} 帧 {args.width}x{args.height} {args.pixel_format}"
+                 f"（{args.fps}/s，{args.baudrate or '不限速'} baud）"),
+        ("接收", f"{len(received)} 帧"),
+        ("帧率", f"{len(received) / elapsed:.2f} 帧/s，{len(received) * frame_bytes / elapsed / 1024:.0f} KB/s"
+                 if elapsed > 0 else "-"),
+        ("延迟", format_latency(percentiles(latencies))),
+        ("丢失", f"{device.sent - len(received)} 帧（重新同步 {reader.resyncs}，不完整 {reader.incomplete}）"),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='串口采集端到端基准测试（模拟设备）')
+    subparsers = parser.add_subparsers(dest='target', required=True)
+
+    weight = subparsers.add_parser('weight', help='重量数据采集与批量写入')
+    weight.add_argument('--rate', type=float, default=50, help='每秒发送的数据行数')
+    weight.add_argument('--baudrate', type=int, default=9600, help='模拟串口波特率，0 表示不限速')
+    weight.add_argument('--duration', type=float, default=10, help='发送时长（秒）')
+    weight.add_argument('--batch-size', type=int, default=50, help='BatchWriter 批大小')
+    weight.add_argument('--flush-interval', type=float, default=1.0, help='BatchWriter 定时写入间隔（秒）')
+    weight.add_argument('--statement-ms', type=float, default=0.5, help='数据库替身的单条语句耗时（毫秒）')
+    weight.add_argument('--commit-ms', type=float, default=2.0, help='数据库替身的提交耗时（毫秒）')
+
+    frames = subparsers.add_parser('frames', help='OV7670图像帧接收')
+    frames.add_argument('--width', type=int, default=320, help='图像宽度')
+    frames.add_argument('--height', type=int, default=240, help='图像高度')
+    frames.add_argument('--fps', type=float, default=0, help='每秒发送的帧数，0 表示连续发送')
+    frames.add_argument('--baudrate', type=int, default=460800, help='模拟串口波特率，0 表示不限速')
+    frames.add_argument('--duration', type=float, default=10, help='发送时长（秒）')
+    frames.add_argument('--noise', type=int, default=0, help='每帧之间插入的随机字节数')
+    frames.add_argument('--pixel-format', choices=PIXEL_FORMATS, default='rgb565', help='像素格式')
+
+    args = parser.parse_args()
+    if args.target == 'weight':
+        bench_weight(args)
+    else:
+        bench_frames(args)
+
+
+if __name__ == "__main__":
+    main()
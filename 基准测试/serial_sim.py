@@ -0,0 +1,242 @@
+"""
+串口设备模拟器：在伪终端(pty)上模拟重量模块和OV7670摄像头的STM32开发板
+上位机程序像打开真实串口一样打开 slave 端的设备路径，不需要连接硬件
+依赖 pty，仅支持 Linux/macOS
+"""
+import os
+import random
+import threading
+import time
+import tty
+
+import numpy as np
+
+FRAME_START = b'\x01\xfe'  # 与 frame_reader.FRAME_START 一致
+PIXEL_FORMATS = {'bgr888': (0, 3), 'rgb565': (1, 2), 'yuv422': (2, 2)}  # 名称 -> (帧头中的格式值, 每像素字节数)
+SEQUENCE_BITS = 32  # 每帧第一行前32个像素按黑/白编码消息序号
+
+
+class PtyDevice:
+    """
+    伪终端设备：模拟器写入 master 端，被测程序打开 slave 端的 port
+    以 rate 条/秒发送 message(序号) 生成的消息，rate 为0时连续发送；
+    baudrate 不为0时按串口速率（每字节10位）限速，模拟真实的传输时间
+    """
+
+    def __init__(self, message, rate, baudrate=0):
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)  # 关闭回显和行缓冲，按原始字节传输
+        self.port = os.ttyname(self.slave)
+        self.message = message
+        self.rate = rate
+        self.baudrate = baudrate
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.sent = 0  # 已发送的消息数
+        self.send_times = {}  # 序号 -> 开始发送的时间
+
+    def write(self, data):
+        """
+        写入数据，按波特率限速；返回开始写入的时间
+        """
+        start = time.perf_counter()
+        view = memoryview(data)
+        while view:
+            n = os.write(self.master, view[:4096])
+            view = view[n:]
+        if self.baudrate:
+            done = start + len(data) * 10 / self.baudrate
+            delay = done - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return start
+
+    def start(self, duration):
+        self._thread = threading.Thread(target=self._run, args=(duration,), daemon=True)
+        self._thread.start()
+        return self
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def join(self):
+        self._thread.join()
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self.stop()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def _run(self, duration):
+        interval = 1.0 / self.rate if self.rate else 0.0
+        deadline = time.perf_counter() + duration
+        next_time = time.perf_counter()
+        while not self._stop.is_set() and max(next_time, time.perf_counter()) < deadline:  # rate 为0时按实际时间结束
+            self.send_times[self.sent] = self.write(self.message(self.sent))
+            self.sent += 1
+            next_time += interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+
+class WeightSimulator(PtyDevice):
+    """
+    重量模块模拟器：以 rate 条/秒的速率发送 "水果代码,重量" 数据行
+    重量的整数部分是消息序号，接收端据此计算延迟和丢失
+    """
+
+    def __init__(self, rate=100, baudrate=9600, codes=range(1, 11)):
+        super().__init__(self._line, rate, baudrate)
+        self.codes = [str(code) for code in codes]
+
+    @staticmethod
+    def sequence(weight):
+        """由接收到的重量还原消息序号"""
+        return int(weight)
+
+    def _line(self, seq):
+        return f"{random.choice(self.codes)},{seq}.5\n".encode()
+
+
+class FrameSimulator(PtyDevice):
+    """
+    OV7670摄像头模拟器：以 fps 帧/秒发送 帧起始标记 + 宽高 + 像素格式 + 像素数据
+    每帧第一行前32个像素是消息序号（每个像素黑/白表示一位，解码为BGR后仍可还原）；
+    noise 为每帧之间插入的随机字节数，用于测试重新同步
+    """
+
+    def __init__(self, width=320, height=240, fps=10, baudrate=460800, noise=0, pixel_format='bgr888'):
+        super().__init__(self._frame, fps, baudrate)
+        self.width = width
+        self.height = height
+        self.noise = noise
+        format_id, self.bytes_per_pixel = PIXEL_FORMATS[pixel_format]
+        self.pixel_format = pixel_format
+        self.header = FRAME_START + width.to_bytes(2, 'little') + height.to_bytes(2, 'little') + bytes([format_id])
+        self.pixels = np.random.randint(0, 256, (height, width * self.bytes_per_pixel), dtype=np.uint8)
+
+    @property
+    def frame_bytes(self):
+        return self.width * self.height * self.bytes_per_pixel
+
+    def _encode_sequence(self, seq):
+        bits = (seq >> np.arange(SEQUENCE_BITS)) & 1
+        values = (bits * 255).astype(np.uint8)
+        row = self.pixels[0]
+        if self.pixel_format == 'yuv422':
+            # Y0 U Y1 V：亮度按位取黑/白，色度取中性值
+            row[:SEQUENCE_BITS * 2:2] = values
+            row[1:SEQUENCE_BITS * 2:2] = 128
+        else:
+            row[:SEQUENCE_BITS * self.bytes_per_pixel] = np.repeat(values, self.bytes_per_pixel)
+
+    @staticmethod
+    def sequence(frame):
+        """由接收到的BGR图像还原消息序号"""
+        bits = frame[0, :SEQUENCE_BITS, 1] > 127
+        return int((bits.astype(np.uint64) << np.arange(SEQUENCE_BITS, dtype=np.uint64)).sum())
+
+    def _frame(self, seq):
+        self._encode_sequence(seq)
+        noise = os.urandom(self.noise).replace(FRAME_START, b'\x00\x00') if self.noise else b''
+        return noise + self.header + self.pixels.tobytes()
+
+
+class StandInCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.lastrowid = None
+        self._result = []
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        pool = self.conn.pool
+        if sql.lstrip().upper().startswith("INSERT INTO FRUIT_WEIGHTS"):
+            self.lastrowid = pool.next_id
+            pool.inserted = [(pool.next_id + i,) + tuple(row) for i, row in enumerate(rows)]
+            pool.next_id += len(rows)
+        self.conn.statements += 1
+
+    def execute(self, sql, params=()):
+        pool = self.conn.pool
+        if sql.startswith("SELECT @@auto_increment_increment"):
+            self._result = [(1, pool.autoinc_lock_mode)]
+        elif sql.startswith("SELECT id, fruit_type, weight, timestamp FROM fruit_weights WHERE id >="):
+            self._result = pool.inserted[:params[1]]  # 读回刚写入的记录
+        else:
+            self._result = []
+        self.conn.statements += 1
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return list(self._result)
+
+    def close(self):
+        pass
+
+
+class StandInConnection:
+    def __init__(self, pool):
+        self.pool = pool
+        self.statements = 0
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    def commit(self):
+        # 每条语句一次往返，提交时一次性等待，模拟数据库的写入耗时
+        time.sleep(self.pool.statement_latency * self.statements + self.pool.commit_latency)
+        self.statements = 0
+        self.pool.commits += 1
+
+    def rollback(self):
+        self.statements = 0
+
+    def close(self):
+        pass  # 与连接池的连接一样，close 表示归还
+
+
+class StandInPool:
+    """
+    MySQL连接池的替身：接口与 mysql.connector.pooling.MySQLConnectionPool 相同，
+    只保留最近一次写入的记录供读回，按设定的单条语句耗时和提交耗时等待，用于在没有数据库的机器上测量采集流程
+    autoinc_lock_mode 默认为MySQL 8的2（多行INSERT的ID不保证连续，写入后需读回）
+    """
+
+    def __init__(self, statement_latency=0.0005, commit_latency=0.002, autoinc_lock_mode=2):
+        self.statement_latency = statement_latency
+        self.commit_latency = commit_latency
+        self.autoinc_lock_mode = autoinc_lock_mode
+        self.next_id = 1
+        self.inserted = []  # 最近一次 INSERT 的记录
+        self.commits = 0
+
+    def get_connection(self):
+        return StandInConnection(self)
+
+
+class StandInDetector:
+    """
+    检测器的替身：接口与 detector.BaseDetector 的 detect / detect_many 相同，不运行模型，
+    按 固定耗时 + 每张图耗时 等待，模拟批量推理分摊固定开销的效果，用于在没有模型的机器上测量推理服务
+    """
+
+    def __init__(self, fixed_latency=0.02, per_image_latency=0.005):
+        self.fixed_latency = fixed_latency
+        self.per_image_latency = per_image_latency
+        self.batches = []  # 每次调用的批次大小
+
+    def detect(self, frame):
+        return self.detect_many([frame])[0]
+
+    def detect_many(self, frames):
+        time.sleep(self.fixed_latency + self.per_image_latency * len(frames))
+        self.batches.append(len(frames))
+        return [[] for _ in frames]
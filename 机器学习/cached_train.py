@@ -0,0 +1,82 @@
+"""
+使用 image_cache.py 生成的预解码缓存运行YOLOv5训练，参数与 yolov5/train.py 完全相同：
+
+    python cached_train.py --data dataset/fruits.yaml --img 640 ...
+
+启动前替换YOLOv5数据集的 load_image：缓存中有的图像直接从内存映射数组复制，
+没有缓存或已修改的图像仍按原方式解码。DataLoader 的工作进程需要继承替换后的函数，
+Windows 上（spawn 方式创建进程）请加 --workers 0。
+"""
+import argparse
+import os
+import runpy
+import sys
+from pathlib import Path
+
+# 项目根目录
+ROOT = Path(__file__).parent.resolve()
+YOLOV5 = ROOT / 'yolov5'
+sys.path.insert(0, str(YOLOV5))
+
+from image_cache import CACHE_DIR, ImageCache
+
+
+def open_caches(img_size):
+    """
+    打开该尺寸下所有划分的缓存，返回 {图像绝对路径: (缓存, 槽位)}
+    """
+    lookup = {}
+    for index_path in sorted(CACHE_DIR.glob(f"*_{img_size}.json")):
+        split = index_path.stem[:-len(f"_{img_size}")]
+        cache = ImageCache(split, img_size)
+        slots = cache.open()
+        lookup.update({path: (cache, slot) for path, slot in slots.items()})
+        print(f"{split}: 使用缓存 {len(slots)} 张图像")
+    return lookup
+
+
+def install(img_size):
+    """
+    替换YOLOv5的 load_image，兼容旧版（utils/datasets.py 中的模块函数）和新版（数据集类的方法）
+    """
+    lookup = open_caches(img_size)
+    if not lookup:
+        print(f"没有 {img_size} 尺寸的图像缓存，请先运行: python image_cache.py --img-size {img_size}")
+        return
+
+    try:
+        from utils import dataloaders as datasets
+    except ImportError:
+        from utils import datasets
+
+    dataset_cls = datasets.LoadImagesAndLabels
+    as_method = hasattr(dataset_cls, 'load_image')
+    original = dataset_cls.load_image if as_method else datasets.load_image
+
+    def load_image(self, i):
+        files = getattr(self, 'im_files', None) or self.img_files
+        cached = lookup.get(os.path.realpath(files[i]))
+        if cached is None or self.img_size != img_size:
+            return original(self, i)
+        cache, slot = cached
+        return cache.get(slot)
+
+    if as_method:
+        dataset_cls.load_image = load_image
+    else:
+        datasets.load_image = load_image
+
+
+def main():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--img', '--img-size', '--imgsz', type=int, nargs='+', default=[640])
+    args, _ = parser.parse_known_args()
+    install(args.img[0])
+
+    # 以 __main__ 方式运行 train.py，sys.argv 原样传给它
+    sys.argv[0] = str(YOLOV5 / 'train.py')
+    runpy.run_path(str(YOLOV5 / 'train.py'), run_name='__main__')
+
+
+if __name__ == "__main__":
+    main()
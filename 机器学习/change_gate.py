@@ -0,0 +1,156 @@
+"""
+画面变化门控
+收银台摄像头大部分时间对着空托盘或没有变化的画面，逐帧完整推理是浪费。
+推理前先把画面缩小为灰度缩略图，与上一次实际推理的画面比较平均像素差和差值哈希(dHash)，
+画面没有变化时直接返回上一次的检测结果，一个CPU就可以服务更多的收银通道。
+"""
+import threading
+
+import cv2
+import numpy as np
+
+# 门控默认参数
+THUMB_SIZE = (32, 24)  # 计算像素差的缩略图尺寸（宽, 高）
+DIFF_THRESHOLD = 4.0  # 缩略图平均灰度差（0-255）超过该值视为画面变化
+HASH_THRESHOLD = 6  # 64位dHash的汉明距离超过该值视为画面变化
+MAX_SKIP = 30  # 连续复用结果的最大帧数，超过后强制推理一次，避免长期使用过时结果
+GATE_METHODS = ('diff', 'hash', 'both')
+
+
+class ChangeGate:
+    """
+    判断画面相对上一次推理的画面是否有变化
+    method 为 diff（只比较像素差）、hash（只比较dHash）或 both（任一超过阈值即视为变化）
+    阈值越小越灵敏；参考画面只在实际推理时更新，缓慢的光照变化会逐渐累积直到超过阈值
+    """
+
+    def __init__(self, diff_threshold=DIFF_THRESHOLD, hash_threshold=HASH_THRESHOLD,
+                 method='both', max_skip=MAX_SKIP, thumb_size=THUMB_SIZE):
+        if method not in GATE_METHODS:
+            raise ValueError(f"不支持的门控方式: {method}，可选: {', '.join(GATE_METHODS)}")
+        self.diff_threshold = diff_threshold
+        self.hash_threshold = hash_threshold
+        self.method = method
+        self.max_skip = max_skip
+        self.thumb_size = thumb_size
+
+        self.reference = None  # 上一次推理画面的 (缩略图, dHash)
+        self.skipped = 0  # 自上一次推理以来连续复用结果的帧数
+
+        # 统计信息
+        self.hits = 0  # 复用缓存结果的帧数
+        self.misses = 0  # 实际推理的帧数
+
+    def signature(self, image):
+        """
+        计算画面特征：int16灰度缩略图和64位dHash
+        """
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        thumb = cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        dhash = int.from_bytes(np.packbits(small[:, 1:] > small[:, :-1]).tobytes(), 'big')
+        return thumb, dhash
+
+    def changed(self, signature):
+        """
+        画面相对参考画面是否有变化；没有参考画面或连续复用达到上限时返回True
+        """
+        if self.reference is None or self.skipped >= self.max_skip:
+            return True
+        thumb, dhash = signature
+        ref_thumb, ref_hash = self.reference
+        if self.method in ('diff', 'both') and np.abs(thumb - ref_thumb).mean() > self.diff_threshold:
+            return True
+        if self.method in ('hash', 'both') and bin(dhash ^ ref_hash).count('1') > self.hash_threshold:
+            return True
+        return False
+
+    def check(self, image):
+        """
+        判断是否需要推理：需要推理时把该画面设为新的参考画面
+        """
+        signature = self.signature(image)
+        if self.changed(signature):
+            self.reference = signature
+            self.skipped = 0
+            self.misses += 1
+            return True
+        self.skipped += 1
+        self.hits += 1
+        return False
+
+    def reset(self):
+        self.reference = None
+        self.skipped = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+class GatedDetector:
+    """
+    在检测器前加画面变化门控，接口与 BaseDetector 相同（detect / detect_many / preprocess / infer），
+    可以直接替换原检测器传给 FramePipeline 或融合服务。
+    流水线只调用 preprocess 和 infer，此时门控比较的是letterbox后的图像；
+    画面尺寸变化时（还原检测框的参数不同）总是重新推理。
+    """
+
+    def __init__(self, detector, gate=None):
+        self.detector = detector
+        self.gate = gate or ChangeGate()
+        self._cached = []  # 参考画面的检测结果
+        self._key = None  # 参考画面的尺寸或还原参数，变化时缓存的检测框不再适用
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # img_size、names、max_batch 等属性直接使用原检测器的
+        return getattr(self.detector, name)
+
+    def detect(self, frame):
+        return self.detect_many([frame])[0]
+
+    def detect_many(self, frames):
+        with self._lock:
+            return self._gated(frames, [frame.shape for frame in frames],
+                               lambda selected: self.detector.detect_many([frames[i] for i in selected]))
+
+    def preprocess(self, frame, out=None):
+        return self.detector.preprocess(frame, out)
+
+    def infer(self, blobs, metas):
+        with self._lock:
+            return self._gated(blobs, metas, lambda selected: self.detector.infer(
+                [blobs[i] for i in selected], [metas[i] for i in selected]))
+
+    def _gated(self, images, keys, run):
+        """
+        逐帧过门控，只对有变化的帧调用 run(帧序号列表)；
+        没有变化的帧复用它之前最近一次推理的结果（可能是本批中更早的一帧）
+        """
+        selected, sources = [], []
+        for i, (image, key) in enumerate(zip(images, keys)):
+            if key != self._key:
+                self.gate.reset()
+                self._key = key
+            if self.gate.check(image):
+                selected.append(i)
+            sources.append(selected[-1] if selected else -1)
+
+        previous = self._cached
+        inferred = dict(zip(selected, run(selected))) if selected else {}
+        if selected:
+            self._cached = inferred[selected[-1]]
+        return [self._copy(inferred[source] if source >= 0 else previous) for source in sources]
+
+    @staticmethod
+    def _copy(results):
+        # 结果字典可能被调用方修改（例如绘制时），每帧返回独立的副本
+        return [dict(result) for result in results]
+
+    def stats(self):
+        return self.gate.stats()
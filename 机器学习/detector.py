@@ -0,0 +1,365 @@
+import os
+import sys
+import ast
+import time
+import cv2
+import numpy as np
+import yaml
+from pathlib import Path
+
+from metrics import timed
+
+# 确保正确路径
+sys.path.append(os.path.join(os.path.dirname(__file__), 'yolov5'))
+
+# 导入YOLOv5模块（只使用ONNX后端的车道机可以不安装PyTorch）
+try:
+    import torch
+    from models.experimental import attempt_load
+    from utils.general import check_img_size, non_max_suppression
+    from utils.torch_utils import select_device
+except ImportError:
+    torch = None
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+# 项目根目录
+ROOT = Path(__file__).parent.resolve()
+
+PAD_COLOR = 114  # 与YOLOv5训练时一致的填充灰度
+BACKENDS = ('torch', 'onnx')
+
+
+def letterbox_params(shape, size):
+    """
+    尺寸为 shape 的图像letterbox到 size x size 时的 (缩放比例, 左填充, 上填充)
+    """
+    h0, w0 = shape[:2]
+    r = min(size / h0, size / w0)
+    w, h = int(round(w0 * r)), int(round(h0 * r))
+    return r, (size - w) // 2, (size - h) // 2
+
+
+def letterbox_into(image, out, color=PAD_COLOR):
+    """
+    将BGR图像等比缩放后居中写入预分配的方形缓冲区out，并转换为RGB
+    不分配新的图像内存，返回(缩放比例, 左填充, 上填充)用于还原检测框
+    """
+    h0, w0 = image.shape[:2]
+    r, left, top = letterbox_params(image.shape, out.shape[0])
+    w, h = int(round(w0 * r)), int(round(h0 * r))
+
+    out[...] = color
+    region = out[top:top + h, left:left + w]
+    if (w, h) == (w0, h0):
+        region[...] = image
+    else:
+        cv2.resize(image, (w, h), dst=region, interpolation=cv2.INTER_LINEAR)
+    cv2.cvtColor(region, cv2.COLOR_BGR2RGB, dst=region)
+
+    return r, left, top
+
+
+def scale_boxes(boxes, ratio, left, top, shape):
+    """
+    将letterbox坐标系下的xyxy检测框还原到原图坐标，并裁剪到图像边界内
+    """
+    boxes[:, [0, 2]] -= left
+    boxes[:, [1, 3]] -= top
+    boxes[:, :4] /= ratio
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, shape[0])
+    return boxes
+
+
+def xywh2xyxy(x):
+    """
+    中心点+宽高 转换为 左上角+右下角 坐标
+    """
+    y = np.empty_like(x)
+    y[:, 0] = x[:, 0] - x[:, 2] / 2
+    y[:, 1] = x[:, 1] - x[:, 3] / 2
+    y[:, 2] = x[:, 0] + x[:, 2] / 2
+    y[:, 3] = x[:, 1] + x[:, 3] / 2
+    return y
+
+
+def nms_boxes(boxes, scores, iou_thres):
+    """
+    贪心NMS，返回按置信度从高到低保留的检测框索引
+    """
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        h = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_thres]
+    return np.array(keep, dtype=np.int64)
+
+
+def numpy_non_max_suppression(pred, conf_thres=0.25, iou_thres=0.45, max_det=300, max_nms=30000):
+    """
+    NumPy版NMS，输入YOLOv5原始输出(B, N, 5 + 类别数)
+    返回每张图一个 (n, 6) 数组：x1, y1, x2, y2, conf, cls
+    """
+    max_wh = 4096  # 按类别偏移检测框，使不同类别之间互不抑制
+    output = []
+    for x in pred:
+        x = x[x[:, 4] > conf_thres]  # 先按目标置信度过滤
+        if not len(x):
+            output.append(np.zeros((0, 6), dtype=np.float32))
+            continue
+
+        scores = x[:, 5:] * x[:, 4:5]  # conf = obj_conf * cls_conf
+        cls = scores.argmax(1)
+        conf = scores[np.arange(len(x)), cls]
+        mask = conf > conf_thres
+        boxes, cls, conf = xywh2xyxy(x[mask, :4]), cls[mask], conf[mask]
+
+        if len(conf) > max_nms:
+            top = conf.argsort()[::-1][:max_nms]
+            boxes, cls, conf = boxes[top], cls[top], conf[top]
+
+        keep = nms_boxes(boxes + cls[:, None] * max_wh, conf, iou_thres)[:max_det]
+        output.append(np.concatenate([boxes[keep], conf[keep, None], cls[keep, None]], 1).astype(np.float32))
+    return output
+
+
+def load_names(data=ROOT / 'fruits.yaml'):
+    """
+    从数据集配置文件读取类别名称
+    """
+    with open(data, 'r', encoding='utf-8') as f:
+        names = yaml.safe_load(f)['names']
+    return names if isinstance(names, dict) else dict(enumerate(names))
+
+
+class BaseDetector:
+    """
+    检测器公共部分：letterbox预处理、分批检测和结果转换
+    子类负责加载模型并实现 infer(blobs, metas)：对已预处理的一批图像做前向推理和NMS，
+    返回与输入一一对应的结果列表
+    """
+
+    img_size = 640
+    max_batch = 8
+    names = {}
+
+    def detect(self, frame):
+        """
+        检测单帧BGR图像中的水果
+        """
+        return self.detect_many([frame])[0]
+
+    def detect_many(self, frames):
+        """
+        批量检测多帧BGR图像，按 max_batch 分批推理，返回与输入一一对应的结果列表
+        """
+        results = []
+        for i in range(0, len(frames), self.max_batch):
+            results.extend(self._detect_batch(frames[i:i + self.max_batch]))
+        return results
+
+    def preprocess(self, frame, out=None):
+        """
+        将BGR图像letterbox到推理尺寸，返回(RGB缓冲区, 还原信息)
+        out 为调用方提供的缓冲区，流水线中各帧使用各自的缓冲区互不覆盖
+        """
+        if out is None:
+            out = np.empty((self.img_size, self.img_size, 3), dtype=np.uint8)
+        with timed('preprocess'):
+            meta = letterbox_into(frame, out) + (frame.shape,)
+        return out, meta
+
+    def _detect_batch(self, frames):
+        prepared = [self.preprocess(frame, self._letterbox[i]) for i, frame in enumerate(frames)]
+        blobs, metas = zip(*prepared)
+        return self.infer(blobs, metas)
+
+    def _to_results(self, det, meta):
+        """
+        将一帧的NMS输出(x1, y1, x2, y2, conf, cls)转换为结果字典列表
+        """
+        results = []
+        if not len(det):
+            return results
+
+        scale_boxes(det, *meta)
+        for *xyxy, conf, cls in det:
+            results.append({
+                'box': [round(float(x)) for x in xyxy],
+                'confidence': float(conf),
+                'class': int(cls),
+                'class_name': self.names.get(int(cls), str(int(cls)))
+            })
+        return results
+
+
+class FruitDetector(BaseDetector):
+    """
+    常驻内存的水果检测器（PyTorch后端）
+    模型只加载、融合、预热一次，输入张量预先分配并在每次推理时复用
+    """
+
+    def __init__(self, weights='yolov5s.pt', img_size=640, conf_thres=0.25, iou_thres=0.45,
+                 device='', max_batch=8, warmup=True):
+        if torch is None:
+            raise ImportError("PyTorch后端需要安装torch，并将YOLOv5放在 机器学习/yolov5 目录下")
+        self.conf_thres = conf_thres
+        self.iou_thres = iou_thres
+        self.max_batch = max_batch
+
+        # 加载模型（attempt_load 会融合Conv+BN层）
+        t0 = time.time()
+        self.device = select_device(device)
+        self.half = self.device.type != 'cpu'  # 仅CUDA支持半精度
+        self.model = attempt_load(weights, device=self.device)
+        self.model.eval()
+        if self.half:
+            self.model.half()
+        stride = int(self.model.stride.max())  # 模型步长
+        self.img_size = check_img_size(img_size, s=stride)  # 检查图像大小
+        names = self.model.module.names if hasattr(self.model, 'module') else self.model.names
+        self.names = names if isinstance(names, dict) else dict(enumerate(names))
+
+        # 预分配letterbox缓冲区和输入张量
+        self._letterbox = np.full((max_batch, self.img_size, self.img_size, 3), PAD_COLOR, dtype=np.uint8)
+        self._input = torch.zeros((max_batch, 3, self.img_size, self.img_size), device=self.device)
+        if self.half:
+            self._input = self._input.half()
+
+        print(f"模型加载完成: {weights}，耗时 {time.time() - t0:.2f}s")
+
+        if warmup:
+            self.warmup()
+
+    def warmup(self, runs=2):
+        """
+        用空白输入跑几次前向推理，让算子初始化和内存分配在第一帧之前完成
+        """
+        t0 = time.time()
+        with torch.no_grad():
+            for _ in range(runs):
+                self.model(self._input[:1], augment=False)
+        print(f"模型预热完成，耗时 {time.time() - t0:.2f}s")
+
+    def infer(self, blobs, metas):
+        n = len(blobs)
+
+        # 复制到预分配的输入张量并归一化 0 - 255 转 0.0 - 1.0
+        inputs = self._input[:n]
+        for i, blob in enumerate(blobs):
+            inputs[i].copy_(torch.from_numpy(blob).permute(2, 0, 1))
+        inputs /= 255.0
+
+        # 推理
+        with timed('forward'), torch.no_grad():
+            pred = self.model(inputs, augment=False)[0]
+
+        # 应用NMS
+        with timed('nms'):
+            pred = non_max_suppression(pred, self.conf_thres, self.iou_thres)
+
+        return [self._to_results(det.float().cpu().numpy(), meta)
+                for det, meta in zip(pred, metas)]
+
+
+class OnnxFruitDetector(BaseDetector):
+    """
+    基于ONNX Runtime CPU执行器的水果检测器
+    运行 export_model.py 导出的 .onnx 模型，NMS 使用NumPy实现，不依赖PyTorch
+    """
+
+    def __init__(self, weights='yolov5s.onnx', img_size=640, conf_thres=0.25, iou_thres=0.45,
+                 max_batch=8, threads=0, names=None, warmup=True):
+        if ort is None:
+            raise ImportError("ONNX后端需要安装onnxruntime: pip install onnxruntime")
+        self.conf_thres = conf_thres
+        self.iou_thres = iou_thres
+
+        # 创建推理会话，threads 为0时由ONNX Runtime按物理核数自动设置
+        t0 = time.time()
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(str(weights), options, providers=['CPUExecutionProvider'])
+
+        # 导出的模型输入尺寸和批次大小是固定的，以模型为准
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, _ = model_input.shape
+        if isinstance(height, int):
+            img_size = height
+        self.img_size = img_size
+        self.dynamic_batch = not isinstance(batch, int)
+        self.max_batch = max_batch if self.dynamic_batch else batch
+
+        # 类别名称优先读取模型元数据，旧版导出的模型则读取数据集配置
+        meta = self.session.get_modelmeta().custom_metadata_map
+        if names is None:
+            names = ast.literal_eval(meta['names']) if 'names' in meta else load_names()
+        self.names = names if isinstance(names, dict) else dict(enumerate(names))
+
+        # 预分配letterbox缓冲区和输入数组
+        self._letterbox = np.full((self.max_batch, img_size, img_size, 3), PAD_COLOR, dtype=np.uint8)
+        self._input = np.zeros((self.max_batch, 3, img_size, img_size), dtype=np.float32)
+
+        print(f"ONNX模型加载完成: {weights}，耗时 {time.time() - t0:.2f}s")
+
+        if warmup:
+            self.warmup()
+
+    def warmup(self, runs=2):
+        """
+        用空白输入跑几次前向推理，让算子初始化和内存分配在第一帧之前完成
+        """
+        t0 = time.time()
+        for _ in range(runs):
+            self._run(1)
+        print(f"模型预热完成，耗时 {time.time() - t0:.2f}s")
+
+    def _run(self, n):
+        """
+        对预分配输入的前n张图做前向推理；固定批次的模型始终按完整批次运行
+        """
+        batch = self._input[:n] if self.dynamic_batch else self._input
+        return self.session.run(None, {self.input_name: batch})[0][:n]
+
+    def infer(self, blobs, metas):
+        n = len(blobs)
+
+        # HWC转CHW并归一化 0 - 255 转 0.0 - 1.0，直接写入预分配的输入数组
+        for i, blob in enumerate(blobs):
+            np.multiply(blob.transpose(2, 0, 1), 1 / 255.0, out=self._input[i], casting='unsafe')
+
+        with timed('forward'):
+            pred = self._run(n)
+        with timed('nms'):
+            pred = numpy_non_max_suppression(pred, self.conf_thres, self.iou_thres)
+
+        return [self._to_results(det, meta) for det, meta in zip(pred, metas)]
+
+
+def create_detector(backend='torch', weights='yolov5s.pt', img_size=640, conf_thres=0.25, iou_thres=0.45,
+                    device='', threads=0, **kwargs):
+    """
+    按后端名称创建检测器：torch 使用PyTorch模型(.pt)，onnx 使用ONNX Runtime运行导出的模型(.onnx)
+    """
+    if backend == 'torch':
+        return FruitDetector(weights, img_size, conf_thres, iou_thres, device=device, **kwargs)
+    if backend == 'onnx':
+        return OnnxFruitDetector(weights, img_size, conf_thres, iou_thres, threads=threads, **kwargs)
+    raise ValueError(f"不支持的推理后端: {backend}，可选: {', '.join(BACKENDS)}")
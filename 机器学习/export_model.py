@@ -1,11 +1,26 @@
 import argparse
 import os
+import shutil
+import sys
 import torch
+import yaml
 from pathlib import Path
 
 # 项目根目录
 ROOT = Path(__file__).parent.resolve()
 
+INT8_FORMATS = ('onnx', 'tflite')  # 支持INT8量化的导出格式
+
+# YOLOv5 export.py 各格式的输出文件名后缀（新旧版本命名不同，按顺序查找）
+EXPORT_SUFFIXES = {
+    'torchscript': ['.torchscript', '.torchscript.pt'],
+    'onnx': ['.onnx'],
+    'tflite': ['-fp16.tflite', '.tflite'],
+    'openvino': ['_openvino_model'],
+    'paddle': ['_paddle_model'],
+    'ncnn': ['_ncnn_model'],
+}
+
 def parse_args():
     parser = argparse.ArgumentParser(description='导出水果识别模型')
     parser.add_argument('--weights', type=str, default=ROOT / 'models/best.pt', 
@@ -19,11 +34,169 @@ def parse_args():
                         help='cuda设备，例如 0 或 0,1,2,3 或 cpu')
     parser.add_argument('--include', nargs='+', default=['onnx'],
                         help='可选的导出格式列表')
+    parser.add_argument('--int8', action='store_true',
+                        help='额外导出INT8训练后量化模型（onnx/tflite），并与FP32模型对比')
+    parser.add_argument('--data', type=str, default=ROOT / 'dataset/fruits.yaml',
+                        help='数据集配置文件（类别名称）')
+    parser.add_argument('--calib-dir', type=str, default=ROOT / 'dataset/images/val',
+                        help='INT8量化的校准图像目录')
+    parser.add_argument('--calib-images', type=int, default=100,
+                        help='校准使用的图像数量')
+    parser.add_argument('--eval-images', type=int, default=0,
+                        help='评估mAP使用的验证图像数量，0 表示全部')
+    parser.add_argument('--verify', action='store_true',
+                        help='导出后运行 verify_exports.py：对比输出、测量延迟并写入报告')
     return parser.parse_args()
 
+def collect_export(weights, fmt, output_dir, suffixes=None):
+    """
+    把YOLOv5写在权重文件旁边的导出结果移动到 output_dir，返回新路径，没找到返回None
+    """
+    for suffix in suffixes or EXPORT_SUFFIXES[fmt]:
+        source = weights.with_name(f"{weights.stem}{suffix}")
+        if source.exists():
+            target = output_dir / source.name
+            if target.is_dir():
+                shutil.rmtree(target)
+            shutil.move(str(source), str(target))
+            return target
+    return None
+
+def head_node_names(model):
+    """
+    Detect层中解码检测框的算子（最后几个卷积之后的Sigmoid/Mul/Add/Concat等）
+    这些算子的数值范围差异很大，量化后精度损失严重，保持FP32
+    """
+    consumers = {}
+    for node in model.graph.node:
+        for name in node.input:
+            consumers.setdefault(name, []).append(node)
+
+    # 逆拓扑序标记下游是否还有卷积：没有下游卷积的非卷积算子就是检测头的后处理
+    feeds_conv = {}
+    for node in reversed(model.graph.node):
+        feeds_conv[id(node)] = any(c.op_type == 'Conv' or feeds_conv.get(id(c), False)
+                                   for name in node.output for c in consumers.get(name, []))
+    return [node.name for node in model.graph.node if node.op_type != 'Conv' and not feeds_conv[id(node)]]
+
+def quantize_onnx(fp32_path, int8_path, calib_images):
+    """
+    用验证集图像校准，静态量化为INT8（QDQ格式，卷积权重按通道量化）
+    """
+    import onnx
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat,
+                                          QuantType, quantize_static)
+    from model_eval import OnnxRunner, preprocess
+
+    runner = OnnxRunner(fp32_path)
+
+    class ValCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self.images = iter(calib_images)
+
+        def get_next(self):
+            for path in self.images:
+                prepared = preprocess(path, runner.img_size)
+                if prepared is not None:  # 跳过无法读取的图像
+                    return {runner.input_name: prepared[0][None]}
+            return None
+
+    # 旧版导出的算子可能没有名字，补上名字才能指定不量化的算子
+    model = onnx.load(str(fp32_path))
+    for i, node in enumerate(model.graph.node):
+        if not node.name:
+            node.name = f"{node.op_type}_{i}"
+    named_path = int8_path.with_name(f"{fp32_path.stem}-named.onnx")
+    onnx.save(model, str(named_path))
+
+    try:
+        quantize_static(str(named_path), str(int8_path), ValCalibrationReader(),
+                        quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                        calibrate_method=CalibrationMethod.MinMax,
+                        nodes_to_exclude=head_node_names(model))
+    finally:
+        named_path.unlink()
+    print(f"INT8 ONNX模型: {int8_path}")
+
+def export_tflite_int8(args, output_dir):
+    """
+    使用YOLOv5的 --int8 导出全整数TFLite模型；YOLOv5用数据集配置中的 train 图像做校准，
+    这里生成一个 train 指向校准目录的临时配置
+    """
+    with open(args.data, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f)
+    calib_yaml = output_dir / 'calib.yaml'
+    calib_dir = str(Path(args.calib_dir).resolve())
+    with open(calib_yaml, 'w', encoding='utf-8') as f:
+        yaml.dump({'train': calib_dir, 'val': calib_dir, 'nc': len(data['names']), 'names': data['names']},
+                  f, allow_unicode=True)
+
+    export_script = ROOT / "yolov5/export.py"
+    export_cmd = (f"python {export_script} --weights {args.weights} --img {args.img_size} "
+                  f"--include tflite --int8 --data {calib_yaml} --device {args.device}")
+    print(f"执行命令: {export_cmd}")
+    os.system(export_cmd)
+
+def compare_models(models, eval_images, labels_dir):
+    """
+    对比各模型的文件大小、CPU推理延迟（批次1）和验证集 mAP@0.5
+    models: [(名称, 模型路径), ...]，第一个为基准
+    """
+    from model_eval import create_runner, evaluate_map50, measure_latency
+
+    rows = []
+    for name, path in models:
+        if not path.exists():
+            print(f"错误: 未找到{name}模型 {path}，无法对比")
+            sys.exit(1)
+        runner = create_runner(path)
+        median, p90 = measure_latency(runner)
+        map50, evaluated = evaluate_map50(runner, eval_images, labels_dir) if eval_images else (None, 0)
+        rows.append((name, path.stat().st_size / (1024 * 1024), median, p90, map50))
+
+    print(f"\n{'模型':<10}{'大小(MB)':>10}{'延迟中位数(ms)':>16}{'延迟p90(ms)':>14}{'mAP@0.5':>10}")
+    for name, size, median, p90, map50 in rows:
+        map_text = f"{map50:.4f}" if map50 is not None else '-'
+        print(f"{name:<10}{size:>10.2f}{median:>16.2f}{p90:>14.2f}{map_text:>10}")
+
+    base, quantized = rows[0], rows[-1]
+    print(f"\n大小缩小 {base[1] / quantized[1]:.2f} 倍，延迟加速 {base[2] / quantized[2]:.2f} 倍", end='')
+    if base[4] is not None:
+        print(f"，mAP@0.5 变化 {quantized[4] - base[4]:+.4f}（{evaluated} 张验证图像）")
+    else:
+        print("（验证集没有图像，未评估mAP）")
+
+def quantize_and_report(args, weights, output_dir):
+    from model_eval import list_images
+
+    calib_dir = Path(args.calib_dir)
+    calib_images = list_images(calib_dir, args.calib_images) if calib_dir.exists() else []
+    if not calib_images:
+        print(f"错误: 校准目录 {calib_dir} 中没有图像，无法进行INT8量化")
+        return
+    eval_images = list_images(calib_dir, args.eval_images or None)
+    labels_dir = calib_dir.parent.parent / 'labels' / calib_dir.name
+    print(f"\nINT8量化: 使用 {len(calib_images)} 张校准图像 ({calib_dir})")
+
+    if args.format == 'onnx':
+        fp32_path = output_dir / f"{weights.stem}.onnx"
+        int8_path = output_dir / f"{weights.stem}-int8.onnx"
+        quantize_onnx(fp32_path, int8_path, calib_images)
+        compare_models([('FP32', fp32_path), ('INT8', int8_path)], eval_images, labels_dir)
+    else:
+        export_tflite_int8(args, output_dir)
+        int8_path = collect_export(weights, 'tflite', output_dir, ['-int8.tflite'])
+        compare_models([('FP16', output_dir / f"{weights.stem}-fp16.tflite"),
+                        ('INT8', int8_path or output_dir / f"{weights.stem}-int8.tflite")], eval_images, labels_dir)
+
+
 def main():
     args = parse_args()
     print(f"开始导出模型: {args.weights}")
+    if args.int8 and args.format not in INT8_FORMATS:
+        print(f"错误: INT8量化只支持 {', '.join(INT8_FORMATS)} 格式")
+        return
     
     # 检查权重文件是否存在
     weights = Path(args.weights)
@@ -42,33 +215,23 @@ def main():
     print(f"执行命令: {export_cmd}")
     os.system(export_cmd)
     
-    # 显示导出结果
-    export_formats = {
-        'torchscript': '.pt',
-        'onnx': '.onnx',
-        'tflite': '.tflite',
-        'openvino': '_openvino_model',
-        'paddle': '_paddle_model',
-        'ncnn': '_ncnn_model'
-    }
+    # YOLOv5把导出结果写在权重文件所在目录，移动到 models/exported
+    exported_file = collect_export(weights, args.format, output_dir)
+    if exported_file is None:
+        print(f"警告: 未在 {weights.parent} 中找到导出的 {args.format} 模型")
+        return
+    print(f"成功导出模型: {exported_file}")
+    from model_eval import export_size
+    print(f"模型大小: {export_size(exported_file) / (1024 * 1024):.2f} MB")
     
-    # 检查是否成功导出
-    weight_name = weights.stem
-    if args.format in export_formats:
-        ext = export_formats[args.format]
-        if args.format in ['openvino', 'paddle', 'ncnn']:
-            exported_file = ROOT / f"{weight_name}{ext}"
-            if exported_file.exists():
-                print(f"成功导出模型: {exported_file}")
-            else:
-                print(f"警告: 未找到导出的模型文件 {exported_file}")
-        else:
-            exported_file = ROOT / f"{weight_name}{ext}"
-            if exported_file.exists():
-                print(f"成功导出模型: {exported_file}")
-                print(f"模型大小: {exported_file.stat().st_size / (1024 * 1024):.2f} MB")
-            else:
-                print(f"警告: 未找到导出的模型文件 {exported_file}")
+    # INT8训练后量化
+    if args.int8:
+        quantize_and_report(args, weights, output_dir)
+
+    # 加载导出的模型，与 .pt 模型对比输出并测量延迟
+    if args.verify:
+        from verify_exports import verify_exports
+        verify_exports(weights, output_dir, img_size=args.img_size)
 
 if __name__ == "__main__":
     main()
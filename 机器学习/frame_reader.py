@@ -0,0 +1,151 @@
+import time
+
+import cv2
+import serial
+import numpy as np
+
+from metrics import get_logger, inc, observe, timed
+
+log = get_logger('frame_reader')
+
+# 帧格式：帧起始标记(2字节) + 宽度(2字节) + 高度(2字节) + 像素格式(1字节) + 像素数据
+FRAME_START = b'\x01\xfe'  # 帧起始标记，与固件 camera_refresh_1 一致
+HEADER_SIZE = 5
+PIXEL_BGR888 = 0  # 每像素3字节，原样作为BGR图像
+PIXEL_RGB565 = 1  # 每像素2字节，高字节在前（OV7670 原生输出，固件按读出顺序发送）
+PIXEL_YUV422 = 2  # 每两个像素4字节，Y0 U Y1 V
+BYTES_PER_PIXEL = {PIXEL_BGR888: 3, PIXEL_RGB565: 2, PIXEL_YUV422: 2}
+PIXEL_FORMAT_NAMES = {'bgr888': PIXEL_BGR888, 'rgb565': PIXEL_RGB565, 'yuv422': PIXEL_YUV422}
+MAX_WIDTH = 640  # 允许的最大图像宽度，用于预分配缓冲区和校验帧头
+MAX_HEIGHT = 480  # 允许的最大图像高度
+
+
+class SerialFrameReader:
+    """
+    持续读取OV7670串口图像帧
+    串口在整个采集过程中保持打开，每帧先同步到帧起始标记，再用 readinto
+    直接写入预分配的环形缓冲区，返回的numpy数组是缓冲区的视图，不做复制
+    RGB565/YUV422 帧用 OpenCV 整帧转换到预分配的BGR环形缓冲区，每帧传输量只有BGR888的2/3
+    """
+
+    def __init__(self, port, baudrate=115200, timeout=1, num_buffers=4,
+                 max_width=MAX_WIDTH, max_height=MAX_HEIGHT):
+        self.max_width = max_width
+        self.max_height = max_height
+
+        # 预分配环形缓冲区：视图在之后 num_buffers - 1 帧内保持有效
+        frame_bytes = max_width * max_height * 3
+        self._buffers = [bytearray(frame_bytes) for _ in range(num_buffers)]
+        self._views = [memoryview(buf) for buf in self._buffers]
+        self._next = 0
+
+        # 2字节格式的转换缓冲区：接收缓冲区只需要一个，BGR输出按环形复用
+        self._raw = bytearray(max_width * max_height * 2)
+        self._raw_view = memoryview(self._raw)
+        self._swapped = np.empty(max_width * max_height, dtype=np.uint16)  # RGB565转为本机字节序
+
+        # 统计信息
+        self.frames = 0  # 成功接收的帧数
+        self.resyncs = 0  # 因帧头异常重新同步的次数
+        self.incomplete = 0  # 数据不完整而丢弃的帧数
+
+        self.ser = serial.Serial(port, baudrate, timeout=timeout)
+        print(f"成功打开串口: {port}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __iter__(self):
+        """
+        持续产出图像帧，读取超时的空档会被跳过
+        """
+        while self.ser.is_open:
+            frame = self.read_frame()
+            if frame is not None:
+                yield frame
+
+    def close(self):
+        if self.ser.is_open:
+            self.ser.close()
+
+    def _sync(self):
+        """
+        丢弃数据直到读到帧起始标记，超时返回False
+        """
+        data = self.ser.read_until(FRAME_START)
+        return data.endswith(FRAME_START)
+
+    def _read_exact(self, view):
+        """
+        将数据直接读入view，返回实际读取的字节数
+        """
+        got = 0
+        while got < len(view):
+            n = self.ser.readinto(view[got:])
+            if not n:
+                break
+            got += n
+        return got
+
+    def read_frame(self):
+        """
+        读取下一帧图像，返回 HxWx3 的BGR uint8视图；超时或数据不完整时返回None
+        """
+        while True:
+            if not self._sync():
+                return None
+
+            header = self.ser.read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE:
+                return None
+            width = int.from_bytes(header[:2], byteorder='little')
+            height = int.from_bytes(header[2:4], byteorder='little')
+            pixel_format = header[4]
+
+            # 帧头异常说明同步到了像素数据中的伪标记，重新同步
+            if not (0 < width <= self.max_width and 0 < height <= self.max_height) \
+                    or pixel_format not in BYTES_PER_PIXEL \
+                    or (pixel_format == PIXEL_YUV422 and width % 2):
+                self.resyncs += 1
+                inc('frame_resyncs')
+                continue
+
+            size = width * height * BYTES_PER_PIXEL[pixel_format]
+            index = self._next
+            target = self._views[index] if pixel_format == PIXEL_BGR888 else self._raw_view
+            t0 = time.perf_counter()
+            got = self._read_exact(target[:size])
+            observe('serial_read', time.perf_counter() - t0)
+            if got != size:
+                self.incomplete += 1
+                inc('frames_incomplete')
+                log.warning("数据接收不完整，丢弃该帧 (%dx%d)", width, height)
+                return None
+
+            self._next = (index + 1) % len(self._buffers)
+            self.frames += 1
+            inc('frames')
+            frame = np.frombuffer(self._buffers[index], np.uint8, count=width * height * 3)
+            frame = frame.reshape((height, width, 3))
+            if pixel_format != PIXEL_BGR888:
+                with timed('frame_decode'):
+                    self._decode(pixel_format, width, height, frame)
+            return frame
+
+    def _decode(self, pixel_format, width, height, out):
+        """
+        将接收缓冲区中的2字节像素整帧转换为BGR，写入out
+        """
+        pixels = width * height
+        raw = np.frombuffer(self._raw, np.uint8, count=pixels * 2)
+        if pixel_format == PIXEL_RGB565:
+            # 固件按高字节在前发送，转为本机字节序后交给OpenCV（OpenCV的BGR565即R在高5位）
+            swapped = self._swapped[:pixels]
+            np.copyto(swapped, raw.view('>u2'))
+            src = swapped.view(np.uint8).reshape((height, width, 2))
+            cv2.cvtColor(src, cv2.COLOR_BGR5652BGR, dst=out)
+        else:
+            cv2.cvtColor(raw.reshape((height, width, 2)), cv2.COLOR_YUV2BGR_YUYV, dst=out)
@@ -0,0 +1,208 @@
+"""
+训练图像预解码缓存
+训练时每个epoch都要重新解码和缩放所有JPEG，在只有CPU的训练机上这部分耗时占了大头。
+本脚本把 dataset/images/* 中的图像一次性解码、按长边缩放到 --img-size，
+写入一个内存映射的uint8数组（每张图像占一个 S x S x 3 的槽位，图像放在左上角），
+另有JSON索引记录每张图像的槽位、原始尺寸、缩放后尺寸和内容哈希。
+图像内容变化（按SHA1判断）时只重新解码变化的图像。
+
+    python image_cache.py --img-size 640
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# 项目根目录
+ROOT = Path(__file__).parent.resolve()
+
+IMAGES_DIR = ROOT / 'dataset/images'
+CACHE_DIR = ROOT / 'dataset/cache'
+IMG_FORMATS = ('.bmp', '.jpg', '.jpeg', '.png', '.tif', '.tiff', '.webp')
+
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_resized(path, img_size):
+    """
+    解码图像并按长边缩放到 img_size，与YOLOv5 load_image 的缩放方式一致
+    """
+    img = cv2.imread(str(path))  # BGR
+    if img is None:
+        raise ValueError(f"无法读取图像 {path}")
+    h0, w0 = img.shape[:2]
+    r = img_size / max(h0, w0)
+    if r != 1:
+        interp = cv2.INTER_AREA if r < 1 else cv2.INTER_LINEAR
+        img = cv2.resize(img, (min(round(w0 * r), img_size), min(round(h0 * r), img_size)), interpolation=interp)
+    return img, (h0, w0)
+
+
+def cache_paths(split, img_size):
+    return CACHE_DIR / f"{split}_{img_size}.npy", CACHE_DIR / f"{split}_{img_size}.json"
+
+
+class ImageCache:
+    """
+    一个数据集划分（train/val）在某个尺寸下的缓存
+    """
+
+    def __init__(self, split, img_size):
+        self.split = split
+        self.img_size = img_size
+        self.image_dir = IMAGES_DIR / split
+        self.array_path, self.index_path = cache_paths(split, img_size)
+        self.entries = []  # 与数组槽位一一对应的索引项
+        self.array = None
+
+    def load_index(self):
+        if not self.index_path.exists():
+            return []
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('img_size') != self.img_size:
+            return []
+        return index['images']
+
+    def open(self, verify=True):
+        """
+        以只读方式打开缓存，返回 {图像绝对路径: 槽位}
+        verify 为True时检查文件大小和修改时间，变化的图像再按内容哈希确认，不一致的不使用缓存
+        """
+        self.entries = self.load_index()
+        if not self.entries or not self.array_path.exists():
+            return {}
+        self.array = np.load(self.array_path, mmap_mode='r')
+
+        slots, stale = {}, 0
+        for slot, entry in enumerate(self.entries):
+            path = self.image_dir / entry['file']
+            if verify:
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                if (st.st_size, st.st_mtime_ns) != (entry['size'], entry['mtime_ns']) \
+                        and file_sha1(path) != entry['sha1']:
+                    stale += 1
+                    continue
+            slots[os.path.realpath(path)] = slot
+        if stale:
+            print(f"警告: {self.split} 有 {stale} 张图像已修改，将直接读取原图，请重新运行 image_cache.py")
+        return slots
+
+    def get(self, slot):
+        """
+        返回 (缩放后的图像副本, 原始尺寸, 缩放后尺寸)，与YOLOv5 load_image 的返回值相同
+        返回副本是因为训练时的数据增强会原地修改图像
+        """
+        entry = self.entries[slot]
+        h, w = entry['shape']
+        return np.array(self.array[slot, :h, :w]), tuple(entry['shape0']), (h, w)
+
+    def build(self, workers=8):
+        """
+        创建或更新缓存：内容未变化的图像直接复用已有槽位，其余图像重新解码
+        """
+        if not self.image_dir.is_dir():
+            print(f"警告: 图像目录 {self.image_dir} 不存在，跳过 {self.split}")
+            return
+        files = sorted(p for p in self.image_dir.iterdir() if p.suffix.lower() in IMG_FORMATS)
+        if not files:
+            print(f"{self.image_dir} 中没有图像，跳过")
+            return
+
+        old_entries = self.load_index()
+        old_array = np.load(self.array_path, mmap_mode='r') if old_entries and self.array_path.exists() else None
+        old = {entry['file']: (slot, entry) for slot, entry in enumerate(old_entries)} if old_array is not None else {}
+
+        entries, reuse, decode = [], {}, []
+        for slot, path in enumerate(files):
+            st = path.stat()
+            name = path.name
+            previous = old.get(name)
+            if previous and (st.st_size, st.st_mtime_ns) == (previous[1]['size'], previous[1]['mtime_ns']):
+                sha1 = previous[1]['sha1']
+            else:
+                sha1 = file_sha1(path)
+            entry = {'file': name, 'sha1': sha1, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+            if previous and previous[1]['sha1'] == sha1:
+                entry['shape0'], entry['shape'] = previous[1]['shape0'], previous[1]['shape']
+                reuse[slot] = previous[0]
+            else:
+                decode.append(slot)
+            entries.append(entry)
+
+        if not decode and len(reuse) == len(old_entries) and all(reuse[i] == i for i in reuse):
+            self._write_index(entries)  # 只有文件时间变化
+            print(f"{self.split}: {len(files)} 张图像的缓存已是最新")
+            return
+
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.array_path.with_suffix('.tmp.npy')
+        size = self.img_size
+        array = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=(len(files), size, size, 3))
+        for slot, old_slot in reuse.items():
+            array[slot] = old_array[old_slot]
+
+        def decode_one(slot):
+            img, shape0 = load_resized(files[slot], size)
+            h, w = img.shape[:2]
+            array[slot, :h, :w] = img
+            entries[slot]['shape0'], entries[slot]['shape'] = list(shape0), [h, w]
+
+        # cv2 解码和缩放时释放GIL，线程池即可并行
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(decode_one, decode))
+
+        array.flush()
+        del array, old_array
+        os.replace(tmp_path, self.array_path)
+        self._write_index(entries)
+        print(f"{self.split}: {len(files)} 张图像，复用 {len(reuse)} 张，重新解码 {len(decode)} 张，"
+              f"缓存大小 {self.array_path.stat().st_size / 1024 ** 3:.2f} GB")
+
+    def _write_index(self, entries):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            json.dump({'img_size': self.img_size, 'images': entries}, f, ensure_ascii=False)
+
+
+def prepare_cache(img_size, splits=None, workers=8):
+    """
+    为 dataset/images 下的各个划分创建或更新缓存
+    """
+    if not splits:
+        splits = sorted(p.name for p in IMAGES_DIR.iterdir() if p.is_dir()) if IMAGES_DIR.is_dir() else []
+    if not splits:
+        print(f"{IMAGES_DIR} 中没有可缓存的划分")
+    for split in splits:
+        ImageCache(split, img_size).build(workers)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='预解码训练图像到内存映射缓存')
+    parser.add_argument('--img-size', type=int, default=640, help='图像大小，需与训练时的 --img-size 一致')
+    parser.add_argument('--splits', nargs='+', default=None, help='要缓存的划分，默认 dataset/images 下的所有目录')
+    parser.add_argument('--workers', type=int, default=8, help='解码线程数')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    prepare_cache(args.img_size, args.splits, args.workers)
+
+
+if __name__ == "__main__":
+    main()
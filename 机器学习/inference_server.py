@@ -0,0 +1,408 @@
+"""
+本机推理服务：按 model_config.pbtxt 加载一次模型，各收银通道的采集程序通过
+Unix 套接字（不支持时使用本机TCP）发送图像帧，服务把同时到达的请求合并为动态批次推理，
+一台CPU机器即可服务所有收银摄像头。
+
+    python inference_server.py --weights models/exported/best.onnx
+    python ov7670_image_display.py -p COMx --continuous --server
+
+批次规则与 Triton 的 dynamic_batching 一致：第一个请求到达后最多等待 max_queue_delay_microseconds，
+期间到达的请求并入同一批，达到 max_batch_size，或达到 preferred_batch_size 且没有更多排队请求时立即推理。
+"""
+import argparse
+import json
+import os
+import queue
+import re
+import socket
+import struct
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from detector import create_detector, letterbox_params
+
+# 项目根目录
+ROOT = Path(__file__).parent.resolve()
+
+CONFIG_PATH = ROOT / 'model_config.pbtxt'
+SOCKET_PATH = '/tmp/smartfruits_inference.sock'  # Unix 套接字路径
+SERVER_HOST = '127.0.0.1'  # 不支持 Unix 套接字时（Windows）使用本机TCP
+SERVER_PORT = 50008
+STATS_INTERVAL = 10.0  # 打印服务统计信息的间隔（秒）
+
+# 请求：请求ID(4) + 高度(2) + 宽度(2) + 编码(1) + 数据长度(4) + 数据
+# 响应：请求ID(4) + 数据长度(4) + 检测结果JSON
+REQUEST_HEADER = struct.Struct('<IHHBI')
+RESPONSE_HEADER = struct.Struct('<II')
+ENCODING_RAW = 0  # BGR像素，每像素3字节
+ENCODING_JPEG = 1
+
+# model_config.pbtxt 中的 platform -> detector 后端
+PLATFORM_BACKENDS = {
+    'pytorch': 'torch',
+    'pytorch_libtorch': 'torch',
+    'onnxruntime_onnx': 'onnx',
+}
+
+_TOKEN = re.compile(r'"[^"]*"|[{}\[\]:,]|[^\s{}\[\]:,]+')
+
+
+def _scalar(token):
+    if token.startswith('"'):
+        return token[1:-1]
+    for cast in (int, float):
+        try:
+            return cast(token)
+        except ValueError:
+            pass
+    return token  # 枚举值，例如 TYPE_FP32
+
+
+def _parse_block(tokens, i, end=None):
+    block, repeated = {}, set()
+    while i < len(tokens) and tokens[i] != end:
+        key = tokens[i]
+        i += 2 if tokens[i + 1] == ':' else 1  # 子消息的冒号可以省略
+        if tokens[i] == '{':
+            value, i = _parse_block(tokens, i + 1, '}')
+        elif tokens[i] == '[':
+            value, i = [], i + 1
+            while tokens[i] != ']':
+                if tokens[i] != ',':
+                    value.append(_scalar(tokens[i]))
+                i += 1
+        else:
+            value = _scalar(tokens[i])
+        i += 1
+        # 重复的字段（例如多个 input）合并为列表
+        if key in block:
+            if key not in repeated:
+                block[key] = [block[key]]
+                repeated.add(key)
+            block[key].append(value)
+        else:
+            block[key] = value
+    return block, i
+
+
+def load_model_config(path=CONFIG_PATH):
+    """
+    读取 Triton 文本格式的模型配置，返回字典（只支持本项目用到的语法，不依赖protobuf）
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = re.sub(r'#.*', '', f.read())
+    config, _ = _parse_block(_TOKEN.findall(text), 0)
+    return config
+
+
+def config_img_size(config):
+    """
+    模型配置中第一个输入的边长（dims 的最后一维）
+    """
+    model_input = config['input'][0] if isinstance(config['input'], list) else config['input']
+    return model_input['dims'][-1]
+
+
+def server_address():
+    """
+    默认服务地址：支持 Unix 套接字的系统使用套接字文件，否则使用本机TCP端口
+    """
+    return SOCKET_PATH if hasattr(socket, 'AF_UNIX') else (SERVER_HOST, SERVER_PORT)
+
+
+def _recv_exact(sock, size):
+    data = bytearray(size)
+    view = memoryview(data)
+    got = 0
+    while got < size:
+        n = sock.recv_into(view[got:])
+        if not n:
+            raise ConnectionError("连接已关闭")
+        got += n
+    return data
+
+
+class _Request:
+    __slots__ = ('frame', 'request_id', 'reply', 'arrived')
+
+    def __init__(self, frame, request_id, reply):
+        self.frame = frame
+        self.request_id = request_id
+        self.reply = reply
+        self.arrived = time.perf_counter()
+
+
+class InferenceServer:
+    """
+    推理服务：每个客户端连接一个接收线程，请求放入同一个队列，由批处理线程合并推理后按请求ID回复
+    """
+
+    def __init__(self, detector, max_batch_size=8, max_queue_delay=0.005, preferred_batch_sizes=(),
+                 address=None):
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_queue_delay = max_queue_delay
+        self.preferred_batch_sizes = set(preferred_batch_sizes)
+        self.address = address or server_address()
+
+        self._requests = queue.Queue()
+        self._stop = threading.Event()
+        self._server = None
+        self._threads = []
+
+        # 统计信息
+        self.requests = 0  # 已完成的请求数
+        self.batches = 0  # 已执行的批次数
+        self.queue_time = 0.0  # 请求在队列中等待的累计时间
+        self.infer_time = 0.0  # 批次推理的累计时间
+
+    @classmethod
+    def from_config(cls, config_path=CONFIG_PATH, weights=None, threads=0, address=None, max_queue_delay=None):
+        """
+        按模型配置创建服务：后端、输入尺寸、最大批次和动态批次参数都取自配置文件
+        """
+        config = load_model_config(config_path)
+        backend = PLATFORM_BACKENDS.get(config.get('platform'), 'onnx')
+        img_size = config_img_size(config)
+        max_batch_size = config.get('max_batch_size', 1) or 1
+        batching = config.get('dynamic_batching', {})
+        preferred = batching.get('preferred_batch_size', [])
+        preferred = preferred if isinstance(preferred, list) else [preferred]
+        if max_queue_delay is None:
+            max_queue_delay = batching.get('max_queue_delay_microseconds', 0) / 1e6
+
+        if weights is None:
+            weights = ROOT / ('models/best.pt' if backend == 'torch' else 'models/exported/best.onnx')
+        print(f"模型 {config.get('name')}: {backend} 后端，输入 {img_size}，最大批次 {max_batch_size}，"
+              f"最长排队 {max_queue_delay * 1000:.1f}ms")
+        detector = create_detector(backend, str(weights), img_size, threads=threads, max_batch=max_batch_size)
+        return cls(detector, max_batch_size, max_queue_delay, preferred, address)
+
+    def start(self):
+        if isinstance(self.address, str):
+            if os.path.exists(self.address):
+                os.unlink(self.address)  # 上次异常退出留下的套接字文件
+            self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            if os.name != 'nt':
+                self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(self.address)
+        self._server.listen()
+        for name, target in (('accept', self._accept_loop), ('batch', self._batch_loop)):
+            thread = threading.Thread(target=target, name=f"inference-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"推理服务已启动: {self.address}")
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._server is not None:
+            try:
+                self._server.shutdown(socket.SHUT_RDWR)  # 唤醒阻塞在 accept 上的线程
+            except OSError:
+                pass
+            self._server.close()
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.unlink(self.address)
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+    def wait(self, timeout):
+        return not self._stop.wait(timeout)
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._client_loop, args=(conn,), name="inference-client", daemon=True).start()
+
+    def _client_loop(self, conn):
+        """
+        读取一个客户端的请求，客户端可以连续发送多个请求，响应按请求ID对应
+        """
+        lock = threading.Lock()
+
+        def reply(request_id, results):
+            payload = json.dumps(results, ensure_ascii=False).encode('utf-8')
+            try:
+                with lock:
+                    conn.sendall(RESPONSE_HEADER.pack(request_id, len(payload)) + payload)
+            except OSError:
+                pass  # 客户端已断开
+
+        try:
+            while not self._stop.is_set():
+                request_id, height, width, encoding, size = REQUEST_HEADER.unpack(
+                    _recv_exact(conn, REQUEST_HEADER.size))
+                data = _recv_exact(conn, size)
+                if encoding == ENCODING_JPEG:
+                    frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+                else:
+                    frame = np.frombuffer(data, np.uint8).reshape((height, width, 3))
+                self._requests.put(_Request(frame, request_id, reply))
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            conn.close()
+
+    def _next_batch(self):
+        """
+        取出下一批请求：以第一个请求的到达时间为起点，最多等待 max_queue_delay
+        """
+        try:
+            batch = [self._requests.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = batch[0].arrived + self.max_queue_delay
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._requests.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            if len(batch) in self.preferred_batch_sizes:
+                break
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _batch_loop(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            t0 = time.perf_counter()
+            try:
+                results = self.detector.detect_many([request.frame for request in batch])
+            except Exception as e:
+                print(f"推理失败: {e}")
+                results = [[] for _ in batch]
+            t1 = time.perf_counter()
+
+            for request, result in zip(batch, results):
+                request.reply(request.request_id, result)
+                self.queue_time += t0 - request.arrived
+            self.requests += len(batch)
+            self.batches += 1
+            self.infer_time += t1 - t0
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch': self.requests / self.batches if self.batches else 0.0,
+            'queue_ms': 1000 * self.queue_time / self.requests if self.requests else 0.0,
+            'infer_ms': 1000 * self.infer_time / self.batches if self.batches else 0.0,
+            'pending': self._requests.qsize(),
+        }
+
+
+class InferenceClient:
+    """
+    推理服务的客户端，detect / detect_many 与检测器接口相同，可以直接替换本地检测器
+    同一个客户端可以被多个线程共享，请求按ID匹配响应
+    """
+
+    def __init__(self, address=None, jpeg_quality=0, timeout=10.0, config_path=CONFIG_PATH):
+        self.address = address or server_address()
+        self.img_size = config_img_size(load_model_config(config_path))  # 服务端的推理尺寸，用于计算还原信息
+        family = socket.AF_UNIX if isinstance(self.address, str) else socket.AF_INET
+        self._sock = socket.socket(family, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(self.address)
+        self.jpeg_quality = jpeg_quality  # 大于0时以JPEG编码发送（跨机器时减少传输量）
+
+        self._send_lock = threading.Lock()
+        self._recv_lock = threading.Lock()
+        self._next_id = 0
+        self._responses = {}  # 请求ID -> 检测结果（由其他线程先读到的响应）
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._sock.close()
+
+    def submit(self, frame):
+        """
+        发送一帧，返回请求ID，之后用 result(请求ID) 取回检测结果
+        """
+        if self.jpeg_quality:
+            ok, data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            encoding, data = ENCODING_JPEG, data.tobytes()
+        else:
+            encoding, data = ENCODING_RAW, np.ascontiguousarray(frame).reshape(-1).data
+        height, width = frame.shape[:2]
+        with self._send_lock:
+            request_id = self._next_id
+            self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+            self._sock.sendall(REQUEST_HEADER.pack(request_id, height, width, encoding, len(data)))
+            self._sock.sendall(data)
+        return request_id
+
+    def result(self, request_id):
+        with self._recv_lock:
+            while request_id not in self._responses:
+                response_id, size = RESPONSE_HEADER.unpack(_recv_exact(self._sock, RESPONSE_HEADER.size))
+                self._responses[response_id] = json.loads(_recv_exact(self._sock, size).decode('utf-8'))
+            return self._responses.pop(request_id)
+
+    def detect(self, frame):
+        return self.result(self.submit(frame))
+
+    def detect_many(self, frames):
+        # 先全部发送，服务端可以把它们合并进同一批
+        return [self.result(request_id) for request_id in [self.submit(frame) for frame in frames]]
+
+    def preprocess(self, frame, out=None):
+        # letterbox在服务端完成，FramePipeline 中直接传递原图；
+        # 还原信息与本地检测器相同，GatedDetector 按它判断画面尺寸是否变化
+        return frame, letterbox_params(frame.shape, self.img_size) + (frame.shape,)
+
+    def infer(self, blobs, metas):
+        return self.detect_many(blobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本机推理服务（动态批次）')
+    parser.add_argument('--config', type=str, default=CONFIG_PATH, help='模型配置文件')
+    parser.add_argument('--weights', type=str, default=None, help='模型文件，默认按配置中的 platform 选择')
+    parser.add_argument('--socket', type=str, default=None, help=f'Unix 套接字路径，默认 {SOCKET_PATH}')
+    parser.add_argument('--tcp', action='store_true', help=f'使用本机TCP端口 {SERVER_PORT} 而不是 Unix 套接字')
+    parser.add_argument('--max-queue-delay-ms', type=float, default=None, help='最长排队时间，默认取配置文件')
+    parser.add_argument('--threads', type=int, default=0, help='ONNX Runtime 线程数，0 表示自动')
+    args = parser.parse_args()
+
+    address = (SERVER_HOST, SERVER_PORT) if args.tcp else args.socket
+    delay = args.max_queue_delay_ms / 1000 if args.max_queue_delay_ms is not None else None
+    server = InferenceServer.from_config(args.config, args.weights, args.threads, address, delay).start()
+    try:
+        while server.wait(STATS_INTERVAL):
+            stats = server.stats()
+            print(f"已完成 {stats['requests']} 个请求, {stats['batches']} 批, 平均批次 {stats['mean_batch']:.2f}, "
+                  f"平均排队 {stats['queue_ms']:.1f}ms, 平均推理 {stats['infer_ms']:.1f}ms/批, "
+                  f"排队中 {stats['pending']}")
+    except KeyboardInterrupt:
+        print("\n推理服务已停止")
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+采集、推理、入库各阶段共用的性能指标与日志
+各阶段用 timed()/observe() 记录耗时直方图，用 inc() 记录计数，开销只有一次加锁和二分查找；
+指标以 Prometheus 文本格式导出，可以写入文件（node_exporter textfile 收集器）或通过本机HTTP端口读取。
+逐行/逐帧的 print 改为分级日志，相同消息在 LOG_INTERVAL 秒内只输出一次，并注明省略的条数。
+
+阶段名称：serial_read, frame_decode, preprocess, forward, nms, draw, parse, db_insert
+
+重量模块/MySQL衔接脚本/metrics.py 是同一内容的副本；修改时两份同步修改
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+PREFIX = 'smartfruits'
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)  # 秒
+METRICS_HOST = '127.0.0.1'
+EXPORT_INTERVAL = 10.0  # 写入指标文件的间隔（秒）
+LOG_INTERVAL = 5.0  # 相同日志消息的最短输出间隔（秒）
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
+
+class Histogram:
+    """
+    累计直方图：按 Prometheus 的 le 桶统计观测值个数，另记总和和总数
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+
+_stages = {}  # 阶段名称 -> Histogram
+_counters = {}  # 计数名称 -> Counter
+_gauges = {}  # 名称 -> 返回当前值的函数
+_registry_lock = threading.Lock()
+
+
+def stage(name):
+    histogram = _stages.get(name)
+    if histogram is None:
+        with _registry_lock:
+            histogram = _stages.setdefault(name, Histogram())
+    return histogram
+
+
+def observe(name, seconds):
+    """
+    记录一次阶段耗时（秒）
+    """
+    stage(name).observe(seconds)
+
+
+@contextmanager
+def timed(name):
+    """
+    记录 with 代码块的耗时：with timed('forward'): ...
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage(name).observe(time.perf_counter() - t0)
+
+
+def inc(name, n=1):
+    """
+    计数加 n，例如 inc('frames')、inc('records_written', len(rows))
+    """
+    counter = _counters.get(name)
+    if counter is None:
+        with _registry_lock:
+            counter = _counters.setdefault(name, Counter())
+    counter.inc(n)
+
+
+def gauge(name, func):
+    """
+    注册一个在导出时才读取的当前值，例如队列长度：gauge('queue_depth', queue.qsize)
+    """
+    with _registry_lock:
+        _gauges[name] = func
+
+
+def render():
+    """
+    以 Prometheus 文本格式输出所有指标
+    """
+    lines = []
+    with _registry_lock:
+        stages = sorted(_stages.items())
+        counters = sorted(_counters.items())
+        gauges = sorted(_gauges.items())
+
+    if stages:
+        name = f'{PREFIX}_stage_seconds'
+        lines += [f'# HELP {name} 各处理阶段的耗时', f'# TYPE {name} histogram']
+        for stage_name, histogram in stages:
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for le, n in zip(list(histogram.buckets) + ['+Inf'], counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{{stage="{stage_name}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage_name}"}} {total:.6f}')
+            lines.append(f'{name}_count{{stage="{stage_name}"}} {count}')
+
+    for counter_name, counter in counters:
+        name = f'{PREFIX}_{counter_name}_total'
+        lines += [f'# TYPE {name} counter', f'{name} {counter.value}']
+
+    for gauge_name, func in gauges:
+        name = f'{PREFIX}_{gauge_name}'
+        try:
+            value = func()
+        except Exception:
+            continue
+        lines += [f'# TYPE {name} gauge', f'{name} {value}']
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(path):
+    """
+    原子地写入指标文件（先写临时文件再替换），收集器不会读到写了一半的文件
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 不为每次抓取打印访问日志
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def start_exporter(port=0, textfile=None, host=METRICS_HOST, interval=EXPORT_INTERVAL):
+    """
+    启动指标导出：port 不为0时在本机HTTP端口提供 /metrics，textfile 不为空时定期写入指标文件
+    """
+    log = get_logger('metrics')
+    if port:
+        server = _ThreadingHTTPServer((host, port), _MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        log.info("指标导出: http://%s:%d/metrics", host, port)
+    if textfile:
+        def write_periodically():
+            while True:
+                try:
+                    write_textfile(textfile)
+                except OSError as e:
+                    log.warning("写入指标文件失败: %s", e)
+                time.sleep(interval)
+
+        threading.Thread(target=write_periodically, name="metrics-textfile", daemon=True).start()
+        log.info("指标每 %.0f 秒写入 %s", interval, textfile)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    同一位置的同一条消息模板（不同参数视为相同消息）在 interval 秒内只输出一次，
+    下一次输出时附上期间省略的条数；ERROR 及以上级别不限流
+    """
+
+    def __init__(self, interval=LOG_INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self._last = {}  # (logger, 模板) -> [上次输出时间, 省略条数]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            state = self._last.get(key)
+            if state is not None and now - state[0] < self.interval:
+                state[1] += 1
+                return False
+            suppressed = state[1] if state else 0
+            self._last[key] = [now, 0]
+        if suppressed:
+            record.msg = f"{record.msg}（{self.interval:g}秒内省略 {suppressed} 条相同消息）"
+        return True
+
+
+_rate_limit = RateLimitFilter()
+
+
+def get_logger(name):
+    """
+    获取带限流的日志器；未调用 setup_logging 时默认输出 INFO 及以上级别
+    """
+    logger = logging.getLogger(f'{PREFIX}.{name}')
+    if _rate_limit not in logger.filters:
+        logger.addFilter(_rate_limit)
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    return logger
+
+
+def setup_logging(level='INFO', interval=LOG_INTERVAL):
+    """
+    设置日志级别（DEBUG/INFO/WARNING/ERROR）和相同消息的限流间隔
+    """
+    root = logging.getLogger()
+    for handler in list(root.handlers):  # 替换 get_logger 默认添加的配置（兼容 Python 3.7，没有 force 参数）
+        root.removeHandler(handler)
+    logging.basicConfig(level=level.upper(), format=LOG_FORMAT)
+    _rate_limit.interval = interval
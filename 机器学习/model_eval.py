@@ -0,0 +1,357 @@
+"""
+导出模型的评估工具：各导出格式的推理封装、CPU延迟测量和基于NumPy的 mAP@0.5 计算
+各格式的推理库按需导入，可以在只安装了 onnxruntime（或 tflite_runtime）的机器上评估导出的模型
+"""
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from detector import PAD_COLOR, letterbox_into, numpy_non_max_suppression, scale_boxes, xywh2xyxy
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+# 项目根目录
+ROOT = Path(__file__).parent.resolve()
+
+IMG_FORMATS = ('.bmp', '.jpg', '.jpeg', '.png', '.tif', '.tiff', '.webp')
+
+
+def load_tflite_interpreter(path, threads=None):
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tensorflow.lite import Interpreter
+        except ImportError:
+            raise ImportError("评估TFLite模型需要安装 tflite-runtime 或 tensorflow")
+    return Interpreter(model_path=str(path), num_threads=threads)
+
+
+class OnnxRunner:
+    """
+    ONNX模型前向推理：输入 (n, 3, S, S) float32，输出YOLOv5原始预测 (n, N, 5 + 类别数)
+    """
+
+    def __init__(self, path, threads=0):
+        if ort is None:
+            raise ImportError("评估ONNX模型需要安装onnxruntime: pip install onnxruntime")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(str(path), options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, self.img_size, _ = model_input.shape
+        self.batch = batch if isinstance(batch, int) else None  # None 表示动态批次
+
+    def __call__(self, blobs):
+        n = len(blobs)
+        if self.batch is None or n == self.batch:
+            return self.session.run(None, {self.input_name: blobs})[0]
+        # 固定批次的模型按批次补齐或拆分
+        outputs = []
+        for i in range(0, n, self.batch):
+            chunk = blobs[i:i + self.batch]
+            padded = np.zeros((self.batch,) + blobs.shape[1:], dtype=blobs.dtype)
+            padded[:len(chunk)] = chunk
+            outputs.append(self.session.run(None, {self.input_name: padded})[0][:len(chunk)])
+        return np.concatenate(outputs)
+
+
+class TfliteRunner:
+    """
+    TFLite模型前向推理，接口与 OnnxRunner 相同
+    YOLOv5导出的TFLite模型输入为NHWC、输出坐标按输入尺寸归一化，INT8模型的输入输出需要量化/反量化
+    """
+
+    def __init__(self, path, threads=None):
+        self.interpreter = load_tflite_interpreter(path, threads)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.img_size = int(self.input['shape'][1])
+
+    def __call__(self, blobs):
+        outputs = []
+        for blob in blobs:
+            x = blob.transpose(1, 2, 0)[None]
+            if self.input['dtype'] in (np.int8, np.uint8):
+                scale, zero_point = self.input['quantization']
+                x = (x / scale + zero_point).round().astype(self.input['dtype'])
+            self.interpreter.set_tensor(self.input['index'], x)
+            self.interpreter.invoke()
+            y = self.interpreter.get_tensor(self.output['index'])
+            if self.output['dtype'] in (np.int8, np.uint8):
+                scale, zero_point = self.output['quantization']
+                y = (y.astype(np.float32) - zero_point) * scale
+            y = y.astype(np.float32)
+            y[..., :4] *= self.img_size
+            outputs.append(y[0])
+        return np.stack(outputs)
+
+
+class TorchRunner:
+    """
+    PyTorch模型前向推理：.pt 权重（用作对比基准）或 TorchScript 模型，只使用CPU
+    TorchScript 按导出时的批次跟踪，批次不一致时逐张推理
+    """
+
+    def __init__(self, path, img_size=640, threads=0):
+        import torch
+        self.torch = torch
+        if threads:
+            torch.set_num_threads(threads)
+        self.img_size = img_size
+        self.scripted = path.suffix != '.pt'
+        if self.scripted:
+            self.model = torch.jit.load(str(path), map_location='cpu')
+        else:
+            sys.path.append(str(ROOT / 'yolov5'))
+            from models.experimental import attempt_load
+            self.model = attempt_load(str(path), device=torch.device('cpu'))
+        self.model.eval()
+        self.batched = True
+
+    def forward(self, x):
+        y = self.model(self.torch.from_numpy(x))
+        return (y[0] if isinstance(y, (list, tuple)) else y).numpy()
+
+    def __call__(self, blobs):
+        with self.torch.no_grad():
+            if self.batched:
+                try:
+                    return self.forward(blobs)
+                except RuntimeError:
+                    self.batched = False
+            return np.concatenate([self.forward(blobs[i:i + 1]) for i in range(len(blobs))])
+
+
+class OpenVinoRunner:
+    """
+    OpenVINO模型前向推理，path 为导出的 *_openvino_model 目录或其中的 .xml 文件
+    """
+
+    def __init__(self, path, threads=0):
+        from openvino.runtime import Core
+        xml = path if path.suffix == '.xml' else next(path.glob('*.xml'))
+        core = Core()
+        config = {'INFERENCE_NUM_THREADS': str(threads)} if threads else {}
+        self.model = core.compile_model(core.read_model(str(xml)), 'CPU', config)
+        shape = self.model.input(0).get_partial_shape()
+        self.img_size = shape[2].get_length()
+        self.batch = shape[0].get_length() if shape[0].is_static else None
+        self.output = self.model.output(0)
+
+    def __call__(self, blobs):
+        if self.batch is None or len(blobs) == self.batch:
+            return self.model([blobs])[self.output]
+        return np.concatenate([self.model([blobs[i:i + 1]])[self.output] for i in range(len(blobs))])
+
+
+class NcnnRunner:
+    """
+    ncnn模型前向推理（逐张），path 为导出的 *_ncnn_model 目录
+    """
+
+    def __init__(self, path, img_size=640, threads=0):
+        import ncnn
+        self.ncnn = ncnn
+        self.net = ncnn.Net()
+        if threads:
+            self.net.opt.num_threads = threads
+        self.net.load_param(str(next(path.glob('*.param'))))
+        self.net.load_model(str(next(path.glob('*.bin'))))
+        self.img_size = img_size
+
+    def __call__(self, blobs):
+        outputs = []
+        for blob in blobs:
+            extractor = self.net.create_extractor()
+            extractor.input('in0', self.ncnn.Mat(np.ascontiguousarray(blob)))
+            _, y = extractor.extract('out0')
+            y = np.array(y)
+            outputs.append(y.T if y.shape[0] < y.shape[1] else y)  # 输出可能为 (5 + 类别数, N)
+        return np.stack(outputs)
+
+
+def model_format(path):
+    """
+    按文件名判断导出格式
+    """
+    path = Path(path)
+    name = path.name
+    if name.endswith('_openvino_model') or path.suffix == '.xml':
+        return 'openvino'
+    if name.endswith('_ncnn_model'):
+        return 'ncnn'
+    if name.endswith('_paddle_model'):
+        return 'paddle'
+    if path.suffix == '.torchscript' or name.endswith('.torchscript.pt'):
+        return 'torchscript'
+    return {'.pt': 'pytorch', '.onnx': 'onnx', '.tflite': 'tflite'}.get(path.suffix, 'unknown')
+
+
+def create_runner(path, threads=0, img_size=640):
+    """
+    img_size 只用于输入尺寸不固定的格式（.pt、TorchScript、ncnn）
+    """
+    path = Path(path)
+    fmt = model_format(path)
+    if fmt == 'onnx':
+        return OnnxRunner(path, threads)
+    if fmt == 'tflite':
+        return TfliteRunner(path, threads or None)
+    if fmt in ('pytorch', 'torchscript'):
+        return TorchRunner(path, img_size, threads)
+    if fmt == 'openvino':
+        return OpenVinoRunner(path, threads)
+    if fmt == 'ncnn':
+        return NcnnRunner(path, img_size, threads)
+    raise ValueError(f"不支持评估的模型格式: {path}")
+
+
+def export_size(path):
+    """
+    导出模型的大小（字节），OpenVINO/ncnn 等导出为目录的格式按目录内文件总和计算
+    """
+    path = Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+    return path.stat().st_size
+
+
+def list_images(images_dir, limit=None):
+    images = sorted(p for p in Path(images_dir).iterdir() if p.suffix.lower() in IMG_FORMATS)
+    return images[:limit] if limit else images
+
+
+def preprocess(path, img_size):
+    """
+    读取图像并letterbox为 (3, S, S) float32，返回 (输入, 还原检测框所需的参数)
+    图像无法读取时打印警告并返回None，调用方跳过该图像
+    """
+    image = cv2.imread(str(path))
+    if image is None:
+        print(f"警告: 无法读取图像 {path}，已跳过")
+        return None
+    buffer = np.full((img_size, img_size, 3), PAD_COLOR, dtype=np.uint8)
+    r, left, top = letterbox_into(image, buffer)
+    blob = buffer.transpose(2, 0, 1).astype(np.float32) / 255.0
+    return blob, (r, left, top, image.shape)
+
+
+def load_labels(label_path, shape):
+    """
+    读取YOLO标签，返回原图坐标的 (n, 5) 数组：类别, x1, y1, x2, y2
+    """
+    if not label_path.exists():
+        return np.zeros((0, 5), dtype=np.float32)
+    labels = np.loadtxt(label_path, dtype=np.float32, ndmin=2)
+    if not len(labels):
+        return np.zeros((0, 5), dtype=np.float32)
+    h, w = shape[:2]
+    boxes = xywh2xyxy(labels[:, 1:5]) * np.array([w, h, w, h], dtype=np.float32)
+    return np.concatenate([labels[:, :1], boxes], 1)
+
+
+def box_iou(a, b):
+    """
+    两组xyxy检测框之间的IoU矩阵
+    """
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:4], b[None, :, 2:4])
+    inter = (rb - lt).clip(0).prod(2)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None] - inter + 1e-9)
+
+
+def compute_ap(recall, precision):
+    """
+    按COCO的101点插值计算AP
+    """
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    return float(np.mean(np.interp(np.linspace(0, 1, 101), mrec, mpre)))
+
+
+def evaluate_map50(runner, images, labels_dir, conf_thres=0.001, iou_thres=0.6):
+    """
+    在带标签的图像上计算 mAP@0.5，返回 (mAP@0.5, 参与评估的图像数)
+    """
+    labels_dir = Path(labels_dir)
+    tp, conf, pred_cls, target_cls = [], [], [], []
+    for path in images:
+        prepared = preprocess(path, runner.img_size)
+        if prepared is None:
+            continue
+        blob, meta = prepared
+        det = numpy_non_max_suppression(runner(blob[None]), conf_thres, iou_thres)[0]
+        scale_boxes(det, *meta)
+        targets = load_labels(labels_dir / f"{path.stem}.txt", meta[3])
+        target_cls.append(targets[:, 0])
+
+        # 按置信度从高到低，与同类别中尚未匹配的标注框贪心匹配
+        matched = np.zeros(len(det), dtype=bool)
+        if len(det) and len(targets):
+            iou = box_iou(det[:, :4], targets[:, 1:])
+            iou[det[:, 5:6] != targets[None, :, 0]] = 0
+            used = np.zeros(len(targets), dtype=bool)
+            for i in np.argsort(-det[:, 4]):
+                candidates = np.where(~used & (iou[i] >= 0.5))[0]
+                if len(candidates):
+                    used[candidates[iou[i, candidates].argmax()]] = True
+                    matched[i] = True
+        tp.append(matched)
+        conf.append(det[:, 4])
+        pred_cls.append(det[:, 5])
+
+    if not tp:
+        return 0.0, 0
+    tp, conf, pred_cls = np.concatenate(tp), np.concatenate(conf), np.concatenate(pred_cls)
+    target_cls = np.concatenate(target_cls)
+    order = np.argsort(-conf)
+    tp, pred_cls = tp[order], pred_cls[order]
+
+    aps = []
+    for cls in np.unique(target_cls):
+        hits = tp[pred_cls == cls]
+        n_targets = int((target_cls == cls).sum())
+        if not len(hits):
+            aps.append(0.0)
+            continue
+        tpc = np.cumsum(hits)
+        fpc = np.cumsum(~hits)
+        aps.append(compute_ap(tpc / n_targets, tpc / (tpc + fpc)))
+    return (float(np.mean(aps)) if aps else 0.0), len(tp)
+
+
+def latency_samples(runner, batch=1, runs=50, warmup=5):
+    """
+    重复前向推理（不含预处理和NMS），返回每次的耗时数组（ms）
+    """
+    blobs = np.random.rand(batch, 3, runner.img_size, runner.img_size).astype(np.float32)
+    for _ in range(warmup):
+        runner(blobs)
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        runner(blobs)
+        times.append((time.perf_counter() - t0) * 1000)
+    return np.array(times)
+
+
+def measure_latency(runner, batch=1, runs=50, warmup=5):
+    """
+    测量CPU前向推理延迟，返回 (中位数ms, p90 ms)
+    """
+    times = latency_samples(runner, batch, runs, warmup)
+    return float(np.median(times)), float(np.percentile(times, 90))
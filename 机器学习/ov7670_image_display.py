@@ -4,17 +4,19 @@ import cv2
 import numpy as np
 import serial
 import time
-from PIL import Image
-import torch
 
 # 确保正确路径
 sys.path.append(os.path.join(os.path.dirname(__file__), 'yolov5'))
 
 # 导入YOLOv5模块
-from models.experimental import attempt_load
-from utils.general import check_img_size, non_max_suppression, scale_coords
 from utils.plots import plot_one_box
-from utils.torch_utils import select_device
+
+from change_gate import DIFF_THRESHOLD, GATE_METHODS, HASH_THRESHOLD, ChangeGate, GatedDetector
+from detector import BACKENDS, create_detector
+from inference_server import InferenceClient
+from metrics import get_logger, setup_logging, start_exporter, timed
+from frame_reader import SerialFrameReader
+from pipeline import FramePipeline
 
 # 配置参数
 weights = 'yolov5s.pt'  # 模型权重
@@ -22,131 +24,169 @@ img_size = 640  # 推理尺寸
 conf_thres = 0.25  # 置信度阈值
 iou_thres = 0.45  # NMS IOU阈值
 device = ''  # 设备选择
+backend = 'torch'  # 推理后端：torch 或 onnx
+onnx_threads = 0  # ONNX Runtime 线程数，0 表示自动
+
+log = get_logger('display')
+gate = None  # 画面变化门控（ChangeGate），None 表示每帧都推理
+use_server = False  # 使用本机推理服务（inference_server.py）而不是在本进程加载模型
 
 def get_serial_data(port, baudrate=115200, timeout=1):
     """
-    从串口获取图像数据
+    从串口获取单帧图像数据
     """
     try:
-        ser = serial.Serial(port, baudrate, timeout=timeout)
-        print(f"成功打开串口: {port}")
-        
-        # 等待数据
-        print("等待摄像头数据...")
-        
-        # 读取图像宽度和高度
-        width_bytes = ser.read(2)
-        height_bytes = ser.read(2)
-        
-        if len(width_bytes) < 2 or len(height_bytes) < 2:
-            print("无法读取图像尺寸数据")
-            return None
-            
-        width = int.from_bytes(width_bytes, byteorder='little')
-        height = int.from_bytes(height_bytes, byteorder='little')
-        print(f"图像尺寸: {width}x{height}")
-        
-        # 计算期望的数据大小
-        expected_size = width * height * 3  # RGB每像素3字节
-        
-        # 读取图像数据
-        image_data = bytearray()
-        remaining = expected_size
-        
-        while remaining > 0:
-            chunk = ser.read(min(1024, remaining))
-            if not chunk:
-                break
-            image_data.extend(chunk)
-            remaining -= len(chunk)
-            
-            # 显示进度
-            percent = ((expected_size - remaining) / expected_size) * 100
-            print(f"接收数据: {percent:.1f}%", end='\r')
-            
-        print("\n数据接收完毕")
-        
-        if len(image_data) != expected_size:
-            print(f"数据接收不完整: {len(image_data)}/{expected_size}")
-            return None
-            
-        # 转换为OpenCV图像格式
-        nparr = np.frombuffer(image_data, np.uint8)
-        img = nparr.reshape((height, width, 3))
-        
-        return img
-        
-    except Exception as e:
+        with SerialFrameReader(port, baudrate, timeout=timeout, num_buffers=1) as reader:
+            print("等待摄像头数据...")
+            img = reader.read_frame()
+            if img is None:
+                print("未能接收到完整的图像帧")
+                return None
+            print(f"图像尺寸: {img.shape[1]}x{img.shape[0]}")
+            return img.copy()
+
+    except serial.SerialException as e:
         print(f"串口通信错误: {e}")
         return None
-    finally:
-        if 'ser' in locals() and ser.is_open:
-            ser.close()
+
+_detector = None  # 常驻内存的检测器，首次检测时创建
+
+def get_detector():
+    """
+    获取常驻内存的检测器，模型只在第一次调用时加载和预热
+    """
+    global _detector
+    if _detector is None:
+        if use_server:
+            _detector = InferenceClient()
+        else:
+            _detector = create_detector(backend, weights, img_size, conf_thres, iou_thres,
+                                        device=device, threads=onnx_threads)
+        if gate is not None:
+            _detector = GatedDetector(_detector, gate)
+    return _detector
 
 def detect_fruits(image):
     """
     使用YOLOv5模型检测水果
     """
-    # 初始化
-    device = select_device(device)
-    model = attempt_load(weights, device=device)  # 加载FP32模型
-    stride = int(model.stride.max())  # 模型步长
-    imgsz = check_img_size(img_size, s=stride)  # 检查图像大小
-    
-    # 转换图像
-    img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    img = Image.fromarray(img)
-    
-    # 预处理
-    img = np.array(img)
-    img = img.transpose(2, 0, 1)  # HWC到CHW
-    img = torch.from_numpy(img).to(device)
-    img = img.float() / 255.0  # 0 - 255 转 0.0 - 1.0
-    if img.ndimension() == 3:
-        img = img.unsqueeze(0)
-    
-    # 推理
-    with torch.no_grad():
-        pred = model(img, augment=False)[0]
-    
-    # 应用NMS
-    pred = non_max_suppression(pred, conf_thres, iou_thres)
-    
-    # 处理检测结果
-    results = []
-    for i, det in enumerate(pred):
-        if len(det):
-            det[:, :4] = scale_coords(img.shape[2:], det[:, :4], image.shape).round()
-            for *xyxy, conf, cls in det:
-                results.append({
-                    'box': xyxy,
-                    'confidence': conf.item(),
-                    'class': int(cls.item()),
-                    'class_name': model.names[int(cls.item())]
-                })
-    
-    return results
+    return get_detector().detect(image)
 
 def draw_results(image, results):
     """
     在图像上绘制检测结果
     """
-    for result in results:
-        box = [int(x.item()) for x in result['box']]
-        label = f"{result['class_name']} {result['confidence']:.2f}"
-        plot_one_box(box, image, label=label, color=(0, 255, 0))
+    with timed('draw'):
+        for result in results:
+            box = [int(x) for x in result['box']]
+            label = f"{result['class_name']} {result['confidence']:.2f}"
+            plot_one_box(box, image, label=label, color=(0, 255, 0))
     
     return image
 
+def gate_summary():
+    """
+    门控的命中统计，未启用门控时为空
+    """
+    if gate is None:
+        return ""
+    stats = gate.stats()
+    return f", 复用结果 {stats['hits']} 帧 ({stats['hit_rate']:.0%})"
+
+def run_continuous(port, baudrate):
+    """
+    持续采集模式：串口和模型常驻，逐帧检测并显示，按q退出
+    """
+    detector = get_detector()
+    with SerialFrameReader(port, baudrate) as reader:
+        print("持续采集中，按q退出...")
+        t0 = time.time()
+        for image in reader:
+            results = detector.detect(image)
+            cv2.imshow("Fruit Detection", draw_results(image.copy(), results))
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+            if reader.frames % 30 == 0:
+                fps = reader.frames / (time.time() - t0)
+                log.info("已处理 %d 帧, %.1f FPS, 重新同步 %d 次, 丢弃 %d 帧%s",
+                         reader.frames, fps, reader.resyncs, reader.incomplete, gate_summary())
+    cv2.destroyAllWindows()
+
+def run_pipeline(port, baudrate, queue_size=2):
+    """
+    流水线模式：采集、预处理、推理各占一个线程，渲染在主线程，按q退出
+    推理跟不上时丢弃最旧的帧，帧率取决于最慢的阶段而不是各阶段耗时之和
+    """
+    detector = get_detector()
+    reader = SerialFrameReader(port, baudrate, num_buffers=FramePipeline.required_buffers(queue_size))
+    pipeline = FramePipeline(reader, detector, queue_size)
+    pipeline.start()
+    print("流水线模式运行中，按q退出...")
+
+    try:
+        for image, results in pipeline:
+            cv2.imshow("Fruit Detection", draw_results(image.copy(), results))
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+            stats = pipeline.stats()
+            if stats['frames'] and stats['frames'] % 30 == 0:
+                stages = ", ".join(f"{name} {ms:.1f}ms" for name, ms in stats['stage_ms'].items())
+                log.info("已渲染 %d 帧 [%s] 平均延迟 %.1fms, 丢弃 %d 帧%s", stats['frames'], stages,
+                         stats['latency_ms'], stats['dropped'], gate_summary())
+    finally:
+        pipeline.stop()
+        cv2.destroyAllWindows()
+
 def main():
+    global weights, backend, onnx_threads, gate, use_server
+
     # 命令行参数
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument('-p', '--port', type=str, required=True, help='串口号，如COM3')
+    parser.add_argument('-b', '--baudrate', type=int, default=115200, help='串口波特率')
+    parser.add_argument('--continuous', action='store_true', help='持续采集并检测，而不是只处理一帧')
+    parser.add_argument('--pipeline', action='store_true', help='以多线程流水线方式持续采集并检测')
+    parser.add_argument('--queue-size', type=int, default=2, help='流水线各阶段之间的队列长度')
+    parser.add_argument('--backend', type=str, default=backend, choices=BACKENDS, help='推理后端')
+    parser.add_argument('--weights', type=str, default=None, help='模型文件，onnx后端默认使用同名.onnx文件')
+    parser.add_argument('--threads', type=int, default=onnx_threads, help='ONNX Runtime 线程数，0 表示自动')
+    parser.add_argument('--server', action='store_true', help='发送到本机推理服务，由服务合并多个通道的请求批量推理')
+    parser.add_argument('--gate', action='store_true', help='画面没有变化时复用上一次的检测结果，跳过推理')
+    parser.add_argument('--gate-method', choices=GATE_METHODS, default='both', help='门控比较方式')
+    parser.add_argument('--gate-diff', type=float, default=DIFF_THRESHOLD, help='缩略图平均灰度差阈值，越小越灵敏')
+    parser.add_argument('--gate-hash', type=int, default=HASH_THRESHOLD, help='dHash汉明距离阈值，越小越灵敏')
+    parser.add_argument('--metrics-port', type=int, default=0, help='在本机该端口提供Prometheus指标，0 表示不启用')
+    parser.add_argument('--metrics-file', type=str, default=None, help='定期把Prometheus指标写入该文件')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='日志级别')
     args = parser.parse_args()
-    
+
+    setup_logging(args.log_level)  # 每30帧的统计信息按限流间隔输出
+    start_exporter(args.metrics_port, args.metrics_file)
+
+    # 根据命令行参数更新推理配置
+    backend = args.backend
+    onnx_threads = args.threads
+    use_server = args.server
+    if args.gate:
+        gate = ChangeGate(args.gate_diff, args.gate_hash, args.gate_method)
+    if args.weights:
+        weights = args.weights
+    elif backend == 'onnx':
+        weights = os.path.splitext(weights)[0] + '.onnx'
+
+    if args.pipeline:
+        run_pipeline(args.port, args.baudrate, args.queue_size)
+        return
+
+    if args.continuous:
+        run_continuous(args.port, args.baudrate)
+        return
+
     # 获取图像数据
-    image = get_serial_data(args.port)
+    image = get_serial_data(args.port, args.baudrate)
     
     if image is None:
         print("未能获取有效图像")
@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import deque
+
+
+class DropOldestQueue:
+    """
+    有界队列：队列满时丢弃最旧的元素，生产者永远不会因下游变慢而阻塞
+    """
+
+    def __init__(self, maxsize):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0  # 因队列已满被丢弃的元素数
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1  # deque 会自动挤出最旧的元素
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """
+        取出最早的元素，超时或队列已关闭时返回None
+        """
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class FramePipeline:
+    """
+    采集 → 预处理 → 推理 → 渲染 流水线
+    前三个阶段各自运行在独立线程中，通过有界的 DropOldestQueue 相连，
+    第N+1帧的串口读取与第N帧的推理重叠进行，整体帧率取决于最慢的阶段。
+    渲染阶段由调用方在主线程中迭代本对象完成（OpenCV窗口需要在主线程操作）。
+    """
+
+    STAGES = ('capture', 'preprocess', 'infer', 'render')
+
+    def __init__(self, reader, detector, queue_size=2):
+        self.reader = reader
+        self.detector = detector
+
+        self._to_preprocess = DropOldestQueue(queue_size)
+        self._to_infer = DropOldestQueue(queue_size)
+        self._to_render = DropOldestQueue(queue_size)
+        self._queues = (self._to_preprocess, self._to_infer, self._to_render)
+
+        # 预处理缓冲区池：同时存活的预处理结果不会超过 队列长度 + 正在推理 + 正在写入
+        self._blobs = [None] * (queue_size + 3)
+        self._next_blob = 0
+
+        self._stop = threading.Event()
+        self._threads = []
+        self._busy = {name: 0.0 for name in self.STAGES}  # 各阶段累计耗时
+        self._count = {name: 0 for name in self.STAGES}  # 各阶段处理帧数
+        self._latency = 0.0  # 采集到渲染的累计延迟
+
+    @staticmethod
+    def required_buffers(queue_size=2):
+        """
+        串口环形缓冲区的最小帧数：三个队列加上每个阶段正在处理的一帧，再加上正在接收的一帧
+        """
+        return 3 * queue_size + len(FramePipeline.STAGES) + 1
+
+    def start(self):
+        workers = [
+            ('capture', self._capture),
+            ('preprocess', self._preprocess),
+            ('infer', self._infer),
+        ]
+        for name, target in workers:
+            thread = threading.Thread(target=target, name=f"pipeline-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for q in self._queues:
+            q.close()
+        self.reader.close()
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+    def __iter__(self):
+        """
+        在调用线程中逐个产出 (原始图像, 检测结果)，渲染耗时计入 render 阶段
+        """
+        while not self._stop.is_set():
+            item = self._to_render.get(timeout=0.1)
+            if item is None:
+                continue
+            t0 = time.perf_counter()
+            yield item['image'], item['results']
+
+            now = time.perf_counter()
+            self._record('render', now - t0)
+            self._latency += now - item['t_capture']
+
+    def _record(self, stage, seconds):
+        self._busy[stage] += seconds
+        self._count[stage] += 1
+
+    def _run_stage(self, stage, inbox, outbox, func):
+        while not self._stop.is_set():
+            item = inbox.get(timeout=0.1)
+            if item is None:
+                continue
+            t0 = time.perf_counter()
+            func(item)
+            self._record(stage, time.perf_counter() - t0)
+            outbox.put(item)
+
+    def _capture(self):
+        t0 = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                image = self.reader.read_frame()
+            except Exception as e:  # 停止时关闭串口会打断正在进行的读取
+                if not self._stop.is_set():
+                    print(f"串口读取失败: {e}")
+                break
+            now = time.perf_counter()
+            if image is not None:
+                self._record('capture', now - t0)
+                self._to_preprocess.put({'image': image, 't_capture': now})
+            t0 = now
+
+    def _preprocess(self):
+        def preprocess(item):
+            index = self._next_blob
+            self._next_blob = (index + 1) % len(self._blobs)
+            item['blob'], item['meta'] = self.detector.preprocess(item['image'], self._blobs[index])
+            self._blobs[index] = item['blob']
+
+        self._run_stage('preprocess', self._to_preprocess, self._to_infer, preprocess)
+
+    def _infer(self):
+        def infer(item):
+            item['results'] = self.detector.infer([item['blob']], [item['meta']])[0]
+
+        self._run_stage('infer', self._to_infer, self._to_render, infer)
+
+    def stats(self):
+        """
+        返回各阶段平均耗时(ms)、丢帧数和平均端到端延迟
+        """
+        stage_ms = {name: 1000 * self._busy[name] / self._count[name] if self._count[name] else 0.0
+                    for name in self.STAGES}
+        rendered = self._count['render']
+        return {
+            'stage_ms': stage_ms,
+            'frames': rendered,
+            'dropped': sum(q.dropped for q in self._queues),
+            'latency_ms': 1000 * self._latency / rendered if rendered else 0.0,
+        }
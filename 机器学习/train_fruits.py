@@ -15,6 +15,7 @@ def parse_args():
     parser.add_argument('--batch-size', type=int, default=16, help='批次大小')
     parser.add_argument('--img-size', type=int, default=640, help='图像大小')
     parser.add_argument('--device', default='', help='cuda设备，例如 0 或 0,1,2,3 或 cpu')
+    parser.add_argument('--cache', action='store_true', help='使用预解码的内存映射图像缓存（见 image_cache.py）')
     return parser.parse_args()
 
 def main():
@@ -52,6 +53,11 @@ def main():
     
     # 构建训练命令
     train_script = ROOT / "yolov5/train.py"
+    if args.cache:
+        # 图像只解码一次，训练时从缓存读取；图像变化时只更新变化的部分
+        from image_cache import prepare_cache
+        prepare_cache(args.img_size)
+        train_script = ROOT / "cached_train.py"
     train_command = f"python {train_script} --weights {args.weights} --cfg {args.cfg} --data {args.data} --epochs {args.epochs} --batch-size {args.batch_size} --img {args.img_size} --device {args.device}"
     
     print(f"执行命令: {train_command}")
@@ -0,0 +1,211 @@
+"""
+多组训练参数并发调度
+按 (图像大小, 批次大小, 训练轮数, 初始权重) 的网格生成训练任务，每个任务作为独立子进程运行，
+绑定到互不重叠的CPU核心组（Linux 使用 sched_setaffinity），并按核心数设置 OMP/MKL 线程数，
+避免多个训练进程争抢同一批核心。全部完成后汇总每个任务的最佳指标和权重路径。
+
+    python train_scheduler.py --img-sizes 320 416 640 --batch-sizes 16 32 --epochs 100 --cores-per-run 8
+"""
+import argparse
+import csv
+import itertools
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# 项目根目录
+ROOT = Path(__file__).parent.resolve()
+
+POLL_INTERVAL = 5.0  # 检查子进程状态的间隔（秒）
+METRICS = ('precision', 'recall', 'mAP_0.5', 'mAP_0.5:0.95')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='并发调度多组训练参数')
+    parser.add_argument('--img-sizes', type=int, nargs='+', default=[640], help='图像大小列表')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[16], help='批次大小列表')
+    parser.add_argument('--epochs', type=int, nargs='+', default=[100], help='训练轮数列表')
+    parser.add_argument('--weights', type=str, nargs='+', default=['yolov5s.pt'], help='初始权重列表')
+    parser.add_argument('--data', type=str, default=ROOT / 'dataset/fruits.yaml', help='数据集配置文件')
+    parser.add_argument('--cores-per-run', type=int, default=8, help='每个训练任务独占的CPU核心数')
+    parser.add_argument('--max-runs', type=int, default=0, help='同时运行的任务数上限，0 表示按核心数决定')
+    parser.add_argument('--project', type=str, default=ROOT / 'yolov5/runs/grid', help='训练结果保存目录')
+    parser.add_argument('--cache', action='store_true', help='使用预解码的图像缓存训练（见 image_cache.py）')
+    parser.add_argument('--dry-run', action='store_true', help='只打印任务和核心分配，不执行训练')
+    return parser.parse_args()
+
+
+def available_cores():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count()))
+
+
+def core_groups(cores_per_run, max_runs=0):
+    """
+    将可用核心划分为互不重叠的核心组，每组 cores_per_run 个
+    """
+    cores = available_cores()
+    groups = [cores[i:i + cores_per_run] for i in range(0, len(cores) - cores_per_run + 1, cores_per_run)]
+    if not groups:
+        groups = [cores]
+    return groups[:max_runs] if max_runs else groups
+
+
+def build_runs(args):
+    runs = []
+    for img_size, batch_size, epochs, weights in itertools.product(
+            args.img_sizes, args.batch_sizes, args.epochs, args.weights):
+        name = f"{Path(weights).stem}_img{img_size}_bs{batch_size}_e{epochs}"
+        runs.append({'name': name, 'img_size': img_size, 'batch_size': batch_size,
+                     'epochs': epochs, 'weights': weights})
+    return runs
+
+
+def run_command(run, args, cores):
+    """
+    训练任务的命令和环境变量：PyTorch 计算线程数等于核心数，DataLoader 工作进程占用约四分之一
+    """
+    train_script = ROOT / ('cached_train.py' if args.cache else 'yolov5/train.py')
+    command = [
+        sys.executable, str(train_script),
+        '--weights', str(run['weights']),
+        '--data', str(args.data),
+        '--epochs', str(run['epochs']),
+        '--batch-size', str(run['batch_size']),
+        '--img', str(run['img_size']),
+        '--device', 'cpu',
+        '--workers', str(max(1, len(cores) // 4)),
+        '--project', str(args.project),
+        '--name', run['name'],
+        '--exist-ok',
+    ]
+    env = dict(os.environ)
+    threads = str(len(cores))
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS'):
+        env[var] = threads
+    return command, env
+
+
+def launch(run, args, cores):
+    command, env = run_command(run, args, cores)
+    run_dir = Path(args.project) / run['name']
+    run_dir.mkdir(parents=True, exist_ok=True)
+    log = open(run_dir / 'train.log', 'w', encoding='utf-8')
+
+    # 子进程启动前绑定核心，DataLoader 工作进程继承同样的绑定
+    preexec = (lambda: os.sched_setaffinity(0, cores)) if hasattr(os, 'sched_setaffinity') else None
+    process = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT, preexec_fn=preexec)
+    print(f"启动 {run['name']}，核心 {cores[0]}-{cores[-1]}，日志 {run_dir / 'train.log'}")
+    return process, log
+
+
+def read_best_metrics(run_dir):
+    """
+    从训练结果中读取最佳一轮的指标（按YOLOv5的fitness: 0.1*mAP@0.5 + 0.9*mAP@0.5:0.95）
+    新版YOLOv5写 results.csv，旧版写 results.txt
+    """
+    rows = []
+    csv_path, txt_path = run_dir / 'results.csv', run_dir / 'results.txt'
+    if csv_path.exists():
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                row = {k.strip(): v.strip() for k, v in row.items()}
+                metrics = {m: float(row[f'metrics/{m}']) for m in METRICS}
+                rows.append(dict(metrics, epoch=int(row['epoch'])))
+    elif txt_path.exists():
+        with open(txt_path, 'r', encoding='utf-8') as f:
+            for epoch, line in enumerate(f):
+                values = line.split()
+                rows.append({'precision': float(values[8]), 'recall': float(values[9]),
+                             'mAP_0.5': float(values[10]), 'mAP_0.5:0.95': float(values[11]), 'epoch': epoch})
+    if not rows:
+        return None
+    return max(rows, key=lambda r: 0.1 * r['mAP_0.5'] + 0.9 * r['mAP_0.5:0.95'])
+
+
+def write_summary(runs, args):
+    """
+    打印并保存汇总表（按 mAP@0.5:0.95 从高到低）
+    """
+    for run in runs:
+        run_dir = Path(args.project) / run['name']
+        run['best'] = read_best_metrics(run_dir)
+        best_weights = run_dir / 'weights' / 'best.pt'
+        run['best_weights'] = str(best_weights) if best_weights.exists() else ''
+    runs.sort(key=lambda r: r['best']['mAP_0.5:0.95'] if r['best'] else -1, reverse=True)
+
+    summary_path = Path(args.project) / 'summary.csv'
+    with open(summary_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'img_size', 'batch_size', 'epochs', 'weights', 'returncode', 'minutes',
+                         'best_epoch', *METRICS, 'best_weights'])
+        for run in runs:
+            best = run['best'] or {}
+            writer.writerow([run['name'], run['img_size'], run['batch_size'], run['epochs'], run['weights'],
+                             run.get('returncode'), f"{run.get('seconds', 0) / 60:.1f}", best.get('epoch', ''),
+                             *(best.get(m, '') for m in METRICS), run['best_weights']])
+
+    print(f"\n{'任务':<36}{'用时(分)':>9}{'P':>8}{'R':>8}{'mAP@.5':>9}{'mAP@.5:.95':>12}")
+    for run in runs:
+        best = run['best']
+        metrics = ''.join(f"{best[m]:>{w}.3f}" for m, w in zip(METRICS, (8, 8, 9, 12))) if best else '   失败/无结果'
+        print(f"{run['name']:<36}{run.get('seconds', 0) / 60:>9.1f}{metrics}")
+    print(f"\n汇总表已保存到: {summary_path}")
+
+
+def main():
+    args = parse_args()
+    runs = build_runs(args)
+    groups = core_groups(args.cores_per_run, args.max_runs)
+    print(f"共 {len(runs)} 个训练任务，{len(groups)} 个核心组（每组 {len(groups[0])} 核）并发执行")
+
+    if args.dry_run:
+        for run, cores in zip(runs, itertools.cycle(groups)):
+            command, env = run_command(run, args, cores)
+            print(f"{run['name']}: 核心 {cores[0]}-{cores[-1]}, OMP_NUM_THREADS={env['OMP_NUM_THREADS']}")
+            print(f"  {' '.join(command)}")
+        return
+
+    if args.cache:
+        # 缓存在启动任务前按每个图像大小准备好，避免多个任务同时写同一个缓存
+        from image_cache import prepare_cache
+        for img_size in args.img_sizes:
+            prepare_cache(img_size)
+
+    pending = list(runs)
+    free = list(groups)
+    active = []  # (任务, 进程, 日志文件, 核心组, 开始时间)
+    try:
+        while pending or active:
+            while pending and free:
+                run, cores = pending.pop(0), free.pop(0)
+                process, log = launch(run, args, cores)
+                active.append((run, process, log, cores, time.time()))
+
+            time.sleep(POLL_INTERVAL)
+            for item in list(active):
+                run, process, log, cores, started = item
+                if process.poll() is None:
+                    continue
+                log.close()
+                run['returncode'] = process.returncode
+                run['seconds'] = time.time() - started
+                status = "完成" if process.returncode == 0 else f"失败（返回码 {process.returncode}）"
+                print(f"{run['name']} {status}，用时 {run['seconds'] / 60:.1f} 分钟")
+                active.remove(item)
+                free.append(cores)
+    except KeyboardInterrupt:
+        print("\n用户中断，停止所有训练任务")
+        for run, process, log, cores, started in active:
+            process.terminate()
+            process.wait()
+            log.close()
+
+    write_summary(runs, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 import os
+import re
+import json
 import argparse
 import yaml
 import shutil
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from PIL import Image
 import random
@@ -9,12 +13,20 @@ import random
 # 项目根目录
 ROOT = Path(__file__).parent.resolve()
 
+SCAN_CACHE = ROOT / 'dataset/cache/label_scan.json'  # 标签扫描结果缓存，按文件修改时间失效
+IMG_FORMATS = ('.bmp', '.jpg', '.jpeg', '.png', '.tif', '.tiff', '.webp')
+MAX_ERRORS_SHOWN = 20  # 每个划分最多列出的错误数
+
 def parse_args():
     parser = argparse.ArgumentParser(description='更新水果数据集标签')
     parser.add_argument('--data', type=str, default=ROOT / 'dataset/fruits.yaml', 
                        help='数据集配置文件')
     parser.add_argument('--add-class', type=str, default=None,
                        help='要添加的新水果类别名称')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                       help='扫描标签文件的进程数')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='忽略扫描缓存，重新解析所有标签文件')
     return parser.parse_args()
 
 def update_yaml(yaml_file, new_class=None):
@@ -55,11 +67,158 @@ def update_yaml(yaml_file, new_class=None):
                 
     # 打印当前类别
     print(f"当前配置包含 {len(data['names'])} 个水果类别:")
-    for idx, name in enumerate(data['names']):
+    names = data['names']
+    for idx, name in (names.items() if isinstance(names, dict) else enumerate(names)):
         print(f"  {idx}: {name}")
             
     return True
 
+def load_names(yaml_file):
+    """读取类别名称，兼容列表和 {索引: 名称} 两种写法"""
+    with open(yaml_file, 'r', encoding='utf-8') as f:
+        names = yaml.safe_load(f)['names']
+    return dict(enumerate(names)) if isinstance(names, list) else {int(k): v for k, v in names.items()}
+
+def parse_label_file(task):
+    """
+    解析一个YOLO标签文件（在工作进程中执行），检查格式、类别ID范围和框的边界
+    返回 {'classes': {类别ID: 实例数}, 'errors': [错误描述, ...]}
+    """
+    path, num_classes = task
+    classes = Counter()
+    errors = []
+    seen = set()
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            parts = line.split()
+            if len(parts) != 5:
+                errors.append(f"第{lineno}行: 应为5列（类别 x y w h），实际 {len(parts)} 列")
+                continue
+            try:
+                cls = int(parts[0])
+                x, y, w, h = (float(v) for v in parts[1:])
+            except ValueError:
+                errors.append(f"第{lineno}行: 无法解析 '{line}'")
+                continue
+            if not 0 <= cls < num_classes:
+                errors.append(f"第{lineno}行: 类别ID {cls} 超出范围 0-{num_classes - 1}")
+            if w <= 0 or h <= 0:
+                errors.append(f"第{lineno}行: 框的宽高必须为正数")
+            elif x - w / 2 < -1e-6 or y - h / 2 < -1e-6 or x + w / 2 > 1 + 1e-6 or y + h / 2 > 1 + 1e-6:
+                errors.append(f"第{lineno}行: 框超出图像范围 (x={x}, y={y}, w={w}, h={h})")
+            if line in seen:
+                errors.append(f"第{lineno}行: 重复的标注")
+            seen.add(line)
+            classes[cls] += 1
+    return {'classes': dict(classes), 'errors': errors}
+
+def load_scan_cache(no_cache=False):
+    if no_cache or not SCAN_CACHE.exists():
+        return {}
+    try:
+        with open(SCAN_CACHE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_scan_cache(cache):
+    SCAN_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    with open(SCAN_CACHE, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+
+def scan_labels(label_files, num_classes, cache, workers):
+    """
+    用进程池解析标签文件，修改时间和大小未变化的文件直接使用缓存结果
+    返回 {文件路径: 解析结果}，cache 原地更新
+    """
+    results, changed = {}, []
+    for path in label_files:
+        st = path.stat()
+        key = str(path)
+        stamp = [st.st_mtime_ns, st.st_size, num_classes]
+        entry = cache.get(key)
+        if entry and entry['stamp'] == stamp:
+            results[key] = entry['result']
+        else:
+            changed.append((key, stamp))
+
+    if changed:
+        tasks = [(key, num_classes) for key, _ in changed]
+        chunksize = max(1, len(tasks) // (4 * max(1, workers)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for (key, stamp), result in zip(changed, pool.map(parse_label_file, tasks, chunksize=chunksize)):
+                results[key] = result
+                cache[key] = {'stamp': stamp, 'result': result}
+    return results, len(changed)
+
+def check_classes_txt(labels_dir, images_dir, names):
+    """
+    检查标注工具（labelImg）生成的 classes.txt：其中的类别顺序决定了标签文件中的类别ID，
+    与数据集配置不一致时，训练会把标注当成错误的类别
+    """
+    mismatched = {}
+    for classes_file in sorted(list(labels_dir.glob('*/classes.txt')) + list(images_dir.glob('*/classes.txt'))):
+        with open(classes_file, 'r', encoding='utf-8', errors='replace') as f:
+            listed = [line.strip() for line in f if line.strip()]
+        diff = {i: name for i, name in enumerate(listed) if names.get(i) != name}
+        if diff:
+            print(f"  警告: {classes_file} 与数据集配置不一致（{len(diff)}/{len(listed)} 个类别不同），"
+                  f"前几项: {', '.join(listed[:5])}")
+            mismatched[classes_file] = listed
+    return mismatched
+
+def report_dataset(data_dir, names, workers, no_cache=False):
+    """扫描并校验各划分的标签，输出每个类别的实例统计"""
+    images_dir = data_dir / 'images'
+    labels_dir = data_dir / 'labels'
+    cache = load_scan_cache(no_cache)
+
+    print("\n检查 classes.txt:")
+    classes_files = check_classes_txt(labels_dir, images_dir, names)
+
+    for split in ['train', 'val']:
+        split_labels = labels_dir / split
+        if not split_labels.exists():
+            continue
+        label_files = sorted(p for p in split_labels.glob('*.txt') if p.name != 'classes.txt')
+        results, parsed = scan_labels(label_files, len(names), cache, workers)
+
+        image_stems = {p.stem for p in (images_dir / split).glob('*.*') if p.suffix.lower() in IMG_FORMATS}
+        label_stems = {p.stem for p in label_files}
+
+        instances = Counter()
+        prefixes = {}  # 类别ID -> 文件名前缀计数，用于发现整体错位的类别ID
+        errors = []
+        for path, result in results.items():
+            stem = Path(path).stem
+            prefix = re.match(r'[^\d_-]*', stem).group() or stem
+            for cls, n in result['classes'].items():
+                cls = int(cls)
+                instances[cls] += n
+                prefixes.setdefault(cls, Counter())[prefix] += n
+            errors.extend(f"{Path(path).name} {e}" for e in result['errors'])
+
+        print(f"\n{split}: {len(label_files)} 个标签文件（重新解析 {parsed} 个），{sum(instances.values())} 个标注框")
+        print(f"  缺少图像的标签: {len(label_stems - image_stems)}，缺少标签的图像: {len(image_stems - label_stems)}")
+        for cls in sorted(instances):
+            name = names.get(cls, '超出范围')
+            common = ', '.join(f"{p}({n})" for p, n in prefixes[cls].most_common(3))
+            print(f"  {cls:>3} {name:<8} {instances[cls]:>6} 个实例  文件名前缀: {common}")
+            for classes_file, listed in classes_files.items():
+                if classes_file.parent.name == split and cls < len(listed) and listed[cls] != name:
+                    print(f"        {classes_file.relative_to(data_dir)} 中类别 {cls} 为 '{listed[cls]}'")
+        if errors:
+            print(f"  {len(errors)} 个错误:")
+            for e in errors[:MAX_ERRORS_SHOWN]:
+                print(f"    {e}")
+            if len(errors) > MAX_ERRORS_SHOWN:
+                print(f"    ...（其余 {len(errors) - MAX_ERRORS_SHOWN} 个省略）")
+
+    save_scan_cache(cache)
+
 def main():
     args = parse_args()
     print(f"更新水果数据集标签...")
@@ -85,6 +244,9 @@ def main():
                 print(f"  {check_dir}: 目录不存在")
                 check_dir.mkdir(parents=True, exist_ok=True)
                 print(f"  已创建目录: {check_dir}")
+    
+    # 解析并校验所有标签文件
+    report_dataset(data_dir, load_names(Path(args.data)), args.workers, args.no_cache)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,232 @@
+"""
+导出模型验证与延迟基准
+逐个加载 models/exported 中的导出模型（TorchScript、ONNX、TFLite、OpenVINO、ncnn 等），
+在固定的一组验证图像上与 .pt 模型的输出对比，并测量冷启动时间、CPU延迟（p50/p99）、
+批次 1-8 的吞吐量和文件大小。结果写入 JSON 和 CSV，并追加到历史表中，便于按版本对比。
+
+    python verify_exports.py --weights models/best.pt --img-size 320 --tag v1.2
+"""
+import argparse
+import csv
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from detector import numpy_non_max_suppression
+from model_eval import (box_iou, create_runner, export_size, latency_samples, list_images, model_format,
+                        preprocess)
+
+# 项目根目录
+ROOT = Path(__file__).parent.resolve()
+
+SEED = 0  # 没有验证图像时，用固定种子生成的随机输入对比
+MATCH_CONF = 0.25  # 对比检测结果时使用的置信度阈值
+FIELDS = ['tag', 'time', 'name', 'format', 'status', 'size_mb', 'load_s', 'first_ms', 'max_score_diff',
+          'max_box_diff', 'match_rate', 'passed', 'p50_ms', 'p99_ms'] + [f'fps_b{b}' for b in range(1, 9)]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='验证导出的模型并测量延迟')
+    parser.add_argument('--weights', type=str, default=ROOT / 'models/best.pt', help='作为对比基准的 .pt 权重')
+    parser.add_argument('--exported-dir', type=str, default=ROOT / 'models/exported', help='导出模型所在目录')
+    parser.add_argument('--images', type=str, default=ROOT / 'dataset/images/val', help='验证图像目录')
+    parser.add_argument('--num-images', type=int, default=16, help='参与输出对比的图像数量')
+    parser.add_argument('--img-size', type=int, default=320, help='输入尺寸不固定的格式使用的图像大小')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=list(range(1, 9)), help='测量吞吐量的批次大小')
+    parser.add_argument('--runs', type=int, default=50, help='每个批次大小的计时次数')
+    parser.add_argument('--threads', type=int, default=0, help='推理线程数，0 表示由推理库决定')
+    parser.add_argument('--atol', type=float, default=0.02, help='置信度的最大允许误差')
+    parser.add_argument('--int8-atol', type=float, default=0.1, help='INT8模型置信度的最大允许误差')
+    parser.add_argument('--min-match', type=float, default=0.95, help='检测结果的最低一致率')
+    parser.add_argument('--tag', type=str, default='', help='版本标记，写入历史表，默认使用当前日期')
+    return parser.parse_args()
+
+
+def find_exports(exported_dir):
+    """
+    导出目录中可识别格式的模型（跳过量化时生成的校准配置等文件）
+    """
+    exports = []
+    for path in sorted(Path(exported_dir).iterdir()):
+        fmt = model_format(path)
+        if fmt not in ('unknown', 'pytorch'):
+            exports.append((path, fmt))
+    return exports
+
+
+def load_inputs(images_dir, num_images, img_size):
+    """
+    固定的一组输入：验证图像，或没有图像时按固定种子生成的随机输入
+    """
+    images_dir = Path(images_dir)
+    images = list_images(images_dir, num_images) if images_dir.exists() else []
+    blobs = [prepared[0] for prepared in (preprocess(path, img_size) for path in images) if prepared is not None]
+    if blobs:
+        return np.stack(blobs), True
+    print(f"警告: {images_dir} 中没有图像，使用随机输入对比原始输出（不比较检测结果）")
+    rng = np.random.default_rng(SEED)
+    return rng.random((num_images, 3, img_size, img_size), dtype=np.float32), False
+
+
+def run_each(runner, inputs):
+    return np.concatenate([runner(inputs[i:i + 1]) for i in range(len(inputs))])
+
+
+def compare_outputs(reference, output):
+    """
+    对比原始预测 (n, N, 5 + 类别数)：
+    置信度（obj * cls）和检测框坐标的最大误差，以及NMS后检测结果的一致率
+    """
+    if reference.shape != output.shape:
+        return None
+    ref_scores = reference[..., 4:5] * reference[..., 5:]
+    out_scores = output[..., 4:5] * output[..., 5:]
+    score_diff = float(np.abs(ref_scores - out_scores).max())
+    box_diff = float(np.abs(reference[..., :4] - output[..., :4]).max())
+
+    matched = total = 0
+    ref_dets = numpy_non_max_suppression(reference, MATCH_CONF)
+    out_dets = numpy_non_max_suppression(output, MATCH_CONF)
+    for ref, out in zip(ref_dets, out_dets):
+        total += len(ref)
+        if len(ref) and len(out):
+            iou = box_iou(ref[:, :4], out[:, :4])
+            iou[ref[:, 5:6] != out[None, :, 5]] = 0
+            matched += int((iou.max(1) >= 0.5).sum())
+    match_rate = matched / total if total else 1.0
+    return score_diff, box_diff, match_rate
+
+
+def benchmark(runner, batch_sizes, runs):
+    """
+    批次1的 p50/p99 延迟，以及各批次大小的吞吐量（图像/秒，按延迟中位数计算）
+    """
+    result = {}
+    for batch in batch_sizes:
+        times = latency_samples(runner, batch, runs)
+        if batch == 1:
+            result['p50_ms'] = float(np.median(times))
+            result['p99_ms'] = float(np.percentile(times, 99))
+        result[f'fps_b{batch}'] = batch * 1000 / float(np.median(times))
+    return result
+
+
+def verify_one(path, fmt, inputs, reference, args):
+    """
+    验证一个模型，返回报告中的一行
+    """
+    row = {'name': path.name, 'format': fmt, 'size_mb': export_size(path) / (1024 * 1024)}
+    t0 = time.perf_counter()
+    try:
+        runner = create_runner(path, args.threads, args.img_size)
+    except (ImportError, ValueError, StopIteration) as e:
+        print(f"{path.name}: 跳过（{e or '缺少模型文件'}）")
+        return dict(row, status='skipped')
+    row['load_s'] = time.perf_counter() - t0
+
+    if runner.img_size != inputs.shape[-1]:
+        print(f"{path.name}: 输入尺寸 {runner.img_size} 与 --img-size {inputs.shape[-1]} 不一致，跳过")
+        return dict(row, status='skipped')
+    t0 = time.perf_counter()
+    output = runner(inputs[:1])
+    row['first_ms'] = (time.perf_counter() - t0) * 1000
+
+    row['status'] = 'ok'
+    if reference is not None:
+        output = np.concatenate([output, run_each(runner, inputs[1:])]) if len(inputs) > 1 else output
+        compared = compare_outputs(reference, output)
+        if compared is None:
+            print(f"{path.name}: 输出形状 {output.shape} 与 .pt 模型 {reference.shape} 不一致")
+            row['passed'] = False
+        else:
+            row['max_score_diff'], row['max_box_diff'], row['match_rate'] = compared
+            atol = args.int8_atol if 'int8' in path.name else args.atol
+            row['passed'] = row['max_score_diff'] <= atol and row['match_rate'] >= args.min_match
+
+    row.update(benchmark(runner, args.batch_sizes, args.runs))
+    return row
+
+
+def write_report(rows, output_dir, tag):
+    """
+    本次结果写入 verify_report.json / verify_report.csv，同时追加到 verify_history.csv
+    """
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows = [{k: round(v, 4) if isinstance(v, float) else v for k, v in row.items()} for row in rows]
+    for row in rows:
+        row['tag'], row['time'] = tag, now
+    with open(output_dir / 'verify_report.json', 'w', encoding='utf-8') as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
+
+    history = output_dir / 'verify_history.csv'
+    new_history = not history.exists()
+    for path, mode in ((output_dir / 'verify_report.csv', 'w'), (history, 'a')):
+        with open(path, mode, newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, FIELDS, extrasaction='ignore')
+            if mode == 'w' or new_history:
+                writer.writeheader()
+            writer.writerows(rows)
+
+
+def print_table(rows):
+    def fmt(value, spec):
+        return format(value, spec) if isinstance(value, float) else '-'.rjust(int(spec.split('.')[0]))
+
+    print(f"\n{'模型':<28}{'大小(MB)':>9}{'加载(s)':>9}{'p50(ms)':>9}{'p99(ms)':>9}"
+          f"{'fps@1':>8}{'fps@8':>8}{'误差':>8}{'一致率':>8}  结果")
+    for row in rows:
+        passed = {True: '通过', False: '未通过'}.get(row.get('passed'), row['status'])
+        print(f"{row['name']:<28}{fmt(row['size_mb'], '9.2f')}{fmt(row.get('load_s'), '9.2f')}"
+              f"{fmt(row.get('p50_ms'), '9.2f')}{fmt(row.get('p99_ms'), '9.2f')}"
+              f"{fmt(row.get('fps_b1'), '8.1f')}{fmt(row.get('fps_b8'), '8.1f')}"
+              f"{fmt(row.get('max_score_diff'), '8.4f')}{fmt(row.get('match_rate'), '8.2%')}  {passed}")
+
+
+def verify_exports(weights, exported_dir, images=ROOT / 'dataset/images/val', img_size=320, args=None):
+    """
+    验证导出目录中的所有模型，返回报告行；export_model.py --verify 使用默认参数调用
+    """
+    if args is None:
+        args = argparse.Namespace(num_images=16, batch_sizes=list(range(1, 9)), runs=50, threads=0,
+                                  atol=0.02, int8_atol=0.1, min_match=0.95, tag='')
+    args.img_size = img_size
+    weights, exported_dir = Path(weights), Path(exported_dir)
+    exports = find_exports(exported_dir)
+    if not exports:
+        print(f"{exported_dir} 中没有导出的模型")
+        return []
+
+    inputs, _ = load_inputs(images, args.num_images, img_size)
+    rows = []
+    reference = None
+    if weights.exists():
+        print(f"运行基准模型 {weights}")
+        try:
+            runner = create_runner(weights, args.threads, img_size)
+            reference = run_each(runner, inputs)
+            rows.append(dict(verify_one(weights, 'pytorch', inputs, None, args), status='reference'))
+        except ImportError as e:
+            print(f"无法加载 .pt 模型，只测量延迟: {e}")
+    else:
+        print(f"警告: 基准权重 {weights} 不存在，只测量延迟")
+
+    for path, fmt in exports:
+        print(f"验证 {path.name} ({fmt})")
+        rows.append(verify_one(path, fmt, inputs, reference, args))
+
+    print_table(rows)
+    write_report(rows, exported_dir, args.tag or datetime.now().strftime('%Y%m%d'))
+    print(f"\n报告已保存到: {exported_dir / 'verify_report.json'}，历史记录: {exported_dir / 'verify_history.csv'}")
+    return rows
+
+
+def main():
+    args = parse_args()
+    verify_exports(args.weights, args.exported_dir, args.images, args.img_size, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -64,6 +64,13 @@ void camera_refresh_1(void) {
         printf("%c", 0x01);  // 帧起始标记
         printf("%c", 0xFE);
 
+        // 帧头：宽度、高度（小端），像素格式 1 = RGB565（每像素2字节，高字节在前）
+        printf("%c", 320 & 0xFF);
+        printf("%c", 320 >> 8);
+        printf("%c", 240 & 0xFF);
+        printf("%c", 240 >> 8);
+        printf("%c", 0x01);
+
         for (j = 0; j < 76800; j++) {  // 读取数据
             OV7670_RCK_L;
             data1 = GPIOA->IDR & 0xFF;  // 读数据
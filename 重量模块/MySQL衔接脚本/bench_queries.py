@@ -0,0 +1,151 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+
+from duqu3 import DB_CONFIG, FRUIT_TYPES
+from migrations import MIGRATIONS, PARTITION_MIGRATION, migrate
+
+BENCH_DATABASE = 'weight_data_bench'  # 单独的测试库，不影响采集数据
+INSERT_BATCH = 10000  # 生成数据时每次 executemany 的条数
+
+
+def connect(database=None):
+    config = dict(DB_CONFIG)
+    if database is None:
+        config.pop('database')
+    else:
+        config['database'] = database
+    return mysql.connector.connect(**config)
+
+
+def generate_rows(conn, rows, days):
+    """
+    生成 rows 条分布在最近 days 天内的随机重量记录
+    """
+    cursor = conn.cursor()
+    fruits = list(FRUIT_TYPES.values())
+    now = datetime.now()
+    span = days * 86400
+    t0 = time.perf_counter()
+    for start in range(0, rows, INSERT_BATCH):
+        n = min(INSERT_BATCH, rows - start)
+        batch = [
+            (random.choice(fruits), round(random.uniform(50, 500), 1),
+             now - timedelta(seconds=random.randrange(span)))
+            for _ in range(n)
+        ]
+        cursor.executemany("INSERT INTO fruit_weights (fruit_type, weight, timestamp) VALUES (%s, %s, %s)", batch)
+        conn.commit()
+        if (start // INSERT_BATCH) % 100 == 0:
+            print(f"已生成 {start + n}/{rows} 条记录")
+    cursor.close()
+    print(f"生成 {rows} 条记录耗时 {time.perf_counter() - t0:.1f}s")
+
+
+def benchmark_queries(now):
+    """
+    监控界面使用的查询：各时间范围的明细/计数、按水果类型的范围查询和键集分页首页
+    """
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    ranges = {
+        'today': (today, now),
+        'week': (today - timedelta(days=7), now),
+        'month': (today - timedelta(days=30), now),
+    }
+    fruit = next(iter(FRUIT_TYPES.values()))
+    queries = []
+    for name, (start, end) in ranges.items():
+        queries.append((f"{name} 明细",
+                        "SELECT id, fruit_type, weight, timestamp FROM fruit_weights "
+                        "WHERE timestamp BETWEEN %s AND %s ORDER BY timestamp DESC", (start, end)))
+        queries.append((f"{name} 计数",
+                        "SELECT COUNT(*) FROM fruit_weights WHERE timestamp BETWEEN %s AND %s", (start, end)))
+        queries.append((f"{name} {fruit}",
+                        "SELECT COUNT(*), AVG(weight) FROM fruit_weights "
+                        "WHERE fruit_type = %s AND timestamp BETWEEN %s AND %s", (fruit, start, end)))
+    queries.append(("分页首页",
+                    "SELECT id, fruit_type, weight, timestamp FROM fruit_weights "
+                    "WHERE timestamp >= %s AND timestamp < %s ORDER BY timestamp DESC, id DESC LIMIT 100",
+                    ranges['month']))
+    return queries
+
+
+def run_queries(conn, queries, repeat):
+    """
+    每条查询执行 repeat 次，返回 {名称: (中位耗时ms, 返回行数, EXPLAIN的访问方式)}
+    """
+    cursor = conn.cursor()
+    results = {}
+    for name, sql, params in queries:
+        cursor.execute("EXPLAIN " + sql, params)
+        columns = [c[0] for c in cursor.description]
+        plan = dict(zip(columns, cursor.fetchone()))
+        access = f"{plan.get('type')}/{plan.get('key') or '-'}"
+
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            cursor.execute(sql, params)
+            n = len(cursor.fetchall())
+            times.append((time.perf_counter() - t0) * 1000)
+        times.sort()
+        results[name] = (times[len(times) // 2], n, access)
+    cursor.close()
+    return results
+
+
+def print_results(title, results):
+    print(f"\n== {title} ==")
+    print(f"{'查询':<16}{'中位耗时(ms)':>14}{'行数':>10}  访问方式")
+    for name, (ms, n, access) in results.items():
+        print(f"{name:<16}{ms:>14.1f}{n:>10}  {access}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重量记录范围查询性能测试')
+    parser.add_argument('--rows', type=int, default=10_000_000, help='生成的记录数')
+    parser.add_argument('--days', type=int, default=365, help='记录分布的天数')
+    parser.add_argument('--repeat', type=int, default=5, help='每条查询的执行次数')
+    parser.add_argument('--database', default=BENCH_DATABASE, help='测试使用的数据库（会被清空）')
+    parser.add_argument('--partition', action='store_true', help='额外测试按月分区后的查询性能')
+    parser.add_argument('--keep', action='store_true', help='复用已生成的测试数据')
+    args = parser.parse_args()
+
+    server = connect()
+    cursor = server.cursor()
+    if not args.keep:
+        cursor.execute(f"DROP DATABASE IF EXISTS {args.database}")
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {args.database}")
+    cursor.close()
+    server.close()
+
+    conn = connect(args.database)
+    # 先建到无索引的版本，生成数据后分别测试索引前后的查询
+    index_version = MIGRATIONS[-1][0]
+    version = migrate(conn, target=index_version - 1)
+    if not args.keep:
+        generate_rows(conn, args.rows, args.days)
+
+    queries = benchmark_queries(datetime.now())
+    if version < index_version:
+        print_results("无索引", run_queries(conn, queries, args.repeat))
+
+    t0 = time.perf_counter()
+    migrate(conn, target=index_version)
+    print(f"\n创建索引耗时 {time.perf_counter() - t0:.1f}s")
+    print_results("timestamp / (fruit_type, timestamp) 索引", run_queries(conn, queries, args.repeat))
+
+    if args.partition:
+        t0 = time.perf_counter()
+        migrate(conn, target=PARTITION_MIGRATION[0], partition=True)
+        print(f"\n按月分区耗时 {time.perf_counter() - t0:.1f}s")
+        print_results("索引 + 按月分区", run_queries(conn, queries, args.repeat))
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,20 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import mysql.connector
 from datetime import datetime, timedelta
 import numpy as np
+import queue
+import threading
+
+from record_table import KeysetPager, VirtualRecordTable
+from live_updates import RecordSubscriber
+from rollups import merge_chart_data, query_chart_data
+
+# 记录较多的时间范围使用按需分页的虚拟表格
+LARGE_RANGES = ("month", "all")
+POLL_INTERVAL = 50  # 加载期间检查后台查询结果的间隔（毫秒）
 
 class WeightDataMonitor:
     def __init__(self, root):
@@ -21,12 +30,32 @@ class WeightDataMonitor:
             'database': 'weight_data'
         }
         
+        # 已加载数据的状态，用于增量刷新
+        self.loaded_count = 0  # 普通表格中的记录数（图表使用汇总表，不在内存中保存记录）
+        self.loaded_filter = None  # 当前表格对应的时间范围条件
+        self.last_id = 0  # 已加载记录中的最大ID
+        self.chart_data = {'total': 0}  # 图表使用的统计数据
+        
+        # 后台加载的状态
+        self.results = queue.Queue()  # 工作线程 -> 主线程的查询结果
+        self.generation = 0  # 最新加载请求的序号，序号不同的结果已过时
+        self.current_request = None
+        self.poll_id = None
+        
+        # 实时推送：采集程序每写入一批记录就推送过来，无需轮询数据库
+        self.live_records = queue.Queue()  # 订阅线程 -> 主线程的新记录
+        self.live_missed = False  # 加载期间收到的推送，加载完成后需要再增量刷新一次
+        
         # 创建界面
         self.create_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
         
         # 初始加载数据
         self.load_data()
         
+        self.subscriber = RecordSubscriber(self.live_records.put).start()
+        self.live_poll_id = self.root.after(POLL_INTERVAL, self.poll_live_records)
+        
     def create_ui(self):
         # 创建主框架
         self.main_frame = ttk.Frame(self.root, padding="10")
@@ -62,8 +91,10 @@ class WeightDataMonitor:
         table_frame = ttk.LabelFrame(paned_window, text="重量数据记录")
         paned_window.add(table_frame, weight=1)
         
-        # 创建表格
-        self.tree = ttk.Treeview(table_frame, columns=("id", "fruit_type", "weight", "time"), show="headings")
+        # 创建表格（时间范围较小时一次性加载）
+        self.list_frame = ttk.Frame(table_frame)
+        self.list_frame.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(self.list_frame, columns=("id", "fruit_type", "weight", "time"), show="headings")
         self.tree.heading("id", text="ID")
         self.tree.heading("fruit_type", text="水果类型")
         self.tree.heading("weight", text="重量(g)")
@@ -75,11 +106,14 @@ class WeightDataMonitor:
         self.tree.column("time", width=150)
         
         # 添加滚动条
-        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        scrollbar = ttk.Scrollbar(self.list_frame, orient=tk.VERTICAL, command=self.tree.yview)
         self.tree.configure(yscrollcommand=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
+        # 查看所有数据时使用按需分页加载的虚拟表格
+        self.virtual_table = VirtualRecordTable(table_frame, self.db_config)
+        
         # 右侧图表区域
         chart_frame = ttk.LabelFrame(paned_window, text="数据可视化")
         paned_window.add(chart_frame, weight=2)
@@ -101,53 +135,263 @@ class WeightDataMonitor:
         
         self.tab_control.pack(expand=1, fill=tk.BOTH)
         
+        # 每个选项卡的图表只创建一次
+        self.create_charts()
+        
         # 状态栏
         self.status_var = tk.StringVar()
         status_bar = ttk.Label(self.main_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
         status_bar.pack(side=tk.BOTTOM, fill=tk.X)
         
     def load_data(self):
-        # 根据选择的时间范围构建SQL查询
+        """
+        在后台线程中加载数据，界面保持响应
+        新的加载请求会取代尚未完成的旧请求：旧请求正在执行的查询被终止，结果被丢弃
+        """
+        start, end = self.get_time_range()
+        large = self.time_range.get() in LARGE_RANGES
         time_filter = self.get_time_filter()
+        request = {
+            'generation': self.generation + 1,
+            'large': large,
+            'range': (start, end),
+            'time_filter': time_filter,
+            # 时间范围未变化时只查询比已加载记录更新的数据，否则完整重新加载
+            'incremental': not large and time_filter == self.loaded_filter,
+            'last_id': self.last_id,
+            'connection_id': None,  # 工作线程的数据库连接ID，用于终止查询
+            'done': False,  # 工作线程已结束查询
+            'applied': False,  # 主线程已应用结果，之后推送的新记录才能直接加入表格
+        }
         
+        self.cancel_query()
+        self.generation = request['generation']
+        self.current_request = request
+        self.set_loading(True)
+        threading.Thread(target=self.query_worker, args=(request,), daemon=True).start()
+    
+    def query_worker(self, request):
+        """
+        工作线程：执行查询，结果放入队列，由主线程的 poll_results 取出
+        """
+        time_filter = request['time_filter']
+        result = {'records': [], 'chart_data': None}
+        conn = None
         try:
             conn = mysql.connector.connect(**self.db_config)
+            request['connection_id'] = conn.connection_id
             cursor = conn.cursor()
             
-            query = f"SELECT id, fruit_type, weight, timestamp FROM fruit_weights {time_filter} ORDER BY timestamp DESC"
-            cursor.execute(query)
-            records = cursor.fetchall()
+            if request['large']:
+                # 大范围的表格由虚拟表格按需分页读取，这里只读取时间范围和第一页
+                pager = KeysetPager(self.db_config, conn)
+                pager.set_range(*request['range'])
+                result['bounds'] = pager.bounds()
+                result['records'] = pager.newest(self.virtual_table.page_size)
+            elif request['incremental']:
+                id_filter = f"{time_filter} AND id > %s" if time_filter else "WHERE id > %s"
+                query = f"SELECT id, fruit_type, weight, timestamp FROM fruit_weights {id_filter} ORDER BY timestamp DESC"
+                cursor.execute(query, (request['last_id'],))
+                result['records'] = cursor.fetchall()
+            else:
+                query = f"SELECT id, fruit_type, weight, timestamp FROM fruit_weights {time_filter} ORDER BY timestamp DESC"
+                cursor.execute(query)
+                result['records'] = cursor.fetchall()
+            
+            # 图表数据从汇总表读取（没有新数据时图表无需重绘）
+            if result['records'] or not request['incremental']:
+                result['chart_data'] = query_chart_data(cursor, *request['range'])
             
+            cursor.close()
+            
+        except mysql.connector.Error as e:
+            result['error'] = e  # 被终止的查询也会走到这里，其结果已过时，不会提示
+        finally:
+            if conn is not None:
+                conn.close()
+        
+        request['done'] = True
+        self.results.put((request, result))
+    
+    def cancel_query(self):
+        """终止上一个尚未完成的加载请求正在执行的查询"""
+        request = self.current_request
+        if request is None or request['done'] or request['connection_id'] is None:
+            return
+        
+        def kill(connection_id):
+            try:
+                conn = mysql.connector.connect(**self.db_config)
+                cursor = conn.cursor()
+                cursor.execute(f"KILL QUERY {int(connection_id)}")
+                cursor.close()
+                conn.close()
+            except mysql.connector.Error:
+                pass  # 查询可能已经结束
+        
+        threading.Thread(target=kill, args=(request['connection_id'],), daemon=True).start()
+    
+    def set_loading(self, loading):
+        """切换加载状态：状态栏提示和鼠标指针，加载期间定时检查结果队列"""
+        if loading:
+            self.status_var.set("正在加载数据...")
+            self.root.config(cursor="watch")
+            if self.poll_id is None:
+                self.poll_id = self.root.after(POLL_INTERVAL, self.poll_results)
+        else:
+            self.root.config(cursor="")
+    
+    def poll_results(self):
+        """主线程：取出工作线程的结果，丢弃已被取代的旧请求，应用最新请求的结果"""
+        self.poll_id = None
+        while True:
+            try:
+                request, result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if request['generation'] != self.generation:
+                continue
+            
+            request['applied'] = True
+            self.set_loading(False)
+            if 'error' in result:
+                messagebox.showerror("数据库错误", f"无法连接到数据库或查询失败: {result['error']}")
+                self.status_var.set("数据加载失败")
+            elif request['large']:
+                self.load_large_range(request, result)
+            else:
+                self.apply_records(request, result)
+        
+        if not self.current_request['applied'] or not self.results.empty():
+            self.poll_id = self.root.after(POLL_INTERVAL, self.poll_results)
+        elif self.live_missed:
+            # 加载期间有新记录写入，无法确定是否已包含在结果中，增量刷新一次
+            self.live_missed = False
+            self.load_data()
+    
+    def poll_live_records(self):
+        """主线程：定时取出实时推送的新记录并应用到表格和图表"""
+        records = []
+        while True:
+            try:
+                records.extend(self.live_records.get_nowait())
+            except queue.Empty:
+                break
+        if records:
+            self.apply_live_records(records)
+        self.live_poll_id = self.root.after(POLL_INTERVAL, self.poll_live_records)
+    
+    def apply_live_records(self, records):
+        """
+        将推送的新记录加入表格，并在内存中累加图表数据，不查询数据库
+        """
+        # 工作线程结束后、主线程应用结果前，结果中可能已包含这些记录，同样等加载完成后增量刷新
+        if self.current_request is not None and not self.current_request['applied']:
+            self.live_missed = True
+            return
+        
+        start, end = self.get_time_range()
+        if start is not None and (start, end) != self.current_request['range']:
+            self.load_data()  # 跨过了日期边界，时间范围已变化
+            return
+        records = [row for row in records if start is None or start <= row[3] < end]
+        if self.time_range.get() in LARGE_RANGES:
+            records.sort(key=lambda row: (row[3], row[0]), reverse=True)
+            self.virtual_table.prepend(records)
+        else:
+            records = sorted((row for row in records if row[0] > self.last_id),
+                             key=lambda row: (row[3], row[0]), reverse=True)
+            for index, row in enumerate(records):
+                self.tree.insert("", index, iid=row[0], values=row)
+            if records:
+                self.loaded_count += len(records)
+                self.last_id = max(self.last_id, max(row[0] for row in records))
+        if not records:
+            return
+        
+        chart_data = merge_chart_data(self.chart_data, records)
+        if chart_data is None:
+            self.load_data()  # 首批数据或超出直方图范围，重新读取汇总表
+            return
+        self.chart_data = chart_data
+        self.status_var.set(f"共 {self.chart_data['total']} 条记录（实时新增 {len(records)} 条）")
+        self.update_charts()
+    
+    def apply_records(self, request, result):
+        """将查询结果填入普通表格并更新图表"""
+        self.show_table(virtual=False)
+        records, incremental = result['records'], request['incremental']
+        if result['chart_data'] is not None:
+            self.chart_data = result['chart_data']
+        
+        if incremental:
+            # 新记录插入到表格顶部，与按时间倒序的已有记录衔接；跳过已由实时推送加入的记录
+            records = [row for row in records if row[0] > self.last_id and not self.tree.exists(row[0])]
+            for index, row in enumerate(records):
+                self.tree.insert("", index, iid=row[0], values=row)
+            self.loaded_count += len(records)
+        else:
             # 清空表格
             for item in self.tree.get_children():
                 self.tree.delete(item)
                 
             # 填充数据
             for row in records:
-                self.tree.insert("", tk.END, values=row)
-                
-            # 更新状态栏
-            self.status_var.set(f"已加载 {len(records)} 条记录")
+                self.tree.insert("", tk.END, iid=row[0], values=row)
             
-            # 将数据转换为DataFrame
-            self.df = pd.DataFrame(records, columns=['id', 'fruit_type', 'weight', 'timestamp'])
+            self.loaded_count = len(records)
+            self.loaded_filter = request['time_filter']
+            self.last_id = 0
+        
+        if records:
+            self.last_id = max(self.last_id, max(row[0] for row in records))
             
-            # 更新图表
+        # 更新状态栏
+        if incremental:
+            self.status_var.set(f"已加载 {self.loaded_count} 条记录（新增 {len(records)} 条）")
+        else:
+            self.status_var.set(f"已加载 {len(records)} 条记录")
+        
+        # 更新图表
+        if records or not incremental:
             self.update_charts()
-            
-            cursor.close()
-            conn.close()
-            
-        except mysql.connector.Error as e:
-            messagebox.showerror("数据库错误", f"无法连接到数据库或查询失败: {e}")
-            self.status_var.set("数据加载失败")
     
-    def get_time_filter(self):
-        """根据选择的时间范围返回SQL WHERE子句"""
+    def show_table(self, virtual):
+        """切换普通表格和虚拟表格"""
+        if virtual:
+            self.list_frame.pack_forget()
+            self.virtual_table.pack(fill=tk.BOTH, expand=True)
+        else:
+            self.virtual_table.pack_forget()
+            self.list_frame.pack(fill=tk.BOTH, expand=True)
+    
+    def load_large_range(self, request, result):
+        """
+        查看本月或所有数据：表格按滚动位置分页读取，图表读取汇总表
+        内存占用和加载耗时与范围内的记录数无关
+        """
+        self.show_table(virtual=True)
+        self.chart_data = result['chart_data']
+        start, end = request['range']
+        
+        # 时间范围和第一页已在工作线程中读取，这里只填入表格
+        self.virtual_table.install(start, end, result['bounds'], result['records'], self.chart_data['total'])
+        
+        # 释放普通表格中已加载的数据，切换回其他时间范围时完整重新加载
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        self.loaded_count = 0
+        self.loaded_filter = None
+        
+        self.status_var.set(f"共 {self.chart_data['total']} 条记录（按需分页加载）")
+        self.update_charts()
+    
+    def get_time_range(self):
+        """根据选择的时间范围返回 (开始时间, 结束时间)，所有数据返回 (None, None)"""
         range_value = self.time_range.get()
         
         if range_value == "all":
-            return ""
+            return None, None
             
         today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
@@ -167,11 +411,85 @@ class WeightDataMonitor:
             else:
                 end_date = today.replace(month=today.month+1, day=1)
         
+        return start_date, end_date
+    
+    def get_time_filter(self):
+        """根据选择的时间范围返回SQL WHERE子句"""
+        start_date, end_date = self.get_time_range()
+        
+        if start_date is None:
+            return ""
+        
         return f"WHERE timestamp BETWEEN '{start_date}' AND '{end_date}'"
         
+    def create_figure(self, tab, figsize):
+        """
+        在选项卡中创建一个常驻的图表
+        使用 Figure 而不是 pyplot，图表不会被 pyplot 全局持有，随窗口一起释放
+        """
+        fig = Figure(figsize=figsize)
+        ax = fig.add_subplot()
+        canvas = FigureCanvasTkAgg(fig, tab)
+        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        return fig, ax, canvas
+    
+    def create_charts(self):
+        """创建三个图表及其图元，之后每次刷新只更新图元的数据"""
+        # 水果类型分布饼图：类别变化时重建扇区，否则原地更新角度
+        self.pie_fig, self.pie_ax, self.pie_canvas = self.create_figure(self.tab1, (6, 5))
+        self.pie_labels = None
+        self.pie_wedges = self.pie_texts = self.pie_autotexts = []
+        self.pie_ax.axis('equal')  # 确保饼图是圆的
+        self.pie_ax.set_title('水果类型分布')
+        
+        # 重量分布直方图
+        self.hist_fig, self.hist_ax, self.hist_canvas = self.create_figure(self.tab2, (6, 5))
+        self.hist_bars = None
+        self.hist_ax.set_xlabel('重量 (g)')
+        self.hist_ax.set_ylabel('频率')
+        self.hist_ax.set_title('水果重量分布')
+        self.mean_line = self.hist_ax.axvline(0, color='red', linestyle='--', linewidth=1, visible=False)
+        self.mean_text = self.hist_ax.text(0, 0.9, '', transform=self.hist_ax.get_xaxis_transform())
+        
+        # 时间趋势双坐标轴折线图
+        self.trend_fig, ax, self.trend_canvas = self.create_figure(self.tab3, (7, 5))
+        ax2 = ax.twinx()
+        self.trend_axes = (ax, ax2)
+        ax.xaxis_date()
+        
+        self.count_line, = ax.plot([], [], '-o', color='blue', label='测量次数')
+        ax.set_xlabel('日期')
+        ax.set_ylabel('测量次数', color='blue')
+        ax.tick_params(axis='y', labelcolor='blue')
+        
+        self.weight_line, = ax2.plot([], [], '-s', color='green', label='平均重量')
+        ax2.set_ylabel('平均重量 (g)', color='green')
+        ax2.tick_params(axis='y', labelcolor='green')
+        
+        # 设置x轴日期格式
+        self.trend_fig.autofmt_xdate()
+        
+        # 添加图例
+        ax.legend([self.count_line, self.weight_line], ['测量次数', '平均重量'], loc='upper left')
+        ax.set_title('每日测量趋势')
+        
+    def close(self):
+        """关闭窗口时终止后台查询，释放数据库连接和图表"""
+        self.cancel_query()
+        self.generation += 1
+        if self.poll_id is not None:
+            self.root.after_cancel(self.poll_id)
+        self.root.after_cancel(self.live_poll_id)
+        self.subscriber.close()
+        self.virtual_table.close()
+        for fig in (self.pie_fig, self.hist_fig, self.trend_fig):
+            fig.clear()
+        self.root.destroy()
+        
     def update_charts(self):
         """更新所有图表"""
-        if self.df.empty:
+        if not self.chart_data['total']:
+            self.clear_charts()
             return
             
         # 更新水果类型分布图
@@ -183,97 +501,98 @@ class WeightDataMonitor:
         # 更新时间趋势图
         self.update_time_trend_chart()
     
+    def clear_charts(self):
+        """没有数据时清空图表内容，保留坐标轴"""
+        for artist in self.pie_wedges + self.pie_texts + self.pie_autotexts:
+            artist.remove()
+        self.pie_wedges = self.pie_texts = self.pie_autotexts = []
+        self.pie_labels = None
+        
+        if self.hist_bars is not None:
+            self.hist_bars.remove()
+            self.hist_bars = None
+        self.mean_line.set_visible(False)
+        self.mean_text.set_text('')
+        
+        self.count_line.set_data([], [])
+        self.weight_line.set_data([], [])
+        
+        for canvas in (self.pie_canvas, self.hist_canvas, self.trend_canvas):
+            canvas.draw_idle()
+    
     def update_fruit_type_chart(self):
         """更新水果类型分布饼图"""
-        # 清空当前图表
-        for widget in self.tab1.winfo_children():
-            widget.destroy()
-            
-        # 创建新的图表
-        fig, ax = plt.subplots(figsize=(6, 5))
-        
-        # 统计水果类型分布
-        fruit_counts = self.df['fruit_type'].value_counts()
-        
-        # 绘制饼图
-        ax.pie(fruit_counts, labels=fruit_counts.index, autopct='%1.1f%%', startangle=90)
-        ax.axis('equal')  # 确保饼图是圆的
-        ax.set_title('水果类型分布')
-        
-        # 嵌入到Tkinter界面
-        canvas = FigureCanvasTkAgg(fig, self.tab1)
-        canvas.draw()
-        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        fruit_counts = self.chart_data['fruit_counts']
+        labels = list(fruit_counts.index)
+        
+        if labels != self.pie_labels:
+            # 类别或排序变化，重建扇区
+            for artist in self.pie_wedges + self.pie_texts + self.pie_autotexts:
+                artist.remove()
+            wedges, texts, autotexts = self.pie_ax.pie(fruit_counts, labels=labels, autopct='%1.1f%%', startangle=90)
+            self.pie_wedges, self.pie_texts, self.pie_autotexts = list(wedges), list(texts), list(autotexts)
+            self.pie_labels = labels
+        else:
+            # 类别不变，只更新扇区角度、标签位置和百分比
+            fractions = fruit_counts.values / fruit_counts.values.sum()
+            theta = 90.0
+            for wedge, text, autotext, fraction in zip(self.pie_wedges, self.pie_texts, self.pie_autotexts, fractions):
+                wedge.set_theta1(theta)
+                theta += 360.0 * fraction
+                wedge.set_theta2(theta)
+                middle = np.deg2rad((wedge.theta1 + wedge.theta2) / 2)
+                x, y = np.cos(middle), np.sin(middle)
+                text.set_position((1.1 * x, 1.1 * y))
+                text.set_horizontalalignment('left' if x > 0 else 'right')
+                autotext.set_position((0.6 * x, 0.6 * y))
+                autotext.set_text(f'{fraction * 100:.1f}%')
+        
+        self.pie_canvas.draw_idle()
     
     def update_weight_distribution_chart(self):
         """更新重量分布直方图"""
-        # 清空当前图表
-        for widget in self.tab2.winfo_children():
-            widget.destroy()
-            
-        # 创建新的图表
-        fig, ax = plt.subplots(figsize=(6, 5))
-        
-        # 绘制直方图
-        ax.hist(self.df['weight'], bins=20, alpha=0.7, color='skyblue', edgecolor='black')
-        ax.set_xlabel('重量 (g)')
-        ax.set_ylabel('频率')
-        ax.set_title('水果重量分布')
-        
-        # 添加均值线
-        mean_weight = self.df['weight'].mean()
-        ax.axvline(mean_weight, color='red', linestyle='--', linewidth=1)
-        ax.text(mean_weight*1.05, ax.get_ylim()[1]*0.9, f'均值: {mean_weight:.2f}g')
-        
-        # 嵌入到Tkinter界面
-        canvas = FigureCanvasTkAgg(fig, self.tab2)
-        canvas.draw()
-        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        ax = self.hist_ax
+        counts, edges = self.chart_data['weight_hist']
+        widths = np.diff(edges)
+        
+        # 分组数不变时原地修改柱子，否则重建
+        if self.hist_bars is None or len(self.hist_bars) != len(counts):
+            if self.hist_bars is not None:
+                self.hist_bars.remove()
+            self.hist_bars = ax.bar(edges[:-1], counts, width=widths, align='edge',
+                                    alpha=0.7, color='skyblue', edgecolor='black')
+        else:
+            for rect, x, width, height in zip(self.hist_bars, edges[:-1], widths, counts):
+                rect.set_x(x)
+                rect.set_width(width)
+                rect.set_height(height)
+        ax.relim()
+        ax.autoscale_view()
+        
+        # 更新均值线
+        mean_weight = self.chart_data['mean_weight']
+        self.mean_line.set_xdata([mean_weight, mean_weight])
+        self.mean_line.set_visible(True)
+        self.mean_text.set_x(mean_weight*1.05)
+        self.mean_text.set_text(f'均值: {mean_weight:.2f}g')
+        
+        self.hist_canvas.draw_idle()
     
     def update_time_trend_chart(self):
         """更新时间趋势线图"""
-        # 清空当前图表
-        for widget in self.tab3.winfo_children():
-            widget.destroy()
-            
-        # 创建新的图表
-        fig, ax = plt.subplots(figsize=(7, 5))
+        ax, ax2 = self.trend_axes
         
-        # 转换时间戳为datetime对象并排序
-        self.df['date'] = pd.to_datetime(self.df['timestamp'])
-        daily_data = self.df.groupby(self.df['date'].dt.date).agg({
-            'id': 'count',
-            'weight': 'mean'
-        }).reset_index()
+        # 每日（范围不超过一天时为每小时）测量次数和平均重量
+        daily_data = self.chart_data['daily']
+        self.count_line.set_data(list(daily_data['date']), list(daily_data['count']))
+        self.weight_line.set_data(list(daily_data['date']), list(daily_data['mean_weight']))
+        for axis in (ax, ax2):
+            axis.relim()
+            axis.autoscale_view()
         
-        # 创建双坐标轴
-        ax2 = ax.twinx()
+        ax.set_title('每小时测量趋势' if self.chart_data['granularity'] == 'hour' else '每日测量趋势')
         
-        # 绘制每日测量次数线图
-        ax.plot(daily_data['date'], daily_data['id'], '-o', color='blue', label='测量次数')
-        ax.set_xlabel('日期')
-        ax.set_ylabel('测量次数', color='blue')
-        ax.tick_params(axis='y', labelcolor='blue')
-        
-        # 绘制每日平均重量线图
-        ax2.plot(daily_data['date'], daily_data['weight'], '-s', color='green', label='平均重量')
-        ax2.set_ylabel('平均重量 (g)', color='green')
-        ax2.tick_params(axis='y', labelcolor='green')
-        
-        # 设置x轴日期格式
-        fig.autofmt_xdate()
-        
-        # 添加图例
-        lines1, labels1 = ax.get_legend_handles_labels()
-        lines2, labels2 = ax2.get_legend_handles_labels()
-        ax.legend(lines1 + lines2, labels1 + labels2, loc='upper left')
-        
-        ax.set_title('每日测量趋势')
-        
-        # 嵌入到Tkinter界面
-        canvas = FigureCanvasTkAgg(fig, self.tab3)
-        canvas.draw()
-        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.trend_canvas.draw_idle()
 
 if __name__ == "__main__":
     root = tk.Tk()
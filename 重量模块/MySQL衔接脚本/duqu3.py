@@ -1,9 +1,19 @@
 import serial
 import time
+import queue
+import threading
 import mysql.connector
+from mysql.connector import pooling
 from datetime import datetime
+import argparse
 import sys
 
+from metrics import gauge, get_logger, inc, observe, setup_logging, start_exporter, timed
+from live_updates import LIVE_HOST, LIVE_PORT, RecordPublisher
+from migrations import migrate
+from rollups import update_rollups
+from weight_filter import WeightStabilizer
+
 # 串口配置
 SERIAL_PORT = 'COM3'  # 根据实际情况修改
 BAUD_RATE = 9600
@@ -16,6 +26,32 @@ DB_CONFIG = {
     'database': 'weight_data'
 }
 
+# 批量写入配置
+POOL_SIZE = 4  # 连接池大小
+BATCH_SIZE = 50  # 缓冲区达到该条数时立即写入
+FLUSH_INTERVAL = 1.0  # 缓冲区中的记录最多等待该秒数后写入
+RETRY_INTERVAL = 5.0  # 写入失败后等待该秒数再重试
+
+# 是否将 fruit_weights 按月分区（需MySQL 5.7+），开启后下次启动时执行分区迁移，
+# 历史数据量很大时，按时间范围的查询只扫描相关月份的分区，过期数据也可以按分区删除
+PARTITION_BY_MONTH = False
+
+# 采集队列配置
+QUEUE_SIZE = 100000  # 串口读取线程与写入线程之间的队列长度
+STATS_INTERVAL = 10.0  # 打印采集统计信息的间隔（秒）
+
+# 性能指标导出（Prometheus文本格式），端口为0、文件为None时不启用
+METRICS_PORT = 0  # 例如 9108 时在本机 http://127.0.0.1:9108/metrics 提供
+METRICS_FILE = None  # 例如 node_exporter textfile 目录下的 duqu3.prom
+
+log = get_logger('duqu3')
+
+INSERT_SQL = "INSERT INTO fruit_weights (fruit_type, weight, timestamp) VALUES (%s, %s, %s)"
+# 多行INSERT的自增ID不一定连续（innodb_autoinc_lock_mode=2 或 auto_increment_increment>1），
+# 此时在同一事务中从第一行的ID开始读回刚写入的记录
+SAVED_SQL = "SELECT id, fruit_type, weight, timestamp FROM fruit_weights WHERE id >= %s ORDER BY id LIMIT %s"
+AUTOINC_SQL = "SELECT @@auto_increment_increment, @@innodb_autoinc_lock_mode"
+
 # 水果类型映射（由串口发送的代码映射到实际类型）
 FRUIT_TYPES = {
     '1': '苹果',
@@ -30,67 +66,267 @@ FRUIT_TYPES = {
     '10': '桃子',
     # 可以添加更多水果类型
 }
+UNCLASSIFIED_FRUIT = '未识别'  # 固件只发送重量读数时记录的水果类型
 
 def setup_database():
     """
-    设置数据库，创建表（如果不存在）
+    设置数据库，执行 migrations.py 中尚未执行的结构迁移
     """
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
-        # 创建水果重量记录表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS fruit_weights (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            fruit_type VARCHAR(50) NOT NULL,
-            weight FLOAT NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        conn.commit()
-        cursor.close()
+        # 按版本号执行尚未执行的结构迁移（建表、汇总表、索引、可选的按月分区）
+        version = migrate(conn, partition=PARTITION_BY_MONTH)
         conn.close()
         
-        print("数据库设置完成")
+        print(f"数据库设置完成，结构版本 v{version}")
         return True
         
     except mysql.connector.Error as e:
         print(f"数据库设置失败: {e}")
         return False
 
-def save_to_database(fruit_type, weight):
+class BatchWriter:
     """
-    将重量数据保存到数据库
+    使用连接池批量写入重量记录
+    记录先缓存在内存中，达到 batch_size 条或距上次写入超过 flush_interval 秒时，
+    在一个事务中用 executemany 一次性写入并累加汇总表，连接用完后归还连接池而不是关闭
+    on_write(records) 在每批记录提交后按顺序调用，用于向监控界面推送新记录；调用时持有写入锁，不能阻塞
     """
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
-        # 插入记录
-        cursor.execute(
-            "INSERT INTO fruit_weights (fruit_type, weight) VALUES (%s, %s)",
-            (fruit_type, weight)
-        )
-        
-        conn.commit()
-        record_id = cursor.lastrowid
-        cursor.close()
-        conn.close()
-        
-        print(f"数据成功保存到数据库，记录ID: {record_id}")
-        return record_id
-        
-    except mysql.connector.Error as e:
-        print(f"数据库保存失败: {e}")
-        return None
 
-def read_serial_data():
+    def __init__(self, pool=None, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, on_write=None):
+        if pool is None:
+            pool = pooling.MySQLConnectionPool(pool_name="fruit_weights", pool_size=POOL_SIZE, **DB_CONFIG)
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_write = on_write
+
+        self._buffer = []
+        self._lock = threading.Lock()  # 保护缓冲区
+        self._flush_lock = threading.Lock()  # 保证批次按顺序写入
+        self._stop = threading.Event()
+        self._timer = threading.Thread(target=self._flush_periodically, name="batch-writer", daemon=True)
+        self._retry_at = 0.0  # 写入失败后，在该时间之前不再尝试写入
+        self._consecutive_ids = None  # 多行INSERT的自增ID是否连续，首次写入时读取服务器配置
+
+        self.written = 0  # 已写入的记录数
+        self.failures = 0  # 写入失败的批次数
+
+    def start(self):
+        self._timer.start()
+        return self
+
+    def close(self):
+        """
+        停止定时写入并写入缓冲区中剩余的记录
+        """
+        self._stop.set()
+        if self._timer.is_alive():
+            self._timer.join()
+        self.flush(force=True)
+
+    def add(self, fruit_type, weight, timestamp=None):
+        """
+        缓存一条记录，缓冲区满时立即写入
+        """
+        with self._lock:
+            self._buffer.append((fruit_type, weight, timestamp or datetime.now()))
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def pending(self):
+        """
+        缓冲区中尚未写入的记录数
+        """
+        return len(self._buffer)
+
+    def flush(self, force=False):
+        """
+        将缓冲区中的记录在一个事务中写入数据库，返回 [(记录ID, 水果类型, 重量, 时间), ...]
+        写入失败时记录放回缓冲区，RETRY_INTERVAL 秒后重试，期间不再反复连接数据库
+        """
+        with self._flush_lock:
+            if not force and time.monotonic() < self._retry_at:
+                return []
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return []
+
+            try:
+                conn = self.pool.get_connection()
+                try:
+                    with timed('db_insert'):
+                        cursor = conn.cursor()
+                        cursor.executemany(INSERT_SQL, rows)
+                        saved = self._saved_records(cursor, rows)
+                        update_rollups(cursor, rows)
+                        conn.commit()
+                        cursor.close()
+                except mysql.connector.Error:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.close()  # 归还连接池
+            except mysql.connector.Error as e:
+                with self._lock:
+                    self._buffer[:0] = rows
+                self.failures += 1
+                inc('db_failures')
+                self._retry_at = time.monotonic() + RETRY_INTERVAL
+                log.warning("数据库保存失败，%d 条记录将在下次写入时重试: %s", len(rows), e)
+                return []
+
+            self.written += len(rows)
+            inc('records_written', len(rows))
+            log.debug("批量写入 %d 条记录，记录ID: %d-%d", len(rows), saved[0][0], saved[-1][0])
+            if self.on_write is not None:
+                self.on_write(saved)
+            return saved
+
+    def _saved_records(self, cursor, rows):
+        """
+        刚写入的记录及其ID，[(记录ID, 水果类型, 重量, 时间), ...]
+        只有步长为1且自增锁模式保证一条INSERT的ID连续（0 或 1）时才按第一行的ID推算，否则读回
+        """
+        first_id = cursor.lastrowid  # 多行INSERT返回第一行的自增ID
+        if self._consecutive_ids is None:
+            cursor.execute(AUTOINC_SQL)
+            increment, lock_mode = cursor.fetchone()
+            self._consecutive_ids = int(increment) == 1 and int(lock_mode) in (0, 1)
+        if self._consecutive_ids:
+            return [(first_id + i,) + row for i, row in enumerate(rows)]
+        cursor.execute(SAVED_SQL, (first_id, len(rows)))
+        return [tuple(row) for row in cursor.fetchall()]
+
+def parse_line(line):
     """
-    从串口读取数据
+    解析一行串口数据，返回 (水果类型, 重量)，格式错误时返回None
     数据格式：fruit_code,weight
     例如：1,156.78 代表一个苹果，重156.78克
+    也支持重量模块固件直接发送的原始读数（只有重量），此时水果类型为None
+    """
+    parts = line.split(',')
+    if len(parts) > 2:
+        return None
+    try:
+        weight = float(parts[-1])
+    except ValueError:
+        return None
+    if len(parts) == 1:
+        return None, weight
+    fruit_code = parts[0].strip()
+    return FRUIT_TYPES.get(fruit_code, f"未知类型({fruit_code})"), weight
+
+class SerialIngest:
+    """
+    串口读取与数据库写入解耦的采集流程
+    读取线程只负责读行、解析并放入队列，写入线程从队列取出记录交给 BatchWriter，
+    数据库变慢或暂时不可用时记录在队列和写入缓冲区中等待，不会阻塞串口读取
+    原始重量读数先经过 WeightStabilizer，每次放置水果只产生一条记录
+    """
+
+    def __init__(self, ser, writer, queue_size=QUEUE_SIZE, stabilizer=None):
+        self.ser = ser
+        self.writer = writer
+        self.stabilizer = stabilizer or WeightStabilizer()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._reader = threading.Thread(target=self._read_loop, name="serial-reader", daemon=True)
+        self._consumer = threading.Thread(target=self._write_loop, name="db-writer", daemon=True)
+
+        # 统计信息
+        self.lines = 0  # 收到的数据行数
+        self.bad_lines = 0  # 格式错误被丢弃的行数
+        self.dropped = 0  # 队列已满被丢弃的记录数
+
+    def start(self):
+        gauge('ingest_queue_depth', self.queue.qsize)
+        gauge('writer_pending', self.writer.pending)
+        self._reader.start()
+        self._consumer.start()
+        return self
+
+    def stop(self):
+        """
+        停止读取串口，等待队列中剩余的记录全部交给写入器
+        """
+        self._stop.set()
+        self._reader.join()
+        self._consumer.join()
+
+    def wait(self, timeout=None):
+        """
+        等待读取线程结束，超时后返回读取线程是否仍在运行
+        """
+        self._reader.join(timeout)
+        return self._reader.is_alive()
+
+    def _read_loop(self):
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                raw = self.ser.readline()
+            except serial.SerialException as e:
+                log.error("串口错误: %s", e)
+                break
+            t1 = time.perf_counter()
+            line = raw.decode('utf-8', errors='replace').strip()
+            if not line:
+                continue
+
+            # 等待下一行的时间不计入，只统计收到数据的读取
+            observe('serial_read', t1 - t0)
+            self.lines += 1
+            inc('lines')
+            parsed = parse_line(line)
+            observe('parse', time.perf_counter() - t1)
+            if parsed is None:
+                self.bad_lines += 1
+                inc('bad_lines')
+                log.warning("格式错误的数据行: %r", line)
+                continue
+            fruit_type, weight = parsed
+            if fruit_type is None:
+                # 原始读数：只在一次放置稳定后产生一条记录
+                weight = self.stabilizer.update(weight)
+                if weight is None:
+                    continue
+                fruit_type = UNCLASSIFIED_FRUIT
+            try:
+                self.queue.put_nowait((fruit_type, weight, datetime.now()))
+            except queue.Full:
+                self.dropped += 1
+                inc('records_dropped')
+
+    def _write_loop(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            try:
+                fruit_type, weight, timestamp = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.writer.add(fruit_type, weight, timestamp)
+
+    def stats(self):
+        return {
+            'lines': self.lines,
+            'bad_lines': self.bad_lines,
+            'samples': self.stabilizer.samples,
+            'settled': self.stabilizer.settled,
+            'dropped': self.dropped,
+            'queue_depth': self.queue.qsize(),
+            'pending': self.writer.pending(),
+            'written': self.writer.written,
+        }
+
+def read_serial_data(writer):
+    """
+    从串口读取数据并交给写入器，直到用户中断
     """
     try:
         ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
@@ -103,40 +339,16 @@ def read_serial_data():
         ser.flushInput()
         
         print("等待重量数据...")
-        
-        while True:
-            # 读取一行数据
-            line = ser.readline().decode('utf-8').strip()
-            
-            # 如果有数据
-            if line:
-                print(f"接收到数据: {line}")
-                
-                try:
-                    # 解析数据
-                    parts = line.split(',')
-                    if len(parts) == 2:
-                        fruit_code = parts[0]
-                        weight = float(parts[1])
-                        
-                        # 获取水果类型
-                        fruit_type = FRUIT_TYPES.get(fruit_code, f"未知类型({fruit_code})")
-                        
-                        print(f"解析结果: {fruit_type}, {weight}g")
-                        
-                        # 保存到数据库
-                        record_id = save_to_database(fruit_type, weight)
-                        
-                        if record_id:
-                            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
-                                  f"记录 #{record_id}: {fruit_type}, {weight}g")
-                    else:
-                        print(f"数据格式错误: {line}")
-                except Exception as e:
-                    print(f"数据处理错误: {e}")
-            
-            # 短暂延时
-            time.sleep(0.1)
+        ingest = SerialIngest(ser, writer).start()
+        try:
+            while ingest.wait(STATS_INTERVAL):
+                stats = ingest.stats()
+                log.info("收到 %d 行（原始读数 %d，稳定记录 %d）, 已写入 %d 条, 队列 %d, 待写入 %d, "
+                         "格式错误 %d, 丢弃 %d", stats['lines'], stats['samples'], stats['settled'],
+                         stats['written'], stats['queue_depth'], stats['pending'], stats['bad_lines'],
+                         stats['dropped'])
+        finally:
+            ingest.stop()
             
     except serial.SerialException as e:
         print(f"串口错误: {e}")
@@ -154,6 +366,13 @@ def main():
     """
     主函数
     """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT, help='Prometheus指标端口，0 表示不启用')
+    parser.add_argument('--metrics-file', type=str, default=METRICS_FILE, help='定期把Prometheus指标写入该文件')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='日志级别')
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
     print("水果重量测量系统 - 数据读取程序")
     print("=" * 50)
     
@@ -162,8 +381,27 @@ def main():
         print("无法继续，程序退出")
         sys.exit(1)
     
-    # 读取串口数据
-    read_serial_data()
+    # 向监控界面推送新写入的记录，端口被占用时只写数据库
+    try:
+        publisher = RecordPublisher().start()
+        print(f"实时推送已启动: {LIVE_HOST}:{LIVE_PORT}")
+    except OSError as e:
+        publisher = None
+        print(f"实时推送启动失败，监控界面需手动刷新: {e}")
+    
+    try:
+        start_exporter(args.metrics_port, args.metrics_file)
+    except OSError as e:
+        print(f"指标导出启动失败: {e}")
+
+    # 读取串口数据，缓冲区中的记录在退出前全部写入
+    writer = BatchWriter(on_write=publisher.publish if publisher else None).start()
+    try:
+        read_serial_data(writer)
+    finally:
+        writer.close()
+        if publisher is not None:
+            publisher.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,239 @@
+"""
+视觉 + 重量融合采集服务
+在一个 asyncio 事件循环中同时读取摄像头和重量模块两个串口：
+摄像头的每帧检测结果按时间保存，重量稳定后取时间上最接近的检测结果作为水果类型，
+写入一条同时包含类型和重量的记录，不再需要单独运行识别程序和手动输入水果代码
+"""
+import argparse
+import asyncio
+import functools
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+import serial
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '机器学习'))
+
+from change_gate import ChangeGate, GatedDetector
+from detector import BACKENDS, create_detector
+from frame_reader import SerialFrameReader
+from inference_server import InferenceClient
+from metrics import get_logger, setup_logging, start_exporter
+
+from duqu3 import (BAUD_RATE, METRICS_FILE, METRICS_PORT, SERIAL_PORT, STATS_INTERVAL, UNCLASSIFIED_FRUIT,
+                   BatchWriter, parse_line, setup_database)
+from live_updates import RecordPublisher
+from weight_filter import WeightStabilizer
+
+# 摄像头配置
+CAMERA_PORT = 'COM4'  # 根据实际情况修改
+CAMERA_BAUD_RATE = 460800
+
+# 配对配置
+PAIR_WINDOW = 3.0  # 检测结果与重量稳定时间相差不超过该秒数才能配对
+DETECTION_HISTORY = 10.0  # 保留最近该秒数内的检测结果
+
+log = get_logger('fusion')
+
+# 检测模型的英文类别名 -> 数据库中使用的中文水果类型
+CLASS_NAMES_ZH = {
+    'apple': '苹果',
+    'banana': '香蕉',
+    'orange': '橙子',
+    'strawberry': '草莓',
+    'kiwi': '猕猴桃',
+    'grape': '葡萄',
+    'watermelon': '西瓜',
+    'pineapple': '菠萝',
+    'mango': '芒果',
+    'pear': '梨',
+    'peach': '桃子',
+    'plum': '李子',
+    'lemon': '柠檬',
+    'lime': '青柠',
+    'blueberry': '蓝莓',
+    'cherry': '樱桃',
+    'avocado': '牛油果',
+    'pomegranate': '石榴',
+}
+
+
+async def run_blocking(func, *args):
+    """
+    在线程池中执行阻塞的串口读取或推理，事件循环不被阻塞（兼容 Python 3.7）
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args))
+
+
+class FusionService:
+    """
+    融合采集服务：camera_loop 持续检测并记录 (时间, 最可信的检测结果)，
+    scale_loop 读取重量，每次放置稳定后调用 pair 配对并写入数据库；带水果代码的数据行直接按代码写入，不配对
+    """
+
+    def __init__(self, reader, detector, scale, writer, stabilizer=None, pair_window=PAIR_WINDOW):
+        self.reader = reader
+        self.detector = detector
+        self.scale = scale
+        self.writer = writer
+        self.stabilizer = stabilizer or WeightStabilizer()
+        self.pair_window = pair_window
+
+        self.detections = deque()  # (perf_counter 时间, 检测结果)，按时间递增
+        self._new_detection = None  # asyncio.Event，在事件循环中创建
+
+        # 统计信息
+        self.frames = 0  # 检测的帧数
+        self.paired = 0  # 与检测结果配对的记录数
+        self.unpaired = 0  # 没有可用检测结果的记录数
+
+    async def run(self):
+        self._new_detection = asyncio.Event()
+        await asyncio.gather(self.camera_loop(), self.scale_loop(), self.stats_loop())
+
+    async def camera_loop(self):
+        while True:
+            frame = await run_blocking(self.reader.read_frame)
+            if frame is None:
+                continue
+            captured_at = time.perf_counter()  # 按采集时间而不是推理完成时间配对
+            results = await run_blocking(self.detector.detect, frame)
+            self.frames += 1
+
+            best = max(results, key=lambda r: r['confidence']) if results else None
+            self.detections.append((captured_at, best))
+            while self.detections and captured_at - self.detections[0][0] > DETECTION_HISTORY:
+                self.detections.popleft()
+            self._new_detection.set()
+
+    async def scale_loop(self):
+        while True:
+            raw = await run_blocking(self.scale.readline)
+            line = raw.decode('utf-8', errors='replace').strip()
+            parsed = parse_line(line) if line else None
+            if parsed is None:
+                continue
+
+            fruit_type, weight = parsed
+            if fruit_type is not None:
+                # 操作员输入了水果代码，直接使用，不与检测结果配对
+                log.info("%s %.2fg（水果代码）", fruit_type, weight)
+                await run_blocking(self.writer.add, fruit_type, weight, datetime.now())
+                continue
+
+            weight = self.stabilizer.update(weight)
+            if weight is None:
+                continue
+            settled_at, timestamp = time.perf_counter(), datetime.now()
+
+            detection = await self.pair(settled_at)
+            if detection is not None:
+                fruit_type = CLASS_NAMES_ZH.get(detection['class_name'], detection['class_name'])
+                self.paired += 1
+                log.info("%s %.2fg（置信度 %.2f）", fruit_type, weight, detection['confidence'])
+            else:
+                fruit_type = UNCLASSIFIED_FRUIT
+                self.unpaired += 1
+                log.info("%s %.2fg（无可用检测结果）", fruit_type, weight)
+            await run_blocking(self.writer.add, fruit_type, weight, timestamp)
+
+    async def pair(self, settled_at):
+        """
+        返回与 settled_at 时间最接近的检测结果（pair_window 内）
+        若还没有该时间之后的检测，等待下一帧检测完成，最多等待 pair_window 秒
+        """
+        deadline = settled_at + self.pair_window
+        while not self.detections or self.detections[-1][0] < settled_at:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            self._new_detection.clear()
+            try:
+                await asyncio.wait_for(self._new_detection.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+
+        candidates = [(abs(t - settled_at), detection) for t, detection in self.detections
+                      if detection is not None and abs(t - settled_at) <= self.pair_window]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda c: c[0])[1]
+
+    async def stats_loop(self):
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            gated = ""
+            if isinstance(self.detector, GatedDetector):
+                gated = f"（复用结果 {self.detector.stats()['hits']} 帧）"
+            log.info("检测 %d 帧%s, 原始读数 %d, 配对 %d 条, 未配对 %d 条, 已写入 %d 条", self.frames, gated,
+                     self.stabilizer.samples, self.paired, self.unpaired, self.writer.written)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='视觉 + 重量融合采集服务')
+    parser.add_argument('--camera-port', default=CAMERA_PORT, help='摄像头串口')
+    parser.add_argument('--camera-baudrate', type=int, default=CAMERA_BAUD_RATE, help='摄像头串口波特率')
+    parser.add_argument('--scale-port', default=SERIAL_PORT, help='重量模块串口')
+    parser.add_argument('--scale-baudrate', type=int, default=BAUD_RATE, help='重量模块串口波特率')
+    parser.add_argument('--backend', choices=BACKENDS, default='torch', help='推理后端')
+    parser.add_argument('--weights', default=None, help='模型权重，默认按后端选择')
+    parser.add_argument('--pair-window', type=float, default=PAIR_WINDOW, help='配对的最大时间差（秒）')
+    parser.add_argument('--server', action='store_true', help='使用本机推理服务（inference_server.py）')
+    parser.add_argument('--gate', action='store_true', help='画面没有变化时复用上一次的检测结果，跳过推理')
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT, help='Prometheus指标端口，0 表示不启用')
+    parser.add_argument('--metrics-file', type=str, default=METRICS_FILE, help='定期把Prometheus指标写入该文件')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='日志级别')
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    print("水果重量测量系统 - 视觉与重量融合采集服务")
+    print("=" * 50)
+
+    if not setup_database():
+        print("无法继续，程序退出")
+        sys.exit(1)
+
+    try:
+        start_exporter(args.metrics_port, args.metrics_file)
+    except OSError as e:
+        print(f"指标导出启动失败: {e}")
+
+    weights = args.weights or ('yolov5s.onnx' if args.backend == 'onnx' else 'yolov5s.pt')
+    detector = InferenceClient() if args.server else create_detector(args.backend, weights)
+    if args.gate:
+        detector = GatedDetector(detector, ChangeGate())
+
+    try:
+        publisher = RecordPublisher().start()
+    except OSError as e:
+        publisher = None
+        print(f"实时推送启动失败，监控界面需手动刷新: {e}")
+    writer = BatchWriter(on_write=publisher.publish if publisher else None).start()
+
+    reader = scale = None
+    try:
+        reader = SerialFrameReader(args.camera_port, args.camera_baudrate)
+        scale = serial.Serial(args.scale_port, args.scale_baudrate, timeout=1)
+        print(f"串口 {args.scale_port} 已打开")
+
+        service = FusionService(reader, detector, scale, writer, pair_window=args.pair_window)
+        asyncio.run(service.run())
+    except serial.SerialException as e:
+        print(f"串口错误: {e}")
+    except KeyboardInterrupt:
+        print("\n程序被用户中断")
+    finally:
+        for port in (reader, scale):
+            if port is not None:
+                port.close()
+        writer.close()
+        if publisher is not None:
+            publisher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import json
+import os
+import queue
+import socket
+import threading
+from datetime import datetime
+
+# 本机实时推送通道：采集程序每写入一批记录就推送给所有已连接的监控界面
+# 使用本机TCP而不是Unix套接字，Windows 下同样可用
+LIVE_HOST = '127.0.0.1'
+LIVE_PORT = 50007
+SEND_TIMEOUT = 0.5  # 向订阅者发送的超时（秒），超时的订阅者被断开，不会拖慢写入
+RECONNECT_INTERVAL = 2.0  # 订阅者断线后重连的间隔（秒）
+
+
+def encode_records(records):
+    """
+    将 [(记录ID, 水果类型, 重量, 时间), ...] 编码为每行一条记录的JSON
+    """
+    return b''.join(
+        json.dumps({'id': record_id, 'fruit_type': fruit_type, 'weight': weight,
+                    'timestamp': timestamp.isoformat()}, ensure_ascii=False).encode('utf-8') + b'\n'
+        for record_id, fruit_type, weight, timestamp in records
+    )
+
+
+def decode_record(line):
+    """
+    解码一行JSON，返回 (记录ID, 水果类型, 重量, 时间)
+    """
+    record = json.loads(line)
+    return record['id'], record['fruit_type'], record['weight'], datetime.fromisoformat(record['timestamp'])
+
+
+class RecordPublisher:
+    """
+    推送端：在本机端口上监听，将新写入的记录广播给所有订阅者
+    publish 只把记录放入发送队列，由发送线程按顺序发送，订阅者接收过慢不会阻塞数据库写入；
+    没有订阅者时 publish 几乎没有开销，推送失败不影响数据写入
+    """
+
+    def __init__(self, host=LIVE_HOST, port=LIVE_PORT):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if os.name != 'nt':  # Windows 下 SO_REUSEADDR 允许多个进程绑定同一端口
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen()
+        self._clients = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._accept_loop, name="live-publisher", daemon=True)
+        self._outbox = queue.Queue()  # 写入线程 -> 发送线程的记录批次
+        self._sender = threading.Thread(target=self._send_loop, name="live-sender", daemon=True)
+
+        self.published = 0  # 已推送的记录数
+
+    def start(self):
+        self._thread.start()
+        self._sender.start()
+        return self
+
+    def close(self):
+        self._outbox.put(None)
+        if self._sender.is_alive():
+            self._sender.join(SEND_TIMEOUT * 2)  # 尽量发出已排队的记录
+        self._server.close()
+        with self._lock:
+            for client in self._clients:
+                client.close()
+            self._clients = []
+
+    def _accept_loop(self):
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:  # 监听套接字已关闭
+                break
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client.settimeout(SEND_TIMEOUT)
+            with self._lock:
+                self._clients.append(client)
+
+    def publish(self, records):
+        """
+        推送一批已写入数据库的记录：只放入发送队列，不等待发送
+        """
+        if not records or not self._clients:
+            return
+        self._outbox.put(list(records))
+
+    def _send_loop(self):
+        while True:
+            records = self._outbox.get()
+            if records is None:
+                break
+            self._send(records)
+
+    def _send(self, records):
+        data = encode_records(records)
+        with self._lock:
+            alive = []
+            for client in self._clients:
+                try:
+                    client.sendall(data)
+                    alive.append(client)
+                except OSError:  # 订阅者已退出或接收过慢
+                    client.close()
+            self._clients = alive
+        self.published += len(records)
+
+
+class RecordSubscriber:
+    """
+    订阅端：在后台线程中接收推送的记录，每收到一批调用一次 callback(records)
+    callback 在后台线程中执行，界面程序应只在其中把记录转交给主线程
+    采集程序未运行或重启时自动重连
+    """
+
+    def __init__(self, callback, host=LIVE_HOST, port=LIVE_PORT):
+        self.callback = callback
+        self.address = (host, port)
+        self.connected = False
+        self._sock = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._receive_loop, name="live-subscriber", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._sock is not None:
+            self._sock.close()
+
+    def _receive_loop(self):
+        while not self._stop.is_set():
+            try:
+                self._sock = socket.create_connection(self.address)
+            except OSError:
+                self._stop.wait(RECONNECT_INTERVAL)
+                continue
+
+            self.connected = True
+            buffer = b''
+            try:
+                while True:
+                    data = self._sock.recv(65536)
+                    if not data:
+                        break
+                    buffer += data
+                    # 一次 recv 可能包含多条记录或半条记录
+                    *lines, buffer = buffer.split(b'\n')
+                    records = [decode_record(line) for line in lines if line]
+                    if records:
+                        self.callback(records)
+            except OSError:
+                pass
+            finally:
+                self.connected = False
+                self._sock.close()
+            self._stop.wait(RECONNECT_INTERVAL)
@@ -0,0 +1,167 @@
+from datetime import date
+
+from rollups import ROLLUP_TABLES, rebuild_rollups
+
+
+def create_index(cursor, table, name, columns):
+    """
+    创建索引（已存在时跳过），MySQL 不支持 CREATE INDEX IF NOT EXISTS
+    """
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (table, name)
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+
+def backfill_rollups(cursor):
+    """
+    汇总表为空时由已有的原始记录生成汇总数据
+    """
+    cursor.execute("SELECT EXISTS(SELECT 1 FROM fruit_weight_daily)")
+    if not cursor.fetchone()[0]:
+        rebuild_rollups(cursor)
+
+
+def add_indexes(cursor):
+    """
+    按时间范围查询（监控界面的所有时间筛选）和按水果类型+时间查询的索引
+    InnoDB 二级索引隐含主键列，idx_timestamp 同时满足键集分页的 ORDER BY timestamp, id
+    """
+    create_index(cursor, 'fruit_weights', 'idx_timestamp', 'timestamp')
+    create_index(cursor, 'fruit_weights', 'idx_fruit_type_timestamp', 'fruit_type, timestamp')
+
+
+def _month_start(day, offset=0):
+    """
+    day 所在月份之后第 offset 个月的1号
+    """
+    month = day.month - 1 + offset
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def _partition_definition(start):
+    """
+    存放 start 所在月份数据的分区定义
+    """
+    return f"PARTITION p{start:%Y%m} VALUES LESS THAN (TO_DAYS('{_month_start(start, 1)}'))"
+
+
+def partition_by_month(cursor, months_ahead=3):
+    """
+    将 fruit_weights 改为按月RANGE分区
+    分区表的每个唯一键都必须包含分区列，因此主键改为 (id, timestamp)
+    """
+    cursor.execute("SELECT MIN(timestamp) FROM fruit_weights")
+    oldest = cursor.fetchone()[0] or date.today()
+    first, last = _month_start(oldest), _month_start(date.today(), months_ahead)
+
+    partitions = []
+    month = first
+    while month <= last:
+        partitions.append(_partition_definition(month))
+        month = _month_start(month, 1)
+    partitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+
+    cursor.execute("ALTER TABLE fruit_weights MODIFY timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP")
+    cursor.execute("ALTER TABLE fruit_weights DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)")
+    cursor.execute(
+        "ALTER TABLE fruit_weights PARTITION BY RANGE (TO_DAYS(timestamp)) ("
+        + ", ".join(partitions) + ")"
+    )
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'fruit_weights' AND PARTITION_NAME IS NOT NULL"
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def ensure_month_partitions(cursor, months_ahead=3):
+    """
+    为分区表提前创建未来 months_ahead 个月的分区，避免新数据都落入 pmax
+    """
+    cursor.execute(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'fruit_weights' AND PARTITION_NAME LIKE 'p2%'"
+    )
+    existing = {name for (name,) in cursor.fetchall()}
+    if not existing:
+        return
+
+    month = _month_start(date.today())
+    last = _month_start(date.today(), months_ahead)
+    missing = []
+    while month <= last:
+        if f"p{month:%Y%m}" not in existing:
+            missing.append(_partition_definition(month))
+        month = _month_start(month, 1)
+    if missing:
+        cursor.execute(
+            "ALTER TABLE fruit_weights REORGANIZE PARTITION pmax INTO ("
+            + ", ".join(missing) + ", PARTITION pmax VALUES LESS THAN MAXVALUE)"
+        )
+
+
+# 数据库结构迁移，按版本号顺序执行，已执行的版本记录在 schema_version 表中
+# 每个步骤是一条SQL语句或一个接收游标的函数
+MIGRATIONS = [
+    (1, "创建水果重量记录表", [
+        '''
+        CREATE TABLE IF NOT EXISTS fruit_weights (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            fruit_type VARCHAR(50) NOT NULL,
+            weight FLOAT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    (2, "创建按小时/按天的汇总表", ROLLUP_TABLES + [backfill_rollups]),
+    (3, "添加 timestamp 和 (fruit_type, timestamp) 索引", [add_indexes]),
+]
+
+# 按月分区是可选的迁移，只在 migrate(partition=True) 时执行
+PARTITION_MIGRATION = (4, "按月对 fruit_weights 做RANGE分区", [partition_by_month])
+
+
+def current_version(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        description VARCHAR(200) NOT NULL,
+        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cursor.fetchone()[0]
+
+
+def migrate(conn, target=None, partition=False):
+    """
+    执行尚未执行的迁移，直到 target 版本（默认最新），返回迁移后的版本号
+    """
+    cursor = conn.cursor()
+    version = current_version(cursor)
+
+    migrations = MIGRATIONS + ([PARTITION_MIGRATION] if partition else [])
+    for number, description, steps in migrations:
+        if number <= version or (target is not None and number > target):
+            continue
+        print(f"执行数据库迁移 v{number}: {description}")
+        for step in steps:
+            if callable(step):
+                step(cursor)
+            else:
+                cursor.execute(step)
+        cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)", (number, description))
+        conn.commit()
+        version = number
+
+    if is_partitioned(cursor):
+        ensure_month_partitions(cursor)
+    cursor.close()
+    return version
@@ -0,0 +1,358 @@
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox
+import mysql.connector
+
+SELECT_COLUMNS = "SELECT id, fruit_type, weight, timestamp FROM fruit_weights"
+POLL_INTERVAL = 50  # 等待后台取页期间检查结果的间隔（毫秒）
+
+
+class KeysetPager:
+    """
+    按 (timestamp, id) 倒序对重量记录做键集分页
+    每次查询都从上一页的边界记录继续，而不是使用OFFSET，
+    因此无论翻到第几页，查询代价都只与页大小有关
+    conn 为调用方已打开的连接（例如加载线程的连接，可被 KILL QUERY 终止），为None时按需连接
+    """
+
+    def __init__(self, db_config, conn=None):
+        self.db_config = db_config
+        self.conn = conn
+        self.range_condition = ""  # 时间范围条件，为空表示所有数据
+        self.range_params = ()
+
+    def _query(self, sql, params=()):
+        if self.conn is None or not self.conn.is_connected():
+            self.conn = mysql.connector.connect(**self.db_config)
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            self.conn.commit()  # 结束只读事务，下次查询能看到新写入的记录
+
+    def _where(self, condition="", params=()):
+        """
+        将时间范围条件与键集条件合并为WHERE子句
+        """
+        conditions = [c for c in (self.range_condition, condition) if c]
+        clause = "WHERE " + " AND ".join(f"({c})" for c in conditions) if conditions else ""
+        return clause, self.range_params + tuple(params)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def set_range(self, start=None, end=None):
+        """
+        限定分页的时间范围 [start, end)，start 为None表示所有数据
+        """
+        if start is None:
+            self.range_condition, self.range_params = "", ()
+        else:
+            self.range_condition, self.range_params = "timestamp >= %s AND timestamp < %s", (start, end)
+
+    def bounds(self):
+        """
+        返回时间范围内的 (最早时间, 最新时间)
+        """
+        where, params = self._where()
+        return self._query(f"SELECT MIN(timestamp), MAX(timestamp) FROM fruit_weights {where}", params)[0]
+
+    def newest(self, limit):
+        where, params = self._where()
+        return self._query(f"{SELECT_COLUMNS} {where} ORDER BY timestamp DESC, id DESC LIMIT %s", params + (limit,))
+
+    def older_than(self, row, limit):
+        """
+        紧接在 row 之后（更早）的 limit 条记录，按时间倒序
+        """
+        record_id, timestamp = row[0], row[3]
+        where, params = self._where("timestamp < %s OR (timestamp = %s AND id < %s)",
+                                    (timestamp, timestamp, record_id))
+        return self._query(f"{SELECT_COLUMNS} {where} ORDER BY timestamp DESC, id DESC LIMIT %s", params + (limit,))
+
+    def newer_than(self, row, limit):
+        """
+        紧接在 row 之前（更新）的 limit 条记录，按时间倒序
+        """
+        record_id, timestamp = row[0], row[3]
+        where, params = self._where("timestamp > %s OR (timestamp = %s AND id > %s)",
+                                    (timestamp, timestamp, record_id))
+        rows = self._query(f"{SELECT_COLUMNS} {where} ORDER BY timestamp ASC, id ASC LIMIT %s", params + (limit,))
+        return rows[::-1]
+
+    def seek(self, timestamp, limit):
+        """
+        从指定时间开始（含）向更早方向取 limit 条记录
+        """
+        where, params = self._where("timestamp <= %s", (timestamp,))
+        return self._query(f"{SELECT_COLUMNS} {where} ORDER BY timestamp DESC, id DESC LIMIT %s", params + (limit,))
+
+
+class VirtualRecordTable:
+    """
+    虚拟滚动的重量记录表格
+    Treeview 只保留固定数量的行控件，滚动时按需通过 KeysetPager 取页，
+    内存中最多缓存 max_pages 页记录，表格再大内存占用和刷新耗时都保持不变。
+    滚动条位置按时间比例计算，拖动滚动条时按对应时间定位。
+    所有分页查询都在取页线程中执行，结果由主线程定时取出，数据库变慢时界面不会卡住；
+    同一时间只有一个取页请求，新的定位请求会取代尚未完成的旧请求。
+    """
+
+    def __init__(self, parent, db_config, visible_rows=25, page_size=100, max_pages=3):
+        self.pager = KeysetPager(db_config)
+        self.visible_rows = visible_rows
+        self.page_size = page_size
+        self.max_rows = page_size * max_pages
+
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=("id", "fruit_type", "weight", "time"),
+                                 show="headings", height=visible_rows)
+        self.tree.heading("id", text="ID")
+        self.tree.heading("fruit_type", text="水果类型")
+        self.tree.heading("weight", text="重量(g)")
+        self.tree.heading("time", text="测量时间")
+
+        self.tree.column("id", width=50)
+        self.tree.column("fruit_type", width=100)
+        self.tree.column("weight", width=100)
+        self.tree.column("time", width=150)
+
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        # 行控件只创建一次，滚动时原地更新内容
+        self.items = [self.tree.insert("", tk.END, values=()) for _ in range(visible_rows)]
+
+        for widget in (self.tree, self.scrollbar):
+            widget.bind("<MouseWheel>", self.on_mousewheel)
+            widget.bind("<Button-4>", lambda e: self.scroll(-3))
+            widget.bind("<Button-5>", lambda e: self.scroll(3))
+
+        self.rows = []  # 缓存的连续记录（按时间倒序）
+        self.top = 0  # 可见区域第一行在缓存中的位置
+        self.at_newest = True  # 缓存的第一条是否就是最新记录
+        self.at_oldest = False  # 缓存的最后一条是否就是最早记录
+        self.oldest = self.newest = None
+        self.total = 0
+
+        # 取页线程：KeysetPager 的连接只在该线程中使用
+        self.jobs = queue.Queue()  # 主线程 -> 取页线程的 (序号, 类型, 函数, 参数)
+        self.results = queue.Queue()  # 取页线程 -> 主线程的 (序号, 类型, 结果)
+        self.generation = 0  # 最新取页请求的序号，序号不同的结果已过时
+        self.fetching = None  # 正在等待的取页类型：older / newer / seek
+        self.poll_id = None
+        threading.Thread(target=self.fetch_worker, name="record-pager", daemon=True).start()
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def pack_forget(self):
+        self.frame.pack_forget()
+
+    def close(self):
+        self.generation += 1
+        if self.poll_id is not None:
+            self.frame.after_cancel(self.poll_id)
+        self.jobs.put(None)  # 取页线程关闭连接后退出
+
+    def fetch_worker(self):
+        """
+        取页线程：按顺序执行查询，跳过已被取代的请求
+        """
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.pager.close()
+                return
+            generation, kind, func, args = job
+            if kind is not None and generation != self.generation:
+                continue  # 切换范围等不需要结果的请求总是执行
+            try:
+                result = func(*args)
+            except mysql.connector.Error as e:
+                result = e
+            self.results.put((generation, kind, result))
+
+    def request(self, kind, func, *args):
+        """
+        在取页线程中执行 func(*args)，结果由 poll_results 交给 apply_page；kind 为None时不需要结果
+        """
+        if kind is not None:
+            self.generation += 1
+            self.fetching = kind
+            if self.poll_id is None:
+                self.poll_id = self.frame.after(POLL_INTERVAL, self.poll_results)
+        self.jobs.put((self.generation, kind, func, args))
+
+    def cancel_fetch(self):
+        """丢弃尚未完成的取页请求的结果"""
+        self.generation += 1
+        self.fetching = None
+
+    def poll_results(self):
+        """主线程：取出取页线程的结果，丢弃已被取代的请求"""
+        self.poll_id = None
+        while True:
+            try:
+                generation, kind, result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation:
+                continue
+            self.fetching = None
+            if isinstance(result, mysql.connector.Error):
+                messagebox.showerror("数据库错误", f"无法连接到数据库或查询失败: {result}")
+                self.top = max(0, min(self.top, len(self.rows) - self.visible_rows))
+                self.render()
+            else:
+                self.apply_page(kind, result)
+        if self.fetching is not None:
+            self.poll_id = self.frame.after(POLL_INTERVAL, self.poll_results)
+
+    def install(self, start, end, bounds, rows, total=0):
+        """
+        切换到时间范围 [start, end) 并回到最新记录，使用已在后台线程中读取的
+        bounds（KeysetPager.bounds 的结果）和第一页记录 rows（KeysetPager.newest 的结果），不查询数据库；
+        total 为范围内的记录数，用于计算滚动条长度
+        """
+        self.cancel_fetch()
+        self.request(None, self.pager.set_range, start, end)  # 取页线程按顺序执行，之后的查询使用新的范围
+        self.oldest, self.newest = bounds
+        self.total = total
+        self.rows = list(rows)
+        self.top = 0
+        self.at_newest = True
+        self.at_oldest = len(self.rows) < self.page_size
+        self.render()
+
+    def prepend(self, records):
+        """
+        追加实时推送的新记录（按时间倒序），缓存从最新记录开始时才插入缓存顶部，
+        否则只更新总数和时间范围，滚动到顶部时会按需读到这些记录
+        """
+        if self.at_newest and self.rows:
+            records = [row for row in records if row[3] > self.rows[0][3]
+                       or (row[3] == self.rows[0][3] and row[0] > self.rows[0][0])]
+        if not records:
+            return
+        self.total += len(records)
+        self.newest = max(self.newest or records[0][3], records[0][3])
+        if self.oldest is None:
+            self.oldest = records[-1][3]
+        if self.at_newest:
+            self.rows[:0] = records
+            if self.top > 0:
+                self.top += len(records)  # 已向下滚动时保持可见内容不变
+            if len(self.rows) > self.max_rows:
+                self.rows = self.rows[:self.max_rows]
+                self.at_oldest = False
+                if self.fetching == 'older':
+                    self.cancel_fetch()  # 缓存底部已被丢弃，正在读取的更早一页接不上
+                    self.fill()
+                    return
+        self.render()
+
+    def scroll(self, delta):
+        """
+        向下（delta > 0，更早的记录）或向上滚动 delta 行
+        """
+        if not self.rows:
+            return
+        self.top += delta
+        self.fill()
+
+    def fill(self):
+        """
+        可见区域超出缓存时在后台读取相邻的一页，读取完成后 apply_page 再次调用；
+        不需要读取时把可见区域限制在缓存范围内
+        """
+        if self.fetching is None:
+            if self.top + self.visible_rows > len(self.rows) and not self.at_oldest:
+                # 接近缓存底部时加载更早的一页
+                self.request('older', self.pager.older_than, self.rows[-1], self.page_size)
+            elif self.top < 0 and not self.at_newest:
+                # 接近缓存顶部时加载更新的一页
+                self.request('newer', self.pager.newer_than, self.rows[0], self.page_size)
+            else:
+                self.top = max(0, min(self.top, len(self.rows) - self.visible_rows))
+        self.render()
+
+    def apply_page(self, kind, rows):
+        """主线程：把取页线程读到的一页放入缓存"""
+        if kind == 'older':
+            # 超出上限时丢弃顶部的页
+            self.at_oldest = len(rows) < self.page_size
+            self.rows.extend(rows)
+            if len(self.rows) > self.max_rows:
+                drop = len(self.rows) - self.max_rows
+                self.rows = self.rows[drop:]
+                self.top -= drop
+                self.at_newest = False
+        elif kind == 'newer':
+            # 超出上限时丢弃底部的页
+            self.at_newest = len(rows) < self.page_size
+            self.rows[:0] = rows
+            self.top += len(rows)
+            if len(self.rows) > self.max_rows:
+                self.rows = self.rows[:self.max_rows]
+                self.at_oldest = False
+        else:
+            fraction, rows = rows
+            self.rows = rows
+            self.top = 0
+            self.at_newest = fraction == 0.0
+            self.at_oldest = len(self.rows) < self.page_size
+            if len(self.rows) < self.visible_rows and not self.at_newest:
+                self.top = len(self.rows) - self.visible_rows  # 定位到末尾时向前补足一屏
+        if not self.rows:
+            self.top = 0
+            self.render()
+            return
+        self.fill()
+
+    def seek_fraction(self, fraction):
+        """
+        按滚动条位置定位：0 为最新记录，1 为最早记录，按时间线性插值
+        """
+        if self.oldest is None:
+            return
+        fraction = min(max(fraction, 0.0), 1.0)
+        timestamp = self.newest - (self.newest - self.oldest) * fraction
+        self.cancel_fetch()
+        self.request('seek', self.seek_page, fraction, timestamp)
+
+    def seek_page(self, fraction, timestamp):
+        """取页线程：读取定位后的一页"""
+        return fraction, self.pager.seek(timestamp, self.page_size)
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == tk.MOVETO:
+            self.seek_fraction(float(value))
+        elif action == tk.SCROLL:
+            step = int(value) * (self.visible_rows if unit == tk.PAGES else 1)
+            self.scroll(step)
+
+    def on_mousewheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def render(self):
+        # 等待取页期间 top 可能超出缓存范围，显示缓存中最接近的一屏
+        top = max(0, min(self.top, len(self.rows) - self.visible_rows))
+        visible = self.rows[top:top + self.visible_rows]
+        for i, item in enumerate(self.items):
+            self.tree.item(item, values=visible[i] if i < len(visible) else ())
+
+        # 滚动条：位置按首行时间计算，长度按可见行数占估算总数的比例计算
+        if visible and self.oldest is not None and self.newest > self.oldest:
+            first = (self.newest - visible[0][3]) / (self.newest - self.oldest)
+            size = self.visible_rows / max(self.total, len(visible))
+            self.scrollbar.set(first, min(first + size, 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)
@@ -0,0 +1,223 @@
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+WEIGHT_BIN_SIZE = 10  # 重量分布汇总的分组宽度（克）
+HIST_BINS = 20  # 重量分布直方图的分组数
+
+# 汇总表：采集程序在写入原始记录的同一事务中累加，监控界面的图表直接读取
+ROLLUP_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS fruit_weight_hourly (
+        hour DATETIME NOT NULL,
+        fruit_type VARCHAR(50) NOT NULL,
+        cnt INT NOT NULL,
+        total_weight DOUBLE NOT NULL,
+        min_weight FLOAT NOT NULL,
+        max_weight FLOAT NOT NULL,
+        PRIMARY KEY (hour, fruit_type)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS fruit_weight_daily (
+        day DATE NOT NULL,
+        fruit_type VARCHAR(50) NOT NULL,
+        cnt INT NOT NULL,
+        total_weight DOUBLE NOT NULL,
+        min_weight FLOAT NOT NULL,
+        max_weight FLOAT NOT NULL,
+        PRIMARY KEY (day, fruit_type)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS fruit_weight_bins (
+        day DATE NOT NULL,
+        bin INT NOT NULL,
+        cnt INT NOT NULL,
+        PRIMARY KEY (day, bin)
+    )
+    ''',
+]
+
+UPSERT_STATS = '''
+    INSERT INTO {table} ({bucket}, fruit_type, cnt, total_weight, min_weight, max_weight)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        cnt = cnt + VALUES(cnt),
+        total_weight = total_weight + VALUES(total_weight),
+        min_weight = LEAST(min_weight, VALUES(min_weight)),
+        max_weight = GREATEST(max_weight, VALUES(max_weight))
+'''
+
+UPSERT_BINS = '''
+    INSERT INTO fruit_weight_bins (day, bin, cnt) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE cnt = cnt + VALUES(cnt)
+'''
+
+
+def aggregate(rows):
+    """
+    将一批 (水果类型, 重量, 时间) 记录聚合为小时汇总、天汇总和重量分组计数
+    """
+    hourly = defaultdict(lambda: [0, 0.0, float('inf'), float('-inf')])
+    daily = defaultdict(lambda: [0, 0.0, float('inf'), float('-inf')])
+    bins = defaultdict(int)
+
+    for fruit_type, weight, timestamp in rows:
+        hour = timestamp.replace(minute=0, second=0, microsecond=0)
+        for stats in (hourly[(hour, fruit_type)], daily[(hour.date(), fruit_type)]):
+            stats[0] += 1
+            stats[1] += weight
+            stats[2] = min(stats[2], weight)
+            stats[3] = max(stats[3], weight)
+        bins[(hour.date(), int(weight // WEIGHT_BIN_SIZE))] += 1
+
+    return (
+        [key + tuple(stats) for key, stats in hourly.items()],
+        [key + tuple(stats) for key, stats in daily.items()],
+        [key + (n,) for key, n in bins.items()],
+    )
+
+
+def update_rollups(cursor, rows):
+    """
+    把一批新写入的原始记录累加到汇总表，应与原始记录的INSERT在同一事务中执行
+    """
+    hourly, daily, bins = aggregate(rows)
+    cursor.executemany(UPSERT_STATS.format(table='fruit_weight_hourly', bucket='hour'), hourly)
+    cursor.executemany(UPSERT_STATS.format(table='fruit_weight_daily', bucket='day'), daily)
+    cursor.executemany(UPSERT_BINS, bins)
+
+
+def rebuild_rollups(cursor):
+    """
+    由原始记录重新生成全部汇总数据，用于首次建表或修复汇总表
+    """
+    cursor.execute("DELETE FROM fruit_weight_hourly")
+    cursor.execute("DELETE FROM fruit_weight_daily")
+    cursor.execute("DELETE FROM fruit_weight_bins")
+    cursor.execute(
+        "INSERT INTO fruit_weight_hourly (hour, fruit_type, cnt, total_weight, min_weight, max_weight) "
+        "SELECT DATE_FORMAT(timestamp, '%Y-%m-%d %H:00:00') AS h, fruit_type, "
+        "COUNT(*), SUM(weight), MIN(weight), MAX(weight) FROM fruit_weights GROUP BY h, fruit_type"
+    )
+    cursor.execute(
+        "INSERT INTO fruit_weight_daily (day, fruit_type, cnt, total_weight, min_weight, max_weight) "
+        "SELECT DATE(hour) AS d, fruit_type, SUM(cnt), SUM(total_weight), MIN(min_weight), MAX(max_weight) "
+        "FROM fruit_weight_hourly GROUP BY d, fruit_type"
+    )
+    cursor.execute(
+        "INSERT INTO fruit_weight_bins (day, bin, cnt) "
+        "SELECT DATE(timestamp) AS d, FLOOR(weight / %s) AS b, COUNT(*) FROM fruit_weights GROUP BY d, b",
+        (WEIGHT_BIN_SIZE,)
+    )
+
+
+def _range_filter(column, start, end):
+    """
+    生成 [start, end) 的查询条件，start 为None表示不限制
+    """
+    if start is None:
+        return "", ()
+    return f"WHERE {column} >= %s AND {column} < %s", (start, end)
+
+
+def query_chart_data(cursor, start=None, end=None):
+    """
+    从汇总表读取图表所需的统计数据，时间范围为 [start, end)，需按整天对齐
+    不超过一天的范围按小时给出趋势，否则按天
+    """
+    day_filter, params = _range_filter("day", start and start.date(), end and end.date())
+    cursor.execute(
+        f"SELECT fruit_type, SUM(cnt) AS n, SUM(total_weight) FROM fruit_weight_daily {day_filter} "
+        "GROUP BY fruit_type ORDER BY n DESC",
+        params
+    )
+    rows = cursor.fetchall()
+    total = sum(int(n) for _, n, _ in rows)
+    if not total:
+        return {'total': 0}
+    fruit_counts = pd.Series([int(n) for _, n, _ in rows], index=[fruit for fruit, _, _ in rows], name='count')
+    mean_weight = sum(float(w) for _, _, w in rows) / total
+
+    # 将固定宽度的分组计数合并为不超过 HIST_BINS 组
+    cursor.execute(f"SELECT bin, SUM(cnt) FROM fruit_weight_bins {day_filter} GROUP BY bin", params)
+    bin_rows = cursor.fetchall()
+    bin_index = np.array([int(b) for b, _ in bin_rows], dtype=np.int64)
+    counts = np.array([int(n) for _, n in bin_rows], dtype=np.int64)
+    span = int(bin_index.max() - bin_index.min()) + 1
+    merge = -(-span // HIST_BINS)  # 每组合并的固定宽度分组数
+    groups = -(-span // merge)
+    hist = np.bincount((bin_index - bin_index.min()) // merge, weights=counts, minlength=groups)
+    edges = (bin_index.min() + np.arange(groups + 1) * merge) * float(WEIGHT_BIN_SIZE)
+
+    if start is not None and end - start <= timedelta(days=1):
+        bucket, table = "hour", "fruit_weight_hourly"
+        trend_filter, trend_params = _range_filter("hour", start, end)
+    else:
+        bucket, table = "day", "fruit_weight_daily"
+        trend_filter, trend_params = day_filter, params
+    cursor.execute(
+        f"SELECT {bucket}, SUM(cnt), SUM(total_weight) / SUM(cnt) FROM {table} {trend_filter} "
+        f"GROUP BY {bucket} ORDER BY {bucket}",
+        trend_params
+    )
+    trend = pd.DataFrame(cursor.fetchall(), columns=['date', 'count', 'mean_weight'])
+    trend['count'] = trend['count'].astype(int)
+    trend['mean_weight'] = trend['mean_weight'].astype(float)
+
+    return {
+        'total': total,
+        'fruit_counts': fruit_counts,
+        'weight_hist': (hist.astype(np.int64), edges),
+        'mean_weight': mean_weight,
+        'daily': trend,
+        'granularity': bucket,
+    }
+
+
+def merge_chart_data(data, records):
+    """
+    将实时推送的新记录 [(记录ID, 水果类型, 重量, 时间), ...] 累加到 query_chart_data 的结果上，
+    不访问数据库；已有数据为空或新记录超出直方图范围时返回None，调用方应重新查询
+    """
+    if not data['total']:
+        return None
+    counts, edges = data['weight_hist']
+    weights = np.array([record[2] for record in records], dtype=np.float64)
+    if weights.min() < edges[0] or weights.max() >= edges[-1]:
+        return None
+
+    n = len(records)
+    total = data['total'] + n
+    groups = np.searchsorted(edges, weights, side='right') - 1
+    hist = counts + np.bincount(groups, minlength=len(counts))
+
+    fruit_counts = data['fruit_counts'].add(
+        pd.Series([record[1] for record in records]).value_counts(), fill_value=0
+    ).astype(int).sort_values(ascending=False)
+
+    # 趋势数据按小时或按天累加，新的时间段追加到末尾
+    trend = data['daily'].copy()
+    for _, _, weight, timestamp in records:
+        hour = timestamp.replace(minute=0, second=0, microsecond=0)
+        bucket = hour if data['granularity'] == 'hour' else hour.date()
+        match = trend.index[trend['date'] == bucket]
+        if len(match):
+            i = match[0]
+            count = trend.at[i, 'count']
+            trend.at[i, 'mean_weight'] = (trend.at[i, 'mean_weight'] * count + weight) / (count + 1)
+            trend.at[i, 'count'] = count + 1
+        else:
+            trend.loc[len(trend)] = [bucket, 1, weight]
+
+    return {
+        'total': total,
+        'fruit_counts': fruit_counts.rename('count'),
+        'weight_hist': (hist.astype(np.int64), edges),
+        'mean_weight': (data['mean_weight'] * data['total'] + weights.sum()) / total,
+        'daily': trend,
+        'granularity': data['granularity'],
+    }
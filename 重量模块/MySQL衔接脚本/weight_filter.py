@@ -0,0 +1,67 @@
+import numpy as np
+
+# 稳定判定参数（重量单位：克）
+STABLE_WINDOW = 3  # 滑动窗口的采样数，固件每秒发送一次读数
+STABLE_TOLERANCE = 2.0  # 窗口内最大值与最小值之差不超过该值视为读数稳定
+MIN_WEIGHT = 5.0  # 净重低于该值视为秤盘为空
+ZERO_TRACKING = 0.2  # 秤盘为空时零点向当前读数靠拢的比例，用于跟踪零点漂移
+
+
+class WeightStabilizer:
+    """
+    重量读数稳定滤波器
+    固件每次循环都发送一个原始读数，放一个水果会产生大量几乎相同的读数。
+    读数先进入numpy环形缓冲区，取滑动中位数抑制毛刺；窗口内的波动不超过容差时视为稳定。
+    秤盘为空且稳定时缓慢跟踪零点（去皮），放上水果并稳定后只输出一次净重，
+    直到水果被取下（或换成重量明显不同的水果）才会输出下一条记录。
+    """
+
+    def __init__(self, window=STABLE_WINDOW, tolerance=STABLE_TOLERANCE,
+                 min_weight=MIN_WEIGHT, zero_tracking=ZERO_TRACKING):
+        self.window = window
+        self.tolerance = tolerance
+        self.min_weight = min_weight
+        self.zero_tracking = zero_tracking
+
+        self._ring = np.zeros(window, dtype=np.float64)
+        self._count = 0
+        self.zero = 0.0  # 零点（固件开机时已去皮，初始为0）
+        self.settled_weight = None  # 当前放置的水果已输出的净重，None 表示尚未输出
+
+        # 统计信息
+        self.samples = 0  # 收到的原始读数数量
+        self.settled = 0  # 输出的稳定记录数量
+
+    def reset(self):
+        self._count = 0
+        self.settled_weight = None
+
+    def update(self, raw):
+        """
+        输入一个原始读数，一次放置稳定后返回其净重，否则返回None
+        """
+        self._ring[self._count % self.window] = raw
+        self._count += 1
+        self.samples += 1
+        if self._count < self.window:
+            return None
+
+        median = float(np.median(self._ring))
+        stable = float(np.ptp(self._ring)) <= self.tolerance
+        net = median - self.zero
+
+        if net < self.min_weight:
+            # 秤盘为空：水果已取下，稳定时跟踪零点漂移
+            self.settled_weight = None
+            if stable:
+                self.zero += self.zero_tracking * (median - self.zero)
+            return None
+
+        if not stable:
+            return None
+        if self.settled_weight is not None and abs(net - self.settled_weight) < self.min_weight:
+            return None  # 同一次放置，已经输出过
+
+        self.settled_weight = net
+        self.settled += 1
+        return round(net, 2)